@@ -255,7 +255,18 @@ const ReviewStep = ({
             Generate Video
           </Button>
         </Col>
-        {videoResult && <VideoResult videoId={videoResult} />}
+        {videoResult &&
+          videoResult.map((videoId, index) => (
+            <VideoResult
+              key={videoId}
+              videoId={videoId}
+              title={
+                videoResult.length > 1
+                  ? `Video Part ${index + 1} of ${videoResult.length}`
+                  : undefined
+              }
+            />
+          ))}
       </Row>
     </>
   );
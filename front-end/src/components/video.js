@@ -14,7 +14,7 @@ import axios from "axios";
 
 const { Text } = Typography;
 
-const VideoResult = ({ videoId }) => {
+const VideoResult = ({ videoId, title = "Video Generation Result" }) => {
   const [status, setStatus] = useState("processing");
   const [downloadUrl, setDownloadUrl] = useState(null);
   const [progress, setProgress] = useState(0);
@@ -119,7 +119,7 @@ const VideoResult = ({ videoId }) => {
   };
 
   return (
-    <Card title="Video Generation Result" style={{ marginTop: 20 }}>
+    <Card title={title} style={{ marginTop: 20, width: "100%" }}>
       <Space direction="vertical" style={{ width: "100%" }}>
         <div>
           <Text strong>Status:</Text>
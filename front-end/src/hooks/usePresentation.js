@@ -314,12 +314,12 @@ export const usePresentation = () => {
     setVideoResult(null);
 
     try {
-      const videoId = await api.generateVideo(
+      const videoIds = await api.generateVideo(
         scenesWithImages,
         selectedAvatar,
         selectedVoice
       );
-      setVideoResult(videoId);
+      setVideoResult(videoIds);
     } finally {
       setIsGeneratingVideo(false);
     }
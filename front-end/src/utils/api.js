@@ -74,9 +74,18 @@ export const extractContent = async (fileId) => {
 
 export const generateScenes = async (extractionData) => {
   try {
-    const response = await axios.post(API_ENDPOINTS.GENERATE_SCENES, {
-      extraction_data: extractionData,
-    });
+    let response;
+    try {
+      // The server keeps the extraction, so the deck's id is enough
+      response = await axios.post(API_ENDPOINTS.GENERATE_SCENES, {
+        file_id: extractionData.file_id,
+      });
+    } catch (error) {
+      if (error.response?.status !== 404) throw error;
+      response = await axios.post(API_ENDPOINTS.GENERATE_SCENES, {
+        extraction_data: extractionData,
+      });
+    }
     message.success("Storyboard scenes generated!");
     return response.data.scenes;
   } catch (error) {
@@ -143,9 +152,26 @@ export const generateVideo = async (scenes, avatarId, voiceId) => {
 
   try {
     const response = await axios.post(API_ENDPOINTS.GENERATE_VIDEO, payload);
-    if (response.data.success && response.data.video_id) {
-      message.success("Video generation started successfully!");
-      return response.data.video_id;
+    // Long decks come back as several videos, one per segment, in order
+    const segments = response.data.segments || [
+      { video_id: response.data.video_id },
+    ];
+    const videoIds = segments
+      .map((segment) => segment.video_id)
+      .filter(Boolean);
+    if (videoIds.length > 0) {
+      if (response.data.success) {
+        message.success(
+          videoIds.length > 1
+            ? `Video generation started in ${videoIds.length} parts!`
+            : "Video generation started successfully!"
+        );
+      } else {
+        message.warning(
+          `${response.data.error}. The other parts are still being generated.`
+        );
+      }
+      return videoIds;
     } else {
       const errorMsg =
         response.data.error || response.data.detail || "Unknown backend error";
@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+import re
+import socket
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+from config import settings
+
+ARTIFACT_ID = re.compile(r"[0-9a-f]{64}")
+
+
+class ArtifactStore(ABC):
+    """Content-addressed store for extraction results: slide images and extraction records.
+
+    An artifact's id is the sha256 of its bytes, so it is opaque to clients,
+    identical content is stored once and any worker that sees the same store
+    can serve any stage. Refs are the only mutable entries: small named
+    pointers to an artifact (a deck's content hash to its extraction record),
+    so every worker and node resolves a deck the same way. Methods are
+    blocking; call them on the I/O pool (or from the CPU pool, where slides
+    are parsed).
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def put(self, data: bytes) -> str:
+        ...
+
+    @abstractmethod
+    def get(self, artifact_id: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def exists(self, artifact_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    def set_ref(self, name: str, artifact_id: str):
+        ...
+
+    @abstractmethod
+    def get_ref(self, name: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def delete_ref(self, name: str, artifact_id: str):
+        """Remove the ref, unless it has meanwhile been pointed at another artifact."""
+
+    def path_for(self, artifact_id: str) -> Optional[str]:
+        """Where the artifact lives on disk, for the janitor's protected paths; None for non-file stores."""
+        return None
+
+    def put_json(self, value: Any) -> str:
+        return self.put(json.dumps(value, sort_keys=True, separators=(",", ":")).encode())
+
+    def get_json(self, artifact_id: str) -> Optional[Any]:
+        data = self.get(artifact_id)
+        return json.loads(data) if data is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+class LocalArtifactStore(ArtifactStore):
+    """Files under ARTIFACT_DIR, visible to the workers of one host."""
+
+    name = "local"
+
+    def __init__(self, root: str):
+        self.root = root
+        self.writes = 0
+        self.bytes_written = 0
+        self.reads = 0
+        self.missing = 0
+        self.ref_hits = 0
+        self.ref_misses = 0
+
+    def path_for(self, artifact_id: str) -> Optional[str]:
+        # Ids come back from clients, so anything but a sha256 is rejected before it reaches a path
+        if not isinstance(artifact_id, str) or not ARTIFACT_ID.fullmatch(artifact_id):
+            return None
+        return os.path.join(self.root, artifact_id[:2], artifact_id)
+
+    def tmp_path(self, path: str) -> str:
+        return f"{path}.{uuid.uuid4()}.tmp"
+
+    def write(self, path: str, data: bytes):
+        tmp_path = self.tmp_path(path)
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def put(self, data: bytes) -> str:
+        artifact_id = hashlib.sha256(data).hexdigest()
+        path = self.path_for(artifact_id)
+        if os.path.exists(path):
+            # Already stored; refresh it so the janitor sees it as recently used
+            os.utime(path)
+            return artifact_id
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.write(path, data)
+        self.writes += 1
+        self.bytes_written += len(data)
+        return artifact_id
+
+    def read(self, path: str) -> bytes:
+        with open(path, "rb") as f:
+            data = f.read()
+        # The janitor ranks artifacts by mtime; atime is not reliable on every mount
+        os.utime(path)
+        return data
+
+    def get(self, artifact_id: str) -> Optional[bytes]:
+        path = self.path_for(artifact_id)
+        try:
+            data = self.read(path) if path is not None else None
+        except FileNotFoundError:
+            data = None
+        if data is None:
+            self.missing += 1
+            return None
+        self.reads += 1
+        return data
+
+    def exists(self, artifact_id: str) -> bool:
+        path = self.path_for(artifact_id)
+        return path is not None and os.path.exists(path)
+
+    def ref_path(self, name: str) -> Optional[str]:
+        # Ref names are content hashes too; "refs" cannot clash with the two-character artifact directories
+        if not isinstance(name, str) or not ARTIFACT_ID.fullmatch(name):
+            return None
+        return os.path.join(self.root, "refs", name)
+
+    def set_ref(self, name: str, artifact_id: str):
+        path = self.ref_path(name)
+        if path is None or not ARTIFACT_ID.fullmatch(artifact_id):
+            raise ValueError(f"Invalid artifact ref {name!r} -> {artifact_id!r}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.write(path, artifact_id.encode())
+
+    def get_ref(self, name: str) -> Optional[str]:
+        path = self.ref_path(name)
+        try:
+            with open(path, "rb") as f:
+                artifact_id = f.read().decode("ascii", errors="replace")
+            os.utime(path)
+        except (TypeError, FileNotFoundError):
+            artifact_id = None
+        # Written atomically, so anything but a whole id is a foreign file
+        if artifact_id is None or not ARTIFACT_ID.fullmatch(artifact_id):
+            self.ref_misses += 1
+            return None
+        self.ref_hits += 1
+        return artifact_id
+
+    def delete_ref(self, name: str, artifact_id: str):
+        if self.get_ref(name) != artifact_id:
+            return
+        try:
+            os.remove(self.ref_path(name))
+        except FileNotFoundError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "writes": self.writes,
+            "bytes_written": self.bytes_written,
+            "reads": self.reads,
+            "missing": self.missing,
+            "ref_hits": self.ref_hits,
+            "ref_misses": self.ref_misses,
+        }
+
+
+class SharedVolumeArtifactStore(LocalArtifactStore):
+    """Files on a volume mounted by every node (NFS, EFS, a shared disk) at ARTIFACT_SHARED_DIR.
+
+    Writes are fsynced before the rename that publishes them, temporary names
+    carry the host so nodes never collide, and reads are checked against the
+    id so a torn or stale copy is treated as missing rather than served.
+    """
+
+    name = "shared"
+
+    def __init__(self, root: str):
+        super().__init__(root)
+        self.host = socket.gethostname()
+        self.corrupt = 0
+
+    def tmp_path(self, path: str) -> str:
+        return f"{path}.{self.host}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+
+    def write(self, path: str, data: bytes):
+        tmp_path = self.tmp_path(path)
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        directory = os.open(os.path.dirname(path), os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+    def read(self, path: str) -> Optional[bytes]:
+        data = super().read(path)
+        if hashlib.sha256(data).hexdigest() != os.path.basename(path):
+            self.corrupt += 1
+            return None
+        return data
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "corrupt": self.corrupt}
+
+
+def create_artifact_store() -> ArtifactStore:
+    if settings.ARTIFACT_STORE == "local":
+        return LocalArtifactStore(settings.ARTIFACT_DIR)
+    if settings.ARTIFACT_STORE == "shared":
+        if not settings.ARTIFACT_SHARED_DIR:
+            raise ValueError("ARTIFACT_STORE=shared needs ARTIFACT_SHARED_DIR")
+        return SharedVolumeArtifactStore(settings.ARTIFACT_SHARED_DIR)
+    raise ValueError(f"Unknown ARTIFACT_STORE: {settings.ARTIFACT_STORE}")
+
+
+artifact_store = create_artifact_store()
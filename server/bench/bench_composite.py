@@ -0,0 +1,103 @@
+"""Micro-benchmark for logo compositing.
+
+Compares the previous full-canvas PNG merge with utils.composite_with_logo and
+reports milliseconds per image, output size and peak RSS. Each variant runs
+in a fresh process so the peak RSS of one does not hide the other.
+
+    cd server && python bench/bench_composite.py --size 1024 --iterations 20
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+
+def legacy_merge(background_image_data: bytes, logo: Image.Image, size, output_format: str, quality: int) -> bytes:
+    background = Image.open(BytesIO(background_image_data)).convert("RGBA")
+    composite = Image.new("RGBA", background.size)
+    composite.paste(background, (0, 0))
+    composite.paste(logo, (background.width - logo.width, 0), logo)
+    merged_buffer = BytesIO()
+    composite.save(merged_buffer, format="PNG")
+    return merged_buffer.getvalue()
+
+
+def make_background(size: int) -> bytes:
+    # Noise compresses like a photo would; a flat colour would flatter PNG
+    noise = Image.effect_noise((size, size), 64).convert("RGB")
+    gradient = Image.linear_gradient("L").resize((size, size)).convert("RGB")
+    buffer = BytesIO()
+    Image.blend(noise, gradient, 0.5).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_variant(variant: str, background: bytes, iterations: int, output_format: str, quality: int, results):
+    from config import settings
+    from utils import composite_with_logo
+    merge = legacy_merge if variant == "legacy" else composite_with_logo
+    logo = Image.new("RGBA", settings.LOGO_VARIANT_SIZES[0], (0, 0, 255, 160))
+    target = (settings.VIDEO_WIDTH, settings.VIDEO_HEIGHT)
+    baseline = peak_rss_mb()
+    timings = []
+    output_bytes = 0
+    for _ in range(iterations):
+        started = time.perf_counter()
+        output_bytes = len(merge(background, logo, target, output_format, quality))
+        timings.append((time.perf_counter() - started) * 1000)
+    results.put({
+        "variant": variant,
+        "input_bytes": len(background),
+        "output_bytes": output_bytes,
+        "mean_ms": statistics.mean(timings),
+        "p95_ms": sorted(timings)[int(0.95 * (len(timings) - 1))],
+        "baseline_rss_mb": baseline,
+        "peak_rss_mb": peak_rss_mb(),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=1024, help="edge of the square background in pixels")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--format", default="JPEG", choices=["JPEG", "WEBP", "PNG"])
+    parser.add_argument("--quality", type=int, default=85)
+    parser.add_argument("--variants", nargs="+", default=["legacy", "composite"], choices=["legacy", "composite"])
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    # Built here so its own decode/encode peak is not charged to either variant
+    background = make_background(args.size)
+    print(f"{args.size}x{args.size} background, {args.iterations} iterations, output {args.format} q{args.quality}")
+    print(f"{'variant':<10} {'mean ms':>9} {'p95 ms':>9} {'in KB':>8} {'out KB':>8} {'peak RSS MB':>12} {'+ over base':>12}")
+    for variant in args.variants:
+        process = context.Process(
+            target=run_variant,
+            args=(variant, background, args.iterations, args.format, args.quality, results)
+        )
+        process.start()
+        result = results.get()
+        process.join()
+        print(
+            f"{result['variant']:<10} {result['mean_ms']:>9.1f} {result['p95_ms']:>9.1f} "
+            f"{result['input_bytes'] / 1024:>8.0f} {result['output_bytes'] / 1024:>8.0f} "
+            f"{result['peak_rss_mb']:>12.1f} {result['peak_rss_mb'] - result['baseline_rss_mb']:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
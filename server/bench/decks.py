@@ -0,0 +1,108 @@
+"""Synthetic PowerPoint decks for benchmarks.
+
+Builds .pptx decks with a chosen number of slides, pictures and tables per
+slide, and optionally a .ppt copy through Spire (the same library the server
+converts with). `variant` is written into every deck so each copy hashes
+differently and defeats the upload/extraction caches.
+
+    cd server && python bench/decks.py /tmp/deck.pptx --slides 10 --images 2 --tables 1 --ppt
+"""
+import argparse
+import functools
+import os
+import random
+from io import BytesIO
+from typing import Tuple
+
+from PIL import Image
+from pptx import Presentation
+from pptx.util import Inches, Pt
+
+WORDS = (
+    "revenue growth customer retention pipeline quarterly forecast margin strategy market "
+    "product launch roadmap hiring onboarding platform latency reliability partnership region"
+).split()
+
+
+@functools.lru_cache(maxsize=None)
+def make_pictures(seed: int, count: int, size=(800, 600)) -> Tuple[bytes, ...]:
+    # Cached so building many variants of a deck only pays for the pictures once
+    rng = random.Random(seed)
+    return tuple(make_picture(rng, size) for _ in range(count))
+
+
+def make_picture(rng: random.Random, size) -> bytes:
+    # Noise plus a gradient so the JPEG is about as large as a real photo
+    noise = Image.effect_noise(size, rng.randint(32, 96)).convert("RGB")
+    gradient = Image.linear_gradient("L").resize(size).convert("RGB")
+    buffer = BytesIO()
+    Image.blend(noise, gradient, rng.random()).save(buffer, format="JPEG", quality=80)
+    return buffer.getvalue()
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def build_deck(path: str, slides: int = 5, images: int = 1, tables: int = 0,
+               words: int = 40, seed: int = 0, variant: str = "") -> str:
+    rng = random.Random(seed)
+    pictures = make_pictures(seed, min(images * slides, 8))
+    presentation = Presentation()
+    presentation.slide_width, presentation.slide_height = Inches(13.333), Inches(7.5)
+    layout = presentation.slide_layouts[5]  # title only
+    for number in range(1, slides + 1):
+        slide = presentation.slides.add_slide(layout)
+        slide.shapes.title.text = f"Slide {number}: {sentence(rng, 4)} {variant}".strip()
+        body = slide.shapes.add_textbox(Inches(0.5), Inches(1.5), Inches(6), Inches(4)).text_frame
+        body.word_wrap = True
+        for index in range(max(words // 10, 1)):
+            paragraph = body.paragraphs[0] if index == 0 else body.add_paragraph()
+            paragraph.text = sentence(rng, 10)
+            paragraph.font.size = Pt(14)
+        for index in range(images):
+            picture = pictures[(number * images + index) % len(pictures)]
+            slide.shapes.add_picture(BytesIO(picture), Inches(7 + index * 0.4), Inches(1.5 + index * 0.4), width=Inches(5))
+        for index in range(tables):
+            rows, cols = 4, 3
+            table = slide.shapes.add_table(
+                rows, cols, Inches(0.5), Inches(5.2 + index * 0.3), Inches(6), Inches(1.8)
+            ).table
+            for row in range(rows):
+                for col in range(cols):
+                    table.cell(row, col).text = f"Q{col + 1}" if row == 0 else str(rng.randint(10, 999))
+    presentation.save(path)
+    return path
+
+
+def convert_to_ppt(pptx_path: str, ppt_path: str) -> str:
+    from spire.presentation import Presentation as SpirePresentation, FileFormat
+    presentation = SpirePresentation()
+    try:
+        presentation.LoadFromFile(pptx_path)
+        presentation.SaveToFile(ppt_path, FileFormat.PPT)
+    finally:
+        presentation.Dispose()
+    return ppt_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="output .pptx path")
+    parser.add_argument("--slides", type=int, default=5)
+    parser.add_argument("--images", type=int, default=1, help="pictures per slide")
+    parser.add_argument("--tables", type=int, default=0, help="tables per slide")
+    parser.add_argument("--words", type=int, default=40, help="body words per slide")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ppt", action="store_true", help="also write a .ppt copy next to it")
+    args = parser.parse_args()
+    build_deck(args.path, args.slides, args.images, args.tables, args.words, args.seed)
+    print(f"Wrote {args.path} ({os.path.getsize(args.path) / 1024:.0f} KB)")
+    if args.ppt:
+        ppt_path = os.path.splitext(args.path)[0] + ".ppt"
+        convert_to_ppt(args.path, ppt_path)
+        print(f"Wrote {ppt_path} ({os.path.getsize(ppt_path) / 1024:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""Local stand-ins for Gemini, HeyGen and Cloudinary.
+
+One aiohttp server answers the request paths the service uses, with the
+response shapes of the real APIs, so pointing GEMINI_API_BASE,
+HEYGEN_API_BASE and CLOUDINARY_API_BASE at it exercises the real client
+code. Every call waits for its service's latency (+/- jitter) and fails with
+one of --error-statuses at --error-rate. With --gemini-quota/--heygen-quota,
+calls beyond that many per second are rejected with a 429 and Retry-After,
+like an exhausted quota. GET /_fake/stats returns call and error counts per
+operation.
+
+    cd server && python bench/fakes.py --port 9100 --gemini-latency 1.5 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import mimetypes
+import random
+import re
+import time
+import uuid
+from collections import Counter, OrderedDict, deque
+from io import BytesIO
+
+from aiohttp import ClientSession, web
+from PIL import Image
+
+ERROR_BODIES = {
+    "gemini": lambda status: {"error": {
+        "code": status,
+        "message": "Resource has been exhausted (e.g. check quota)." if status == 429 else "Internal error encountered.",
+        "status": "RESOURCE_EXHAUSTED" if status == 429 else "INTERNAL",
+        # What the real API attaches to quota errors
+        "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "1s"}] if status == 429 else [],
+    }},
+    "heygen": lambda status: {"code": status, "error": {"code": "rate_limit" if status == 429 else "internal_error"}, "data": None},
+    "cloudinary": lambda status: {"error": {"message": f"Fake upstream error {status}"}},
+}
+
+
+def make_image(size: int, seed: int) -> bytes:
+    rng = random.Random(seed)
+    noise = Image.effect_noise((size, size), rng.randint(32, 96)).convert("RGB")
+    gradient = Image.linear_gradient("L").resize((size, size)).convert("RGB")
+    buffer = BytesIO()
+    Image.blend(noise, gradient, rng.random()).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class Fakes:
+    def __init__(self, args):
+        self.args = args
+        self.base_url = f"http://{args.host}:{args.port}"
+        self.rng = random.Random(args.seed)
+        self.calls: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.videos = {}
+        self.uploads: "OrderedDict[str, tuple]" = OrderedDict()
+        # Gemini image responses are large PNGs; a few pre-rendered ones are reused
+        self.images = [make_image(args.image_size, seed) for seed in range(4)]
+        self.catalog_etag = f'"{uuid.uuid4().hex}"'
+        self.recent_calls = {service: deque() for service in ERROR_BODIES}
+
+    def over_quota(self, service: str) -> bool:
+        quota = getattr(self.args, f"{service}_quota", 0)
+        if not quota:
+            return False
+        now = time.monotonic()
+        recent = self.recent_calls[service]
+        while recent and now - recent[0] >= 1.0:
+            recent.popleft()
+        if len(recent) >= quota:
+            return True
+        recent.append(now)
+        return False
+
+    def error_response(self, service: str, status: int):
+        headers = {"Retry-After": f"{self.args.retry_after:g}"} if status == 429 and self.args.retry_after else None
+        return web.json_response(ERROR_BODIES[service](status), status=status, headers=headers)
+
+    async def enter(self, service: str, operation: str):
+        """Count the call, wait out the latency and return an error response to send instead, if any."""
+        self.calls[f"{service}.{operation}"] += 1
+        if self.over_quota(service):
+            self.errors[f"{service}.{operation}.quota"] += 1
+            return self.error_response(service, 429)
+        latency = getattr(self.args, f"{service}_latency")
+        if latency > 0:
+            await asyncio.sleep(max(0.0, latency * (1 + self.rng.uniform(-self.args.jitter, self.args.jitter))))
+        if self.rng.random() < self.args.error_rate:
+            status = self.rng.choice(self.args.error_statuses)
+            self.errors[f"{service}.{operation}.{status}"] += 1
+            return self.error_response(service, status)
+        return None
+
+    # Gemini
+
+    def scenes(self, slide_number, fingerprint, count=2):
+        # The fingerprint of the prompt keeps image prompts (and so the image cache) distinct per deck
+        return [
+            {
+                "speech_script": f"Scene {index} of slide {slide_number} walks through the key point in plain words.",
+                "image_prompt": f"professional abstract background for slide {slide_number} scene {index}, soft light, {fingerprint}",
+            }
+            for index in range(1, count + 1)
+        ]
+
+    async def gemini_generate(self, request: web.Request):
+        model = request.match_info["model_action"].partition(":")[0]
+        body = await request.json()
+        config = body.get("generationConfig") or body.get("generation_config") or {}
+        modalities = config.get("responseModalities") or config.get("response_modalities") or []
+        wants_image = "IMAGE" in modalities or "image" in model
+        error = await self.enter("gemini", "generate_image" if wants_image else "generate_text")
+        if error is not None:
+            return error
+        if wants_image:
+            image = self.rng.choice(self.images)
+            parts = [
+                {"text": "Here is the generated image."},
+                {"inlineData": {"mimeType": "image/png", "data": base64.b64encode(image).decode()}},
+            ]
+        else:
+            text = " ".join(
+                part.get("text", "")
+                for content in body.get("contents", [])
+                for part in content.get("parts", [])
+            )
+            fingerprint = hashlib.sha1(text.encode()).hexdigest()[:8]
+            if 'single key "summary"' in text:
+                # Section summary for large decks (routes/generate.py SUMMARY_PROMPT)
+                parts = [{"text": json.dumps({"summary": f"Section {fingerprint} covered the key figures and what they mean."})}]
+                return self.gemini_response(model, parts)
+            slide_numbers = [int(number) for number in re.findall(r"--- SLIDE (\d+) START ---", text)]
+            if slide_numbers:
+                answer = {"slides": [
+                    {"slide_number": number, "scenes": self.scenes(number, fingerprint)} for number in slide_numbers
+                ]}
+            else:
+                answer = {"scenes": self.scenes(1, fingerprint)}
+            parts = [{"text": json.dumps(answer)}]
+        return self.gemini_response(model, parts)
+
+    def gemini_response(self, model: str, parts):
+        return web.json_response({
+            "candidates": [{"content": {"role": "model", "parts": parts}, "finishReason": "STOP", "index": 0}],
+            "usageMetadata": {"promptTokenCount": 1000, "candidatesTokenCount": 200, "totalTokenCount": 1200},
+            "modelVersion": model,
+        })
+
+    # HeyGen
+
+    async def heygen_generate(self, request: web.Request):
+        payload = await request.json()
+        error = await self.enter("heygen", "video_generate")
+        if error is not None:
+            return error
+        video_id = uuid.uuid4().hex
+        self.videos[video_id] = {"created_at": time.monotonic(), "scenes": len(payload.get("video_inputs", []))}
+        if self.args.webhook_url:
+            asyncio.create_task(self.send_webhook(video_id))
+        return web.json_response({"error": None, "data": {"video_id": video_id}})
+
+    def video_url(self, video_id: str) -> str:
+        return f"{self.base_url}/videos/{video_id}.mp4"
+
+    async def send_webhook(self, video_id: str):
+        await asyncio.sleep(self.args.video_seconds)
+        body = json.dumps({
+            "event_type": "avatar_video.success",
+            "event_data": {"video_id": video_id, "url": self.video_url(video_id)},
+        }).encode()
+        headers = {"content-type": "application/json"}
+        if self.args.webhook_secret:
+            headers["signature"] = hmac.new(self.args.webhook_secret.encode(), body, hashlib.sha256).hexdigest()
+        try:
+            async with ClientSession() as session:
+                await session.post(self.args.webhook_url, data=body, headers=headers)
+        except Exception as e:
+            print(f"Webhook for {video_id} failed: {e}")
+
+    async def heygen_status(self, request: web.Request):
+        error = await self.enter("heygen", "video_status")
+        if error is not None:
+            return error
+        video_id = request.query.get("video_id", "")
+        video = self.videos.get(video_id)
+        if video is None:
+            return web.json_response({"code": 400, "message": "video not found", "data": None}, status=400)
+        done = time.monotonic() - video["created_at"] >= self.args.video_seconds
+        return web.json_response({"code": 100, "message": "Success", "data": {
+            "id": video_id,
+            "status": "completed" if done else "processing",
+            "video_url": self.video_url(video_id) if done else None,
+            "error": None,
+        }})
+
+    async def heygen_catalog(self, request: web.Request):
+        kind = request.match_info["kind"]
+        error = await self.enter("heygen", kind)
+        if error is not None:
+            return error
+        if request.headers.get("If-None-Match") == self.catalog_etag:
+            return web.Response(status=304, headers={"ETag": self.catalog_etag})
+        if kind == "avatars":
+            data = {"avatars": [
+                {"avatar_id": f"avatar_{index}", "avatar_name": f"Avatar {index}", "gender": "female" if index % 2 else "male",
+                 "preview_image_url": f"{self.base_url}/previews/avatar_{index}.png"}
+                for index in range(self.args.catalog_size)
+            ], "talking_photos": []}
+        else:
+            data = {"voices": [
+                {"voice_id": f"voice_{index}", "language": "English", "gender": "female" if index % 2 else "male",
+                 "name": f"Voice {index}", "preview_audio": f"{self.base_url}/previews/voice_{index}.mp3"}
+                for index in range(self.args.catalog_size)
+            ]}
+        return web.json_response({"error": None, "data": data}, headers={"ETag": self.catalog_etag})
+
+    # Cloudinary
+
+    async def cloudinary_upload(self, request: web.Request):
+        cloud = request.match_info["cloud"]
+        form = await request.post()
+        error = await self.enter("cloudinary", "upload")
+        if error is not None:
+            return error
+        upload = form["file"]
+        data = upload.file.read()
+        public_id = form.get("public_id") or uuid.uuid4().hex
+        extension = (mimetypes.guess_extension(upload.content_type) or ".bin").lstrip(".")
+        path = f"{public_id}.{extension}"
+        self.uploads[path] = (data, upload.content_type)
+        while len(self.uploads) > self.args.max_uploads:
+            self.uploads.popitem(last=False)
+        version = int(time.time())
+        return web.json_response({
+            "public_id": public_id,
+            "version": version,
+            "format": extension,
+            "resource_type": "image",
+            "bytes": len(data),
+            "url": f"{self.base_url}/res/{cloud}/image/upload/v{version}/{path}",
+            "secure_url": f"{self.base_url}/res/{cloud}/image/upload/v{version}/{path}",
+        })
+
+    async def cloudinary_file(self, request: web.Request):
+        upload = self.uploads.get(request.match_info["path"])
+        if upload is None:
+            return web.Response(status=404)
+        return web.Response(body=upload[0], content_type=upload[1])
+
+    async def stats(self, request: web.Request):
+        return web.json_response({"calls": dict(self.calls), "errors": dict(self.errors)})
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/v1beta/models/{model_action}", self.gemini_generate)
+        app.router.add_post("/v2/video/generate", self.heygen_generate)
+        app.router.add_get("/v1/video_status.get", self.heygen_status)
+        app.router.add_get("/v2/{kind:avatars|voices}", self.heygen_catalog)
+        app.router.add_post("/v1_1/{cloud}/image/upload", self.cloudinary_upload)
+        app.router.add_get("/res/{cloud}/image/upload/v{version}/{path:.+}", self.cloudinary_file)
+        app.router.add_get("/_fake/stats", self.stats)
+        return app
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--gemini-latency", type=float, default=1.0, help="seconds per Gemini call")
+    parser.add_argument("--heygen-latency", type=float, default=0.2)
+    parser.add_argument("--cloudinary-latency", type=float, default=0.15)
+    parser.add_argument("--jitter", type=float, default=0.3, help="latency varies by this fraction either way")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls that fail")
+    parser.add_argument("--error-statuses", type=int, nargs="+", default=[429, 500])
+    parser.add_argument("--gemini-quota", type=float, default=0, help="Gemini calls allowed per second, 0 for no limit")
+    parser.add_argument("--heygen-quota", type=float, default=0, help="HeyGen calls allowed per second, 0 for no limit")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s, 0 to omit")
+    parser.add_argument("--video-seconds", type=float, default=5.0, help="time until a HeyGen video completes")
+    parser.add_argument("--webhook-url", help="also POST a HeyGen webhook here when a video completes")
+    parser.add_argument("--webhook-secret")
+    parser.add_argument("--image-size", type=int, default=1024, help="edge of generated Gemini images")
+    parser.add_argument("--catalog-size", type=int, default=200, help="avatars and voices returned")
+    parser.add_argument("--max-uploads", type=int, default=2000, help="Cloudinary uploads kept in memory")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    web.run_app(Fakes(args).app(), host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Import-time report for the app's worker cold start.
+
+Imports main in fresh interpreters under `python -X importtime` and reports
+the total, the app's own modules and the heaviest third-party packages by
+cumulative time, taking the fastest of --runs so a cold disk cache does not
+skew it. Runs in a scratch directory because importing config creates logs/.
+The running app reports its own startup milestones under "startup" in
+/api/stats.
+
+    cd server && python bench/import_report.py --runs 5 --output /tmp/imports.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.dirname(BENCH_DIR)
+
+
+def app_modules() -> set:
+    modules = {name[:-3] for name in os.listdir(SERVER_DIR) if name.endswith(".py")}
+    modules.update(f"routes.{name[:-3]}" for name in os.listdir(os.path.join(SERVER_DIR, "routes")) if name.endswith(".py"))
+    return modules
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, self us, cumulative us) for every import, in the order Python reported them."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        imports.append((name.strip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def measure(module: str, workdir: str) -> Dict:
+    env = {**os.environ, "PYTHONPATH": SERVER_DIR}
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=workdir, env=env, capture_output=True, text=True
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    imports = parse_importtime(result.stderr)
+    ours = app_modules()
+    # A package's first (outermost) report holds the time of everything it pulled in
+    packages: Dict[str, int] = {}
+    for name, _, cumulative_us in imports:
+        top = name.split(".")[0]
+        if name == top and name not in ours:
+            packages[top] = max(packages.get(top, 0), cumulative_us)
+    return {
+        "wall_ms": round(wall_ms, 1),
+        "import_ms": round(next((cumulative for name, _, cumulative in imports if name == module), 0) / 1000, 1),
+        "app_modules_ms": {
+            name: round(cumulative_us / 1000, 1) for name, _, cumulative_us in imports if name in ours
+        },
+        "packages_ms": {name: round(us / 1000, 1) for name, us in sorted(packages.items(), key=lambda item: -item[1])},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15, help="packages to print")
+    parser.add_argument("--output", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="video-generator-imports-") as workdir:
+        runs = [measure(args.module, workdir) for _ in range(args.runs)]
+    report = min(runs, key=lambda run: run["import_ms"])
+    report["runs_import_ms"] = [run["import_ms"] for run in runs]
+    print(f"import {args.module}: {report['import_ms']} ms (process wall {report['wall_ms']} ms), runs {report['runs_import_ms']}")
+    print("\nheaviest packages (cumulative ms)")
+    for name, ms in list(report["packages_ms"].items())[:args.top]:
+        print(f"  {name:<28} {ms:>8.1f}")
+    print("\napp modules (cumulative ms, includes what they import first)")
+    for name, ms in sorted(report["app_modules_ms"].items(), key=lambda item: -item[1]):
+        print(f"  {name:<28} {ms:>8.1f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
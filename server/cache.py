@@ -0,0 +1,295 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from config import settings, logger
+from executor import run_io
+
+_caches: List["PersistentCache"] = []
+_flights: List["SingleFlight"] = []
+_flusher: Optional[asyncio.Task] = None
+
+
+class PersistentCache:
+    """LRU cache with optional TTL whose index is persisted as a JSON file.
+
+    Values must be JSON serializable. Entries are evicted oldest-access first
+    once `max_entries` or `max_bytes` (sum of the sizes given to `set`) is
+    exceeded; `on_evict(key, value)` lets callers release anything the entry
+    points to on disk.
+
+    Several worker processes may share one index file. Each keeps its own
+    copy in memory; writes take an exclusive lock on `<index>.lock`, merge
+    the index on disk with this process's pending sets and deletes, and
+    write the result, so workers never drop each other's entries. Changes
+    are written in batches, at most once per `flush_seconds` plus whatever
+    `flush()` picks up, and a miss re-reads the index (no more often than
+    that) when another process has changed it. Methods block on file I/O;
+    call them on the I/O pool.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        index_path: str,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        on_evict: Optional[Callable[[str, Any], None]] = None,
+        flush_seconds: Optional[float] = None,
+    ):
+        self.name = name
+        self.index_path = index_path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.on_evict = on_evict
+        self.flush_seconds = settings.CACHE_FLUSH_SECONDS if flush_seconds is None else flush_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._total_bytes = 0
+        self._dirty = False
+        # Changes not yet written to the index: keys set here, and the `created` of entries removed here
+        self._pending: set = set()
+        self._removed: Dict[str, float] = {}
+        self._index_mtime: Optional[int] = None
+        self._saved_at = float("-inf")
+        self._refreshed_at = float("-inf")
+        self._load()
+        _caches.append(self)
+
+    def _read_index(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            self._index_mtime = os.stat(self.index_path).st_mtime_ns
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            self._index_mtime = None
+            return {}
+
+    def _index_changed(self) -> bool:
+        try:
+            return os.stat(self.index_path).st_mtime_ns != self._index_mtime
+        except FileNotFoundError:
+            return self._index_mtime is not None
+
+    @contextmanager
+    def _index_lock(self):
+        import fcntl
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        with open(f"{self.index_path}.lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _load(self):
+        try:
+            entries = self._read_index()
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load {self.name} cache index, starting empty: {e}")
+            return
+        for key, entry in sorted(entries.items(), key=lambda item: item[1].get("last_access", 0)):
+            self._entries[key] = entry
+            self._total_bytes += entry.get("size", 0)
+        if self._entries:
+            logger.info(f"Loaded {len(self._entries)} entries into {self.name} cache")
+
+    def _merge(self, disk: Dict[str, Dict[str, Any]]):
+        """Adopt the index on disk, keeping this process's pending changes and newer access times."""
+        merged: Dict[str, Dict[str, Any]] = {}
+        for key, entry in disk.items():
+            if key in self._removed and entry.get("created", 0) <= self._removed[key]:
+                continue
+            local = self._entries.get(key)
+            if local is not None and key in self._pending and local["created"] >= entry.get("created", 0):
+                entry = local
+            elif local is not None and local["created"] == entry.get("created"):
+                entry["last_access"] = max(entry.get("last_access", 0), local["last_access"])
+            merged[key] = entry
+        for key in self._pending:
+            if key not in merged and key in self._entries:
+                merged[key] = self._entries[key]
+        # Keys only in memory and not pending were removed by another process
+        self._entries = OrderedDict(sorted(merged.items(), key=lambda item: item[1].get("last_access", 0)))
+        self._total_bytes = sum(entry.get("size", 0) for entry in self._entries.values())
+        self._evict()
+
+    def _refresh(self):
+        if time.monotonic() - self._refreshed_at < self.flush_seconds or not self._index_changed():
+            return
+        self._refreshed_at = time.monotonic()
+        try:
+            with self._index_lock():
+                self._merge(self._read_index())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not reload {self.name} cache index: {e}")
+
+    def _save(self):
+        with self._index_lock():
+            try:
+                disk = self._read_index()
+            except ValueError as e:
+                logger.warning(f"Replacing unreadable {self.name} cache index: {e}")
+                disk = {}
+            self._merge(disk)
+            tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.index_path)
+            self._index_mtime = os.stat(self.index_path).st_mtime_ns
+        self._pending.clear()
+        self._removed.clear()
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def _changed(self):
+        # Rewriting the whole index per change would serialize every worker on the lock; flush() writes the rest
+        self._dirty = True
+        if time.monotonic() - self._saved_at >= self.flush_seconds:
+            self._save()
+
+    def _expired(self, entry: Dict[str, Any]) -> bool:
+        return self.ttl_seconds is not None and time.time() - entry["created"] > self.ttl_seconds
+
+    def _remove(self, key: str, evicted: bool = False, release: bool = True):
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry.get("size", 0)
+        self._pending.discard(key)
+        self._removed[key] = max(self._removed.get(key, 0), entry.get("created", 0))
+        if evicted:
+            self.evictions += 1
+        if release and self.on_evict:
+            try:
+                self.on_evict(key, entry["value"])
+            except Exception as e:
+                logger.warning(f"Failed to release evicted {self.name} cache entry {key}: {e}")
+
+    def _evict(self):
+        while self._entries and (
+            (self.max_entries is not None and len(self._entries) > self.max_entries)
+            or (self.max_bytes is not None and self._total_bytes > self.max_bytes)
+        ):
+            self._remove(next(iter(self._entries)), evicted=True)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._refresh()
+                entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if self._expired(entry):
+                self._remove(key, evicted=True)
+                self._changed()
+                self.misses += 1
+                return None
+            entry["last_access"] = time.time()
+            self._entries.move_to_end(key)
+            self._dirty = True
+            self.hits += 1
+            return entry["value"]
+
+    def set(self, key: str, value: Any, size: int = 0):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key, release=False)
+            now = time.time()
+            self._entries[key] = {"value": value, "size": size, "created": now, "last_access": now}
+            self._pending.add(key)
+            self._total_bytes += size
+            self._evict()
+            self._changed()
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+                self._changed()
+
+    def flush(self):
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one running task."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.coalesced = 0
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        _flights.append(self)
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # Shield so one caller disconnecting does not cancel the work for the others
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._in_flight), "coalesced": self.coalesced}
+
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    result = {cache.name: cache.stats() for cache in _caches}
+    for flight in _flights:
+        result.setdefault(flight.name, {}).update(flight.stats())
+    return result
+
+
+def flush_all():
+    for cache in _caches:
+        try:
+            cache.flush()
+        except OSError as e:
+            logger.warning(f"Failed to persist {cache.name} cache index: {e}")
+
+
+async def flush_forever():
+    while True:
+        await asyncio.sleep(max(settings.CACHE_FLUSH_SECONDS, 1))
+        try:
+            await run_io(flush_all)
+        except Exception as e:
+            logger.error(f"Cache flush failed: {e}")
+
+
+def start_flusher():
+    global _flusher
+    if _flusher is None or _flusher.done():
+        _flusher = asyncio.create_task(flush_forever())
+
+
+async def stop_flusher():
+    global _flusher
+    if _flusher is not None:
+        _flusher.cancel()
+        await asyncio.gather(_flusher, return_exceptions=True)
+        _flusher = None
@@ -7,16 +7,116 @@ load_dotenv()
 
 class Settings:
     GOOGLE_API_KEY = os.getenv("GOOGLE_GENAI_API_KEY")
+    # Unset means Google's own endpoint
+    GEMINI_API_BASE = os.getenv("GEMINI_API_BASE")
     HEYGEN_API_KEY = os.getenv('HEYGEN_API_KEY')
+    HEYGEN_API_BASE = os.getenv("HEYGEN_API_BASE", "https://api.heygen.com")
+    HEYGEN_CATALOG_TTL_SECONDS = float(os.getenv("HEYGEN_CATALOG_TTL_SECONDS", "600"))
+    HEYGEN_AVATARS_TIMEOUT = 40
+    HEYGEN_WEBHOOK_SECRET = os.getenv("HEYGEN_WEBHOOK_SECRET")
+    HEYGEN_WEBHOOK_STAND_IN = os.getenv("HEYGEN_WEBHOOK_STAND_IN", "false").lower() == "true"
+    VIDEO_STATUS_POLL_INTERVAL = float(os.getenv("VIDEO_STATUS_POLL_INTERVAL", "10"))
+    VIDEO_STATUS_HEARTBEAT = float(os.getenv("VIDEO_STATUS_HEARTBEAT", "15"))
+    VIDEO_STATUS_CACHE_SIZE = int(os.getenv("VIDEO_STATUS_CACHE_SIZE", "1000"))
+    HEYGEN_VOICES_TIMEOUT = 10
+    # One HeyGen video takes at most this many scenes and this much script; longer scene lists become several videos
+    HEYGEN_SEGMENT_MAX_SCENES = int(os.getenv("HEYGEN_SEGMENT_MAX_SCENES", "50"))
+    HEYGEN_SEGMENT_MAX_CHARS = int(os.getenv("HEYGEN_SEGMENT_MAX_CHARS", "9000"))
     CLOUDINARY_CLOUD_NAME = os.getenv("CLOUDINARY_CLOUD_NAME")
     CLOUDINARY_API_KEY = os.getenv("CLOUDINARY_API_KEY")
     CLOUDINARY_API_SECRET = os.getenv("CLOUDINARY_API_SECRET")
     TEMP_UPLOAD_DIR = "temp_uploads"
-    EXTRACTED_CONTENT_DIR = os.path.join(TEMP_UPLOAD_DIR, "extracted")
+    # Extracted slide images and extraction records, addressed by content hash (artifacts.py).
+    # "shared" keeps them on a volume every worker and node mounts, so any of them can serve any stage
+    ARTIFACT_STORE = os.getenv("ARTIFACT_STORE", "local").lower()
+    ARTIFACT_DIR = os.path.join(TEMP_UPLOAD_DIR, "artifacts")
+    ARTIFACT_SHARED_DIR = os.getenv("ARTIFACT_SHARED_DIR")
     LOGO_DIR = os.path.join(TEMP_UPLOAD_DIR, "logos")
+    LOGO_VARIANT_SIZES = [(90, 90)]
+    LOGO_MEMORY_CACHE_SIZE = int(os.getenv("LOGO_MEMORY_CACHE_SIZE", "32"))
     GENERATED_IMAGES_DIR = os.path.join(TEMP_UPLOAD_DIR, "generated_step4")
+    VIDEO_WIDTH = int(os.getenv("VIDEO_WIDTH", "1280"))
+    VIDEO_HEIGHT = int(os.getenv("VIDEO_HEIGHT", "720"))
+    IMAGE_OUTPUT_FORMAT = os.getenv("IMAGE_OUTPUT_FORMAT", "JPEG").upper()
+    IMAGE_OUTPUT_QUALITY = int(os.getenv("IMAGE_OUTPUT_QUALITY", "85"))
+    COMPOSITE_MAX_IN_FLIGHT = int(os.getenv("COMPOSITE_MAX_IN_FLIGHT", "2"))
     GENERATED_IMAGE_BASE_URL = "/api/generated_images"
-    MAX_SLIDES = 5
+    GENERATED_IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "cloudinary").lower()
+    STORAGE_UPLOAD_TIMEOUT = float(os.getenv("STORAGE_UPLOAD_TIMEOUT", "60"))
+    CLOUDINARY_API_BASE = os.getenv("CLOUDINARY_API_BASE", "https://api.cloudinary.com")
+    # Absolute URL prefix for locally stored files; HeyGen must be able to reach it
+    PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "http://localhost:8000")
+    CACHE_DIR = os.path.join(TEMP_UPLOAD_DIR, "cache")
+    # Longest a cache change waits before it is written to its shared index (and other workers' misses re-read it)
+    CACHE_FLUSH_SECONDS = float(os.getenv("CACHE_FLUSH_SECONDS", "2"))
+    EXTRACTION_CACHE_MAX_ENTRIES = int(os.getenv("EXTRACTION_CACHE_MAX_ENTRIES", "5000"))
+    # Parsed extractions kept in memory per worker for /api/generate-scenes by file_id
+    EXTRACTION_SESSION_MAX_ENTRIES = int(os.getenv("EXTRACTION_SESSION_MAX_ENTRIES", "256"))
+    SCENE_CACHE_MAX_ENTRIES = int(os.getenv("SCENE_CACHE_MAX_ENTRIES", "5000"))
+    SCENE_CACHE_TTL_SECONDS = float(os.getenv("SCENE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    IMAGE_CACHE_MAX_ENTRIES = int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "2000"))
+    IMAGE_CACHE_TTL_SECONDS = float(os.getenv("IMAGE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    LLM_IMAGE_MAX_EDGE = int(os.getenv("LLM_IMAGE_MAX_EDGE", "1024"))
+    LLM_IMAGE_JPEG_QUALITY = int(os.getenv("LLM_IMAGE_JPEG_QUALITY", "85"))
+    LLM_IMAGE_CACHE_DIR = os.path.join(CACHE_DIR, "llm_images")
+    LLM_IMAGE_CACHE_MAX_BYTES = int(os.getenv("LLM_IMAGE_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+    # Decks up to MAX_SLIDES are parsed at upload and narrated slide by slide; larger ones
+    # (up to LARGE_DECK_MAX_SLIDES) are narrated in windows with a rolling summary
+    MAX_SLIDES = int(os.getenv("MAX_SLIDES", "5"))
+    LARGE_DECK_MODE = os.getenv("LARGE_DECK_MODE", "true").lower() == "true"
+    LARGE_DECK_MAX_SLIDES = int(os.getenv("LARGE_DECK_MAX_SLIDES", "200"))
+    UPLOAD_MAX_SLIDES = max(MAX_SLIDES, LARGE_DECK_MAX_SLIDES) if LARGE_DECK_MODE else MAX_SLIDES
+    LARGE_DECK_WINDOW_SLIDES = int(os.getenv("LARGE_DECK_WINDOW_SLIDES", "10"))
+    LARGE_DECK_PARALLEL_WINDOWS = int(os.getenv("LARGE_DECK_PARALLEL_WINDOWS", "3"))
+    LARGE_DECK_CONTEXT_WINDOWS = int(os.getenv("LARGE_DECK_CONTEXT_WINDOWS", "3"))
+    LARGE_DECK_SUMMARY_WORDS = int(os.getenv("LARGE_DECK_SUMMARY_WORDS", "60"))
+    GEMINI_TEXT_MODEL = os.getenv("GEMINI_TEXT_MODEL", "gemini-2.0-flash")
+    GEMINI_IMAGE_MODEL = os.getenv("GEMINI_IMAGE_MODEL", "gemini-2.0-flash-exp-image-generation")
+    GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+    GEMINI_SLIDE_TIMEOUT = float(os.getenv("GEMINI_SLIDE_TIMEOUT", "60"))
+    SCENE_PACKING = os.getenv("SCENE_PACKING", "true").lower() == "true"
+    SCENE_PACK_TOKEN_BUDGET = int(os.getenv("SCENE_PACK_TOKEN_BUDGET", "8000"))
+    SCENE_PACK_MAX_SLIDES = int(os.getenv("SCENE_PACK_MAX_SLIDES", "8"))
+    SCENE_PACK_TIMEOUT = float(os.getenv("SCENE_PACK_TIMEOUT", "120"))
+    LLM_IMAGE_TOKEN_ESTIMATE = int(os.getenv("LLM_IMAGE_TOKEN_ESTIMATE", "258"))
+    IMAGE_BATCH_CONCURRENCY = int(os.getenv("IMAGE_BATCH_CONCURRENCY", "3"))
+    # Per-upstream quotas (requests per second, 0 for none; burst) and ceilings for the adaptive
+    # in-flight limit, see upstream.py. Set the rates to the project's actual quota tier.
+    GEMINI_RATE_LIMIT = float(os.getenv("GEMINI_RATE_LIMIT", "30"))
+    GEMINI_BURST = float(os.getenv("GEMINI_BURST", "30"))
+    GEMINI_MAX_IN_FLIGHT = int(os.getenv("GEMINI_MAX_IN_FLIGHT", "16"))
+    GEMINI_IMAGE_RATE_LIMIT = float(os.getenv("GEMINI_IMAGE_RATE_LIMIT", "15"))
+    GEMINI_IMAGE_BURST = float(os.getenv("GEMINI_IMAGE_BURST", "15"))
+    GEMINI_IMAGE_MAX_IN_FLIGHT = int(os.getenv("GEMINI_IMAGE_MAX_IN_FLIGHT", "8"))
+    HEYGEN_RATE_LIMIT = float(os.getenv("HEYGEN_RATE_LIMIT", "5"))
+    HEYGEN_BURST = float(os.getenv("HEYGEN_BURST", "10"))
+    HEYGEN_MAX_IN_FLIGHT = int(os.getenv("HEYGEN_MAX_IN_FLIGHT", "8"))
+    UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "4"))
+    UPSTREAM_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "1"))
+    UPSTREAM_BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", "60"))
+    # Unset keeps the quotas per process; set to a directory shared by all uvicorn workers to enforce them together
+    UPSTREAM_STATE_DIR = os.getenv("UPSTREAM_STATE_DIR")
+    JOBS_DIR = os.path.join(TEMP_UPLOAD_DIR, "jobs")
+    JOB_AUTO_RESUME = os.getenv("JOB_AUTO_RESUME", "true").lower() == "true"
+    JOB_VIDEO_TIMEOUT = float(os.getenv("JOB_VIDEO_TIMEOUT", "1800"))
+    JANITOR_ENABLED = os.getenv("JANITOR_ENABLED", "true").lower() == "true"
+    JANITOR_INTERVAL_SECONDS = float(os.getenv("JANITOR_INTERVAL_SECONDS", "600"))
+    JANITOR_MAX_BYTES = int(os.getenv("JANITOR_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+    JANITOR_MIN_AGE_SECONDS = float(os.getenv("JANITOR_MIN_AGE_SECONDS", "600"))
+    JANITOR_UPLOAD_TTL_SECONDS = float(os.getenv("JANITOR_UPLOAD_TTL_SECONDS", str(24 * 3600)))
+    JANITOR_EXTRACTED_TTL_SECONDS = float(os.getenv("JANITOR_EXTRACTED_TTL_SECONDS", str(7 * 24 * 3600)))
+    JANITOR_LOGO_TTL_SECONDS = float(os.getenv("JANITOR_LOGO_TTL_SECONDS", str(30 * 24 * 3600)))
+    JANITOR_GENERATED_TTL_SECONDS = float(os.getenv("JANITOR_GENERATED_TTL_SECONDS", str(30 * 24 * 3600)))
+    # A shared artifact store is only swept where this is true; enable it on exactly one node
+    JANITOR_SWEEP_SHARED_ARTIFACTS = os.getenv("JANITOR_SWEEP_SHARED_ARTIFACTS", "false").lower() == "true"
+    IO_THREAD_POOL_SIZE = int(os.getenv("IO_THREAD_POOL_SIZE", "16"))
+    CONVERTED_DIR = os.path.join(TEMP_UPLOAD_DIR, "converted")
+    CONVERSION_CACHE_MAX_BYTES = int(os.getenv("CONVERSION_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    CONVERTER_WORKERS = int(os.getenv("CONVERTER_WORKERS", "2"))
+    CONVERTER_JOB_TIMEOUT = float(os.getenv("CONVERTER_JOB_TIMEOUT", "120"))
+    CONVERTER_START_TIMEOUT = float(os.getenv("CONVERTER_START_TIMEOUT", "60"))
+    CPU_PROCESS_POOL_SIZE = int(os.getenv("CPU_PROCESS_POOL_SIZE", str(max(1, (os.cpu_count() or 2) // 2))))
     ALLOWED_EXTENSIONS = {".pptx", ".ppt"}
     LOG_DIR = "logs"
     origins = ["*"]
@@ -0,0 +1,228 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+from config import settings, logger
+from cache import PersistentCache, SingleFlight
+from executor import run_io
+from metrics import stage_timer
+import startup
+
+
+class ConversionError(Exception):
+    pass
+
+
+def convert_ppt_to_pptx(source_path: str, target_path: str) -> str:
+    from spire.presentation import Presentation as SpirePresentation, FileFormat
+    # Load the PPT file with Spire.Presentation and save it as PPTX
+    spire_pptx = SpirePresentation()
+    try:
+        spire_pptx.LoadFromFile(source_path)
+        spire_pptx.SaveToFile(target_path, FileFormat.Pptx2019)
+    finally:
+        spire_pptx.Dispose()  # Close the presentation
+    return target_path
+
+
+def conversion_worker_main(conn):
+    # Load the Spire runtime once per worker instead of once per file
+    from spire.presentation import Presentation as SpirePresentation
+    SpirePresentation().Dispose()
+    conn.send(("ready", os.getpid()))
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        source_path, target_path = job
+        try:
+            conn.send(("ok", convert_ppt_to_pptx(source_path, target_path)))
+        except Exception as e:
+            conn.send(("error", str(e)))
+
+
+class ConversionWorker:
+    """One long-lived Spire process; a crash or timeout only costs this worker."""
+
+    def __init__(self, index: int, target: Callable = conversion_worker_main):
+        self.index = index
+        self.target = target
+        self.process = None
+        self.conn = None
+
+    def start(self):
+        context = multiprocessing.get_context("spawn")
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=self.target,
+            args=(child_conn,),
+            name=f"ppt-converter-{self.index}",
+            daemon=True
+        )
+        started = time.perf_counter()
+        self.process.start()
+        child_conn.close()
+        if not self.conn.poll(settings.CONVERTER_START_TIMEOUT):
+            self.kill()
+            raise ConversionError(f"Conversion worker {self.index} did not start")
+        self.conn.recv()
+        # Process spawn plus the Spire runtime load, the cold start of every (re)started worker
+        startup.record("converter_worker_start", time.perf_counter() - started)
+        logger.info(f"Started conversion worker {self.index} (pid {self.process.pid}) in {time.perf_counter() - started:.2f}s")
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def kill(self):
+        if self.process is not None and self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=5)
+        if self.conn is not None:
+            self.conn.close()
+        self.process = None
+        self.conn = None
+
+    def stop(self):
+        if self.is_alive():
+            try:
+                self.conn.send(None)
+                self.process.join(timeout=5)
+            except (OSError, EOFError):
+                pass
+        self.kill()
+
+    def convert(self, source_path: str, target_path: str, timeout: float) -> str:
+        """Blocking; run on the I/O pool."""
+        if not self.is_alive():
+            self.start()
+        try:
+            self.conn.send((source_path, target_path))
+            if not self.conn.poll(timeout):
+                self.kill()
+                raise ConversionError(f"Conversion timed out after {timeout}s")
+            status, payload = self.conn.recv()
+        except (EOFError, OSError) as e:
+            exit_code = None
+            if self.process is not None:
+                self.process.join(timeout=1)
+                exit_code = self.process.exitcode
+            self.kill()
+            raise ConversionError(f"Conversion worker {self.index} crashed (exit code {exit_code}): {e}")
+        if status != "ok":
+            raise ConversionError(payload)
+        return payload
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def remove_converted_file(key: str, path: str):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+class ConversionService:
+    """Pool of warm Spire worker processes with a job queue and a result cache keyed by input hash."""
+
+    def __init__(self, size: int, worker_target: Callable = conversion_worker_main):
+        self.size = size
+        self.worker_target = worker_target
+        self.workers: List[ConversionWorker] = []
+        self.idle: Optional[asyncio.Queue] = None
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.results = PersistentCache(
+            "conversions",
+            os.path.join(settings.CACHE_DIR, "conversions.json"),
+            max_bytes=settings.CONVERSION_CACHE_MAX_BYTES,
+            on_evict=remove_converted_file
+        )
+        self.flights = SingleFlight("conversion_jobs")
+        self.warmups: List[asyncio.Task] = []
+
+    def ensure_workers(self):
+        if self.idle is None:
+            self.idle = asyncio.Queue()
+            self.workers = [ConversionWorker(index, self.worker_target) for index in range(self.size)]
+            for worker in self.workers:
+                self.idle.put_nowait(worker)
+
+    async def warm_worker(self, worker: ConversionWorker):
+        try:
+            await run_io(worker.start)
+        except Exception as e:
+            logger.warning(f"Could not warm conversion worker {worker.index}: {e}")
+        finally:
+            self.idle.put_nowait(worker)
+
+    def warm(self):
+        # Start every worker in the background so the first .ppt upload does not pay Spire's start-up cost
+        self.ensure_workers()
+        for worker in self.workers:
+            self.idle.get_nowait()
+            self.warmups.append(asyncio.create_task(self.warm_worker(worker)))
+
+    async def run_job(self, digest: str, source_path: str) -> str:
+        os.makedirs(settings.CONVERTED_DIR, exist_ok=True)
+        target_path = os.path.join(settings.CONVERTED_DIR, f"{digest}.pptx")
+        partial_path = os.path.join(settings.CONVERTED_DIR, f"{digest}.{uuid.uuid4()}.partial.pptx")
+        self.ensure_workers()
+        self.waiting += 1
+        try:
+            worker = await self.idle.get()
+        finally:
+            self.waiting -= 1
+        try:
+            with stage_timer("ppt_conversion"):
+                await run_io(worker.convert, source_path, partial_path, settings.CONVERTER_JOB_TIMEOUT)
+            os.replace(partial_path, target_path)
+            self.completed += 1
+        except Exception:
+            self.failed += 1
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+        finally:
+            self.idle.put_nowait(worker)
+        await run_io(self.results.set, digest, target_path, os.path.getsize(target_path))
+        return target_path
+
+    async def convert(self, source_path: str, digest: Optional[str] = None) -> str:
+        """Return the path of a PPTX conversion of `source_path`, owned by the result cache."""
+        if digest is None:
+            digest = await run_io(file_digest, source_path)
+        cached_path = await run_io(self.results.get, digest)
+        if cached_path is not None and os.path.exists(cached_path):
+            logger.info(f"Conversion cache hit for {digest}")
+            return cached_path
+        return await self.flights.run(digest, lambda: self.run_job(digest, source_path))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.size,
+            "alive": sum(1 for worker in self.workers if worker.is_alive()),
+            "queue_depth": self.waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+    def shutdown(self):
+        for task in self.warmups:
+            task.cancel()
+        for worker in self.workers:
+            worker.stop()
+
+
+conversion_service = ConversionService(settings.CONVERTER_WORKERS)
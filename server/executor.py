@@ -0,0 +1,150 @@
+import asyncio
+import functools
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict
+from config import settings, logger
+
+
+class WorkerPool:
+    """Lazily created executor that tracks how much work is queued on it."""
+
+    def __init__(self, name: str, size: int, factory: Callable[[int], Executor]):
+        self.name = name
+        self.size = size
+        self._factory = factory
+        self._executor = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._factory(self.size)
+                logger.info(f"Started {self.name} pool with {self.size} workers")
+            return self._executor
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        call = functools.partial(fn, *args, **kwargs)
+        self.in_flight += 1
+        try:
+            result = await loop.run_in_executor(self._get_executor(), call)
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": self.size,
+            "in_flight": self.in_flight,
+            "queue_depth": max(0, self.in_flight - self.size),
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+                logger.info(f"Stopped {self.name} pool")
+
+
+io_pool = WorkerPool(
+    "io",
+    settings.IO_THREAD_POOL_SIZE,
+    lambda size: ThreadPoolExecutor(max_workers=size, thread_name_prefix="io-worker")
+)
+cpu_pool = WorkerPool(
+    "cpu",
+    settings.CPU_PROCESS_POOL_SIZE,
+    # spawn avoids forking a process that already runs the event loop and SDK threads
+    lambda size: ProcessPoolExecutor(max_workers=size, mp_context=multiprocessing.get_context("spawn"))
+)
+
+
+async def run_io(fn: Callable, *args, **kwargs) -> Any:
+    """Run a blocking network/file call (SDK uploads, HTTP, disk) on the thread pool."""
+    return await io_pool.run(fn, *args, **kwargs)
+
+
+async def run_cpu(fn: Callable, *args, **kwargs) -> Any:
+    """Run CPU-heavy work (pptx parsing) on the process pool.
+
+    `fn` and its arguments must be picklable, i.e. module-level functions.
+    """
+    return await cpu_pool.run(fn, *args, **kwargs)
+
+
+_manager = None
+_manager_lock = threading.Lock()
+_EMPTY = object()
+
+
+def shared_queue() -> Any:
+    """A queue that process pool tasks can write to; a plain multiprocessing.Queue cannot be passed to them."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = multiprocessing.get_context("spawn").Manager()
+        return _manager.Queue()
+
+
+def _get(results: Any, timeout: float) -> Any:
+    try:
+        return results.get(True, timeout)
+    except queue.Empty:
+        return _EMPTY
+
+
+async def stream_cpu(fn: Callable, *args) -> AsyncIterator[Any]:
+    """Run `fn(queue, *args)` on the process pool and yield what it puts on the queue, as it puts it.
+
+    The task's own exception, if any, is raised once everything it put has been yielded.
+    """
+    results = await run_io(shared_queue)
+    task = asyncio.ensure_future(run_cpu(fn, results, *args))
+    try:
+        while True:
+            # Bounded waits, so a worker that dies without putting anything does not hang the reader
+            item = await run_io(_get, results, 0.2)
+            if item is not _EMPTY:
+                yield item
+                continue
+            if not task.done():
+                continue
+            # Every put happened before the task finished, so whatever is left is already queued
+            while True:
+                try:
+                    item = results.get_nowait()
+                except queue.Empty:
+                    break
+                yield item
+            task.result()
+            return
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    return {"io": io_pool.stats(), "cpu": cpu_pool.stats()}
+
+
+def shutdown():
+    global _manager
+    io_pool.shutdown()
+    cpu_pool.shutdown()
+    with _manager_lock:
+        if _manager is not None:
+            _manager.shutdown()
+            _manager = None
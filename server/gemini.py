@@ -0,0 +1,110 @@
+import asyncio
+import threading
+from typing import Any, List, Optional
+from config import settings, logger
+from executor import run_io
+import startup
+
+_client: Any = None
+_client_lock = threading.Lock()
+_warmup: Optional[asyncio.Task] = None
+_scene_model: Optional["SceneModel"] = None
+
+
+def create_client() -> Any:
+    """The process-wide google-genai client.
+
+    The SDK takes over half a second to import, so it is only imported here,
+    on the I/O pool, the first time a client is needed.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            with startup.timed("import_google_genai"):
+                from google import genai
+            http_options = genai.types.HttpOptions(base_url=settings.GEMINI_API_BASE) if settings.GEMINI_API_BASE else None
+            with startup.timed("gemini_client"):
+                _client = genai.Client(api_key=settings.GOOGLE_API_KEY, http_options=http_options)
+        return _client
+
+
+async def get_client() -> Any:
+    if _client is not None:
+        return _client
+    return await run_io(create_client)
+
+
+def content_part(part: Any) -> Any:
+    """A prompt part for the SDK: strings pass through, prepared image blobs become inline byte parts."""
+    if isinstance(part, dict):
+        from google.genai import types
+        return types.Part.from_bytes(data=part["data"], mime_type=part["mime_type"])
+    return part
+
+
+class SceneModel:
+    """Scene generation on the shared client: JSON answers from GEMINI_TEXT_MODEL with the app's safety settings.
+
+    `generate` returns the SDK's GenerateContentResponse (read through
+    `.candidates` and `.text`) and raises google.genai.errors.APIError,
+    whose `code` and RetryInfo details upstream.py uses for retries.
+    """
+
+    def __init__(self, client):
+        from google.genai import types
+        self.client = client
+        self.config = types.GenerateContentConfig(
+            response_mime_type="application/json",
+            safety_settings=[
+                types.SafetySetting(category=category, threshold=types.HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE)
+                for category in (
+                    types.HarmCategory.HARM_CATEGORY_HATE_SPEECH,
+                    types.HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT,
+                    types.HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT,
+                    types.HarmCategory.HARM_CATEGORY_HARASSMENT,
+                )
+            ]
+        )
+
+    async def generate(self, prompt_parts: List[Any]):
+        return await self.client.aio.models.generate_content(
+            model=settings.GEMINI_TEXT_MODEL,
+            contents=[content_part(part) for part in prompt_parts],
+            config=self.config
+        )
+
+
+async def get_scene_model() -> SceneModel:
+    # Built once per process on top of the shared client
+    global _scene_model
+    if _scene_model is None:
+        _scene_model = SceneModel(await get_client())
+    return _scene_model
+
+
+async def warm_client():
+    try:
+        await get_client()
+        startup.mark("gemini_ready")
+    except Exception as e:
+        logger.warning(f"Preparing the Gemini client failed: {e}")
+
+
+def warm():
+    """Start building the client in the background so startup does not wait for the SDK import."""
+    global _warmup
+    if settings.GOOGLE_API_KEY and _warmup is None:
+        _warmup = asyncio.create_task(warm_client())
+
+
+async def close():
+    global _client, _warmup, _scene_model
+    _scene_model = None
+    if _warmup is not None:
+        _warmup.cancel()
+        await asyncio.gather(_warmup, return_exceptions=True)
+        _warmup = None
+    if _client is not None:
+        await _client.aio.aclose()
+        _client.close()
+        _client = None
@@ -0,0 +1,166 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+import aiohttp
+from config import settings, logger
+from cache import SingleFlight
+from http_client import get_session
+from metrics import count_bytes
+import upstream
+import json
+
+
+class HeyGenError(Exception):
+    def __init__(self, status_code: int, details: str, retry_after: Optional[str] = None):
+        super().__init__(f"HeyGen API returned {status_code}: {details}")
+        self.status_code = status_code
+        self.details = details
+        self.retry_after = retry_after
+
+
+def api_headers() -> Dict[str, str]:
+    return {
+        "accept": "application/json",
+        "x-api-key": settings.HEYGEN_API_KEY or ""
+    }
+
+
+async def request_json(method: str, path: str, timeout: Optional[float] = None, **kwargs) -> Dict[str, Any]:
+    headers = {**api_headers(), **kwargs.pop("headers", {})}
+
+    async def attempt() -> Dict[str, Any]:
+        if "json" in kwargs:
+            count_bytes("heygen", sent=len(json.dumps(kwargs["json"])))
+        async with get_session().request(
+            method,
+            f"{settings.HEYGEN_API_BASE}{path}",
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=timeout),
+            **kwargs
+        ) as response:
+            body = await response.read()
+            count_bytes("heygen", received=len(body))
+            if response.status >= 400:
+                raise HeyGenError(response.status, body.decode(errors="replace"), response.headers.get("Retry-After"))
+            return json.loads(body)
+
+    # A POST that failed with a 5xx may still have created a video, so only rejected ones are retried
+    retry_statuses = upstream.RETRY_STATUSES if method == "GET" else upstream.REJECTED_STATUSES
+    return await upstream.heygen.call(path, attempt, retry_statuses=retry_statuses)
+
+
+async def generate_video(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return await request_json(
+        "POST",
+        "/v2/video/generate",
+        json=payload,
+        headers={"content-type": "application/json"}
+    )
+
+
+async def get_video_status(video_id: str) -> Dict[str, Any]:
+    return await request_json("GET", "/v1/video_status.get", params={"video_id": video_id})
+
+
+class CatalogCache:
+    """In-memory HeyGen catalog served stale-while-revalidate.
+
+    A fresh copy is returned as is; a stale copy is returned immediately while a
+    single background refresh runs. Refreshes are conditional (ETag /
+    Last-Modified) so an unchanged catalog costs a 304 instead of a full body.
+    """
+
+    def __init__(self, name: str, path: str, data_key: str, timeout: float):
+        self.name = name
+        self.path = path
+        self.data_key = data_key
+        self.timeout = timeout
+        self.items: Optional[List[Any]] = None
+        self.fetched_at = 0.0
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._refreshes = SingleFlight(f"heygen_{name}_refresh")
+        self._background: Optional[asyncio.Task] = None
+
+    def is_fresh(self) -> bool:
+        return self.items is not None and time.monotonic() - self.fetched_at < settings.HEYGEN_CATALOG_TTL_SECONDS
+
+    async def fetch_once(self):
+        headers = api_headers()
+        if self.items is not None:
+            if self.etag:
+                headers["If-None-Match"] = self.etag
+            if self.last_modified:
+                headers["If-Modified-Since"] = self.last_modified
+        async with get_session().get(
+            f"{settings.HEYGEN_API_BASE}{self.path}",
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        ) as response:
+            if response.status == 304 and self.items is not None:
+                self.not_modified += 1
+            elif response.status >= 400:
+                raise HeyGenError(response.status, await response.text(), response.headers.get("Retry-After"))
+            else:
+                body = await response.read()
+                count_bytes("heygen", received=len(body))
+                response_data = json.loads(body)
+                self.items = response_data.get("data", {}).get(self.data_key, [])
+                self.etag = response.headers.get("ETag")
+                self.last_modified = response.headers.get("Last-Modified")
+
+    async def fetch(self) -> List[Any]:
+        await upstream.heygen.call(self.path, self.fetch_once)
+        self.fetched_at = time.monotonic()
+        logger.info(f"HeyGen {self.name} catalog refreshed ({len(self.items)} items)")
+        return self.items
+
+    async def refresh(self) -> List[Any]:
+        return await self._refreshes.run(self.name, self.fetch)
+
+    async def refresh_in_background(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.warning(f"Background refresh of HeyGen {self.name} catalog failed: {e}")
+
+    def schedule_refresh(self):
+        if self._background is None or self._background.done():
+            self._background = asyncio.create_task(self.refresh_in_background())
+
+    async def get(self) -> List[Any]:
+        if self.is_fresh():
+            self.hits += 1
+            return self.items
+        if self.items is not None:
+            self.hits += 1
+            self.schedule_refresh()
+            return self.items
+        self.misses += 1
+        return await self.refresh()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "items": len(self.items) if self.items is not None else 0,
+            "age_seconds": round(time.monotonic() - self.fetched_at, 1) if self.items is not None else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+        }
+
+
+avatars = CatalogCache("avatars", "/v2/avatars", "avatars", settings.HEYGEN_AVATARS_TIMEOUT)
+voices = CatalogCache("voices", "/v2/voices", "voices", settings.HEYGEN_VOICES_TIMEOUT)
+
+
+def warm_catalogs():
+    if settings.HEYGEN_API_KEY:
+        avatars.schedule_refresh()
+        voices.schedule_refresh()
+
+
+def stats() -> Dict[str, Any]:
+    return {"avatars": avatars.stats(), "voices": voices.stats()}
@@ -0,0 +1,74 @@
+import hashlib
+import os
+from io import BytesIO
+from typing import Any, Dict, Optional
+from PIL import Image
+from config import settings, logger
+from cache import PersistentCache
+
+# Formats Gemini accepts inline; anything else (GIF, BMP, WMF, TIFF...) is re-encoded
+PASSTHROUGH_FORMATS = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+# Bump when prepare_bytes or encode_image change what they produce, so cached blobs are not reused
+PREPARE_VERSION = 1
+
+
+def remove_prepared_image(key: str, prepared: Dict[str, Any]):
+    if os.path.exists(prepared["path"]):
+        os.remove(prepared["path"])
+
+
+prepared_images = PersistentCache(
+    "llm_images",
+    os.path.join(settings.CACHE_DIR, "llm_images.json"),
+    max_bytes=settings.LLM_IMAGE_CACHE_MAX_BYTES,
+    on_evict=remove_prepared_image
+)
+
+
+def encode_image(img: Image.Image) -> Dict[str, Any]:
+    buffer = BytesIO()
+    if img.mode in ("RGBA", "LA", "P"):
+        img.convert("RGBA").save(buffer, format="PNG", optimize=True)
+        return {"mime_type": "image/png", "data": buffer.getvalue()}
+    img.convert("RGB").save(buffer, format="JPEG", quality=settings.LLM_IMAGE_JPEG_QUALITY)
+    return {"mime_type": "image/jpeg", "data": buffer.getvalue()}
+
+
+def prepare_bytes(data: bytes) -> Dict[str, Any]:
+    """Downscale to LLM_IMAGE_MAX_EDGE; images that are already small and supported keep their original bytes."""
+    max_edge = settings.LLM_IMAGE_MAX_EDGE
+    with Image.open(BytesIO(data)) as img:
+        mime_type = PASSTHROUGH_FORMATS.get(img.format)
+        if mime_type and max(img.size) <= max_edge:
+            return {"mime_type": mime_type, "data": data}
+        img.draft("RGB", (max_edge, max_edge))
+        img = img.copy()
+        img.thumbnail((max_edge, max_edge))
+        return encode_image(img)
+
+
+def prepare_image(data: bytes, name: str) -> Optional[Dict[str, Any]]:
+    """Return an inline blob part for the image bytes, cached by content hash across requests."""
+    key = ":".join([
+        hashlib.sha256(data).hexdigest(),
+        str(settings.LLM_IMAGE_MAX_EDGE),
+        str(settings.LLM_IMAGE_JPEG_QUALITY),
+        f"v{PREPARE_VERSION}",
+    ])
+    cached = prepared_images.get(key)
+    if cached is not None and os.path.exists(cached["path"]):
+        with open(cached["path"], "rb") as f:
+            return {"mime_type": cached["mime_type"], "data": f.read()}
+    try:
+        prepared = prepare_bytes(data)
+    except Exception as e:
+        logger.warning(f"Could not prepare image {name} for the LLM: {e}")
+        return None
+    os.makedirs(settings.LLM_IMAGE_CACHE_DIR, exist_ok=True)
+    prepared_path = os.path.join(settings.LLM_IMAGE_CACHE_DIR, key.replace(":", "_"))
+    with open(prepared_path, "wb") as f:
+        f.write(prepared["data"])
+    prepared_images.set(key, {"path": prepared_path, "mime_type": prepared["mime_type"]}, size=len(prepared["data"]))
+    if len(prepared["data"]) < len(data):
+        logger.info(f"Prepared {name} for the LLM: {len(data)} -> {len(prepared['data'])} bytes")
+    return prepared
@@ -0,0 +1,212 @@
+import asyncio
+import os
+import shutil
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+from config import settings, logger
+from executor import run_io
+from artifacts import artifact_store
+
+
+class JanitorArea:
+    """One directory the janitor owns and how it is split into removable units.
+
+    `files` groups the top-level files of `root` by name stem (an upload and its
+    manifest go together), `dirs` treats each child directory as one unit and
+    `tree` treats every file below `root` as its own unit.
+    """
+
+    def __init__(self, name: str, root: str, layout: str, ttl_seconds: float):
+        self.name = name
+        self.root = root
+        self.layout = layout
+        self.ttl_seconds = ttl_seconds
+
+    def scan(self) -> List[Dict[str, Any]]:
+        if not os.path.isdir(self.root):
+            return []
+        if self.layout == "files":
+            groups: Dict[str, List[str]] = {}
+            for entry in os.scandir(self.root):
+                if entry.is_file():
+                    groups.setdefault(entry.name.split(".")[0], []).append(entry.path)
+            return self.units(groups.values())
+        if self.layout == "dirs":
+            return self.units([entry.path] for entry in os.scandir(self.root) if entry.is_dir())
+        return self.units(
+            [os.path.join(dirpath, name)]
+            for dirpath, _, filenames in os.walk(self.root)
+            for name in filenames
+        )
+
+    def units(self, path_groups) -> List[Dict[str, Any]]:
+        units = []
+        for paths in path_groups:
+            try:
+                units.append(self.unit(paths))
+            except OSError:
+                # Removed by its owner while we were scanning
+                continue
+        return units
+
+    def unit(self, paths: List[str]) -> Dict[str, Any]:
+        size, last_used = 0, 0.0
+        for path in paths:
+            stats = [os.stat(path)] if os.path.isfile(path) else [
+                os.stat(os.path.join(dirpath, name))
+                for dirpath, _, filenames in os.walk(path)
+                for name in filenames
+            ] or [os.stat(path)]
+            for stat in stats:
+                size += stat.st_size
+                # atime is only as good as the mount's atime policy, so mtime is the floor
+                last_used = max(last_used, stat.st_mtime, stat.st_atime)
+        return {"area": self, "paths": paths, "size": size, "last_used": last_used}
+
+
+def remove_unit(unit: Dict[str, Any]):
+    for path in unit["paths"]:
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
+    area = unit["area"]
+    if area.layout == "tree":
+        # Drop directories the removal left empty, but never the area root itself
+        parent = os.path.dirname(unit["paths"][0])
+        while os.path.realpath(parent) != os.path.realpath(area.root) and not os.listdir(parent):
+            os.rmdir(parent)
+            parent = os.path.dirname(parent)
+
+
+class Janitor:
+    """Background sweeper for temp_uploads: per-area TTLs, then LRU eviction down to a byte quota.
+
+    Anything `protected()` returns (absolute real paths in use by active jobs)
+    and anything touched within JANITOR_MIN_AGE_SECONDS is never removed.
+    """
+
+    def __init__(self, areas: List[JanitorArea], max_bytes: int, interval_seconds: float, min_age_seconds: float):
+        self.areas = areas
+        self.max_bytes = max_bytes
+        self.interval_seconds = interval_seconds
+        self.min_age_seconds = min_age_seconds
+        self.protected: Callable[[], Set[str]] = set
+        self.reclaimed_bytes = 0
+        self.reclaimed_units = 0
+        self.expired_units = 0
+        self.evicted_units = 0
+        self.runs = 0
+        self.last_run_at: Optional[float] = None
+        self.last_duration_seconds: Optional[float] = None
+        self.usage: Dict[str, Dict[str, int]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def is_protected(self, unit: Dict[str, Any], protected: Set[str]) -> bool:
+        return any(os.path.realpath(path) in protected for path in unit["paths"])
+
+    def remove(self, unit: Dict[str, Any], reason: str) -> bool:
+        try:
+            remove_unit(unit)
+        except OSError as e:
+            logger.warning(f"Janitor could not remove {unit['paths']}: {e}")
+            return False
+        self.reclaimed_bytes += unit["size"]
+        self.reclaimed_units += 1
+        logger.info(f"Janitor removed {reason} {unit['area'].name} entry {unit['paths'][0]} ({unit['size']} bytes)")
+        return True
+
+    def sweep(self, protected: Set[str]):
+        started = time.time()
+        units = [unit for area in self.areas for unit in area.scan()]
+        kept = []
+        for unit in units:
+            if not self.is_protected(unit, protected) and started - unit["last_used"] > unit["area"].ttl_seconds:
+                if self.remove(unit, "expired"):
+                    self.expired_units += 1
+                    continue
+            kept.append(unit)
+
+        total = sum(unit["size"] for unit in kept)
+        if total > self.max_bytes:
+            candidates = sorted(
+                (
+                    unit for unit in kept
+                    if not self.is_protected(unit, protected) and started - unit["last_used"] > self.min_age_seconds
+                ),
+                key=lambda unit: unit["last_used"]
+            )
+            for unit in candidates:
+                if total <= self.max_bytes:
+                    break
+                if self.remove(unit, "least recently used"):
+                    self.evicted_units += 1
+                    total -= unit["size"]
+                    kept.remove(unit)
+            if total > self.max_bytes:
+                logger.warning(f"Janitor could not bring temp storage under quota: {total} > {self.max_bytes} bytes")
+
+        self.usage = {area.name: {"bytes": 0, "entries": 0} for area in self.areas}
+        for unit in kept:
+            self.usage[unit["area"].name]["bytes"] += unit["size"]
+            self.usage[unit["area"].name]["entries"] += 1
+        self.runs += 1
+        self.last_run_at = started
+        self.last_duration_seconds = round(time.time() - started, 3)
+
+    async def run_once(self):
+        await run_io(self.sweep, self.protected())
+
+    async def run_forever(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Janitor sweep failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self, protected: Callable[[], Set[str]]):
+        self.protected = protected
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "usage": self.usage,
+            "total_bytes": sum(area["bytes"] for area in self.usage.values()),
+            "max_bytes": self.max_bytes,
+            "reclaimed_bytes": self.reclaimed_bytes,
+            "reclaimed_entries": self.reclaimed_units,
+            "expired_entries": self.expired_units,
+            "evicted_entries": self.evicted_units,
+            "runs": self.runs,
+            "last_run_at": self.last_run_at,
+            "last_duration_seconds": self.last_duration_seconds,
+        }
+
+
+def default_areas() -> List[JanitorArea]:
+    areas = [
+        JanitorArea("uploads", settings.TEMP_UPLOAD_DIR, "files", settings.JANITOR_UPLOAD_TTL_SECONDS),
+        JanitorArea("logos", settings.LOGO_DIR, "dirs", settings.JANITOR_LOGO_TTL_SECONDS),
+        JanitorArea("generated_images", settings.GENERATED_IMAGES_DIR, "tree", settings.JANITOR_GENERATED_TTL_SECONDS),
+    ]
+    # Protected paths only cover this node's jobs, so a store every node mounts
+    # is left to the one node that opts in rather than swept by all of them
+    if artifact_store.name != "shared" or settings.JANITOR_SWEEP_SHARED_ARTIFACTS:
+        areas.insert(1, JanitorArea("artifacts", artifact_store.root, "tree", settings.JANITOR_EXTRACTED_TTL_SECONDS))
+    return areas
+
+
+janitor = Janitor(
+    default_areas(),
+    max_bytes=settings.JANITOR_MAX_BYTES,
+    interval_seconds=settings.JANITOR_INTERVAL_SECONDS,
+    min_age_seconds=settings.JANITOR_MIN_AGE_SECONDS
+)
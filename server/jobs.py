@@ -0,0 +1,507 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import IO, AsyncIterator, Dict, List, Optional, Set
+from fastapi import HTTPException
+from config import settings, logger
+from executor import run_io
+from models import JobCreateRequest, JobState, JobStatusResponse, StageProgress, Scene, SlideData, VideoSegment
+from routes.extract import (
+    get_prepared_extraction, release_upload, prepare_extraction, iter_extraction, save_extraction, remove_uploaded_files
+)
+from routes.generate import (
+    build_scene_model, generate_slide_scenes, render_scene_image, is_large_deck, DeckNarrative, generate_window_scenes,
+    is_placeholder
+)
+from routes.video import submit_video_segment, split_video_segments
+from utils import manifest_path, read_manifest
+from artifacts import artifact_store
+from logo_store import logo_dir, logo_keys
+from video_status import video_tracker
+from metrics import STAGE_LATENCY
+
+STAGES = ["extract", "scenes", "images", "video"]
+
+
+class StageTimer:
+    def __init__(self, job: JobState, stage: str):
+        self.stage = stage
+        self.progress = job.stages[stage]
+
+    def start(self):
+        if self.progress.started_at is None:
+            self.progress.started_at = time.time()
+        self.progress.status = "running"
+
+    def finish(self, status: str = "completed", error: Optional[str] = None):
+        self.progress.status = status
+        self.progress.error = error
+        self.progress.finished_at = time.time()
+        if self.progress.started_at is not None:
+            self.progress.duration_seconds = round(self.progress.finished_at - self.progress.started_at, 3)
+            STAGE_LATENCY.labels(f"job_{self.stage}").observe(self.progress.duration_seconds)
+
+
+class JobManager:
+    """Runs upload-to-video jobs server-side as a pipeline of overlapping stages.
+
+    Scene generation for a slide starts as soon as that slide is extracted and
+    image generation for a scene starts as soon as its script exists. Every
+    finished unit of work is checkpointed to JOBS_DIR so a resumed job only
+    redoes what was still missing. A worker runs a job only while it holds the
+    flock on the job's claim file; the kernel drops it when the worker dies, so
+    of several workers (or a respawned one) exactly one resumes each job.
+    """
+
+    def __init__(self):
+        self.jobs: Dict[str, JobState] = {}
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.locks: Dict[str, asyncio.Lock] = {}
+        self.claims: Dict[str, IO] = {}
+        self.shutting_down = False
+
+    def checkpoint_path(self, job_id: str) -> str:
+        return os.path.join(settings.JOBS_DIR, f"{job_id}.json")
+
+    def write_checkpoint(self, job_id: str, data: str):
+        os.makedirs(settings.JOBS_DIR, exist_ok=True)
+        path = self.checkpoint_path(job_id)
+        tmp_path = f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def claim(self, job_id: str) -> bool:
+        """Take the job for this process unless a live worker holds it; kept until release()."""
+        if job_id in self.claims:
+            return True
+        import fcntl
+        os.makedirs(settings.JOBS_DIR, exist_ok=True)
+        f = open(os.path.join(settings.JOBS_DIR, f"{job_id}.lock"), "a+", encoding="utf-8")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return False
+        f.seek(0)
+        f.truncate()
+        f.write(f"{os.getpid()}\n")
+        f.flush()
+        self.claims[job_id] = f
+        return True
+
+    def release(self, job_id: str):
+        # The lock file itself stays: unlinking it could hand two workers locks on different inodes
+        f = self.claims.pop(job_id, None)
+        if f is not None:
+            f.close()
+
+    async def checkpoint(self, job: JobState):
+        async with self.locks[job.job_id]:
+            job.updated_at = time.time()
+            await run_io(self.write_checkpoint, job.job_id, job.model_dump_json())
+
+    def get(self, job_id: str) -> JobState:
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+        return job
+
+    def read_checkpoint(self, job_id: str) -> Optional[JobState]:
+        try:
+            uuid.UUID(job_id)
+            with open(self.checkpoint_path(job_id), "r", encoding="utf-8") as f:
+                return JobState(**json.load(f))
+        except (ValueError, FileNotFoundError):
+            return None
+
+    async def find(self, job_id: str) -> JobState:
+        """A job run by this worker, or else its latest checkpoint, written by whichever worker runs it."""
+        job = self.jobs.get(job_id) if job_id in self.claims else None
+        if job is None:
+            job = await run_io(self.read_checkpoint, job_id) or self.jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+        return job
+
+    def start(self, job: JobState):
+        self.locks.setdefault(job.job_id, asyncio.Lock())
+        self.tasks[job.job_id] = asyncio.create_task(self.run(job))
+
+    async def create(self, request: JobCreateRequest) -> JobState:
+        now = time.time()
+        job = JobState(
+            job_id=str(uuid.uuid4()),
+            created_at=now,
+            updated_at=now,
+            request=request,
+            stages={stage: StageProgress() for stage in STAGES}
+        )
+        self.jobs[job.job_id] = job
+        self.locks[job.job_id] = asyncio.Lock()
+        self.claim(job.job_id)
+        await self.checkpoint(job)
+        self.start(job)
+        logger.info(f"Created job {job.job_id} for file {request.file_id}")
+        return job
+
+    async def cancel(self, job_id: str) -> JobState:
+        job = self.get(job_id)
+        task = self.tasks.get(job_id)
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        return job
+
+    async def resume(self, job_id: str) -> JobState:
+        task = self.tasks.get(job_id)
+        if task is not None and not task.done():
+            raise HTTPException(status_code=409, detail=f"Job {job_id} is already running")
+        if not self.claim(job_id):
+            raise HTTPException(status_code=409, detail=f"Job {job_id} is running on another worker")
+        # Another worker may have run the job since this one loaded it
+        job = await run_io(self.read_checkpoint, job_id) or self.jobs.get(job_id)
+        if job is None or job.status == "completed":
+            self.release(job_id)
+            if job is None:
+                raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+            raise HTTPException(status_code=409, detail=f"Job {job_id} is already completed")
+        self.jobs[job_id] = job
+        job.error = None
+        job.scene_errors = {}
+        job.image_errors = {}
+        for progress in job.stages.values():
+            if progress.status != "completed":
+                progress.status = "pending"
+                progress.error = None
+        self.start(job)
+        logger.info(f"Resumed job {job_id}")
+        return job
+
+    def load_checkpoints(self):
+        if not os.path.isdir(settings.JOBS_DIR):
+            return []
+        interrupted = []
+        for filename in os.listdir(settings.JOBS_DIR):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(settings.JOBS_DIR, filename), "r", encoding="utf-8") as f:
+                    job = JobState(**json.load(f))
+            except Exception as e:
+                logger.warning(f"Skipping unreadable job checkpoint {filename}: {e}")
+                continue
+            if job.status in ("queued", "running"):
+                # Still claimed: a live worker runs it and serves its status
+                if not self.claim(job.job_id):
+                    continue
+                # Its owner may have finished it and let go between the read and the claim
+                job = self.read_checkpoint(job.job_id) or job
+                if job.status in ("queued", "running"):
+                    job.status = "interrupted"
+                    interrupted.append(job)
+                else:
+                    self.release(job.job_id)
+            self.jobs[job.job_id] = job
+            self.locks[job.job_id] = asyncio.Lock()
+        return interrupted
+
+    async def startup(self):
+        interrupted = await run_io(self.load_checkpoints)
+        for job in interrupted:
+            if settings.JOB_AUTO_RESUME:
+                await self.resume(job.job_id)
+            else:
+                await self.checkpoint(job)
+                self.release(job.job_id)
+
+    async def shutdown(self):
+        self.shutting_down = True
+        for task in self.tasks.values():
+            task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        for job_id in list(self.claims):
+            self.release(job_id)
+
+    def protected_paths(self) -> Set[str]:
+        """Files active jobs still need; the janitor must not remove these."""
+        paths = []
+        for job in self.jobs.values():
+            # Interrupted jobs resume on their own (or by request) and still need their inputs
+            if job.status not in ("queued", "running", "interrupted"):
+                continue
+            file_id = job.request.file_id
+            paths.append(os.path.join(settings.TEMP_UPLOAD_DIR, file_id))
+            paths.append(manifest_path(file_id))
+            if job.extraction_id:
+                paths.extend(self.artifact_paths(job.extraction_id))
+            paths.extend(logo_dir(key) for key in logo_keys(job.request.logo_id, job.request.logo_url))
+        return {os.path.realpath(path) for path in paths}
+
+    def artifact_paths(self, extraction_id: str) -> List[str]:
+        # Artifacts written since the extraction started are recent, so the janitor's minimum age covers them until then
+        record = artifact_store.get_json(extraction_id) or {"slides": []}
+        artifact_ids = [extraction_id] + [image["artifact_id"] for slide in record["slides"] for image in slide["images"]]
+        return [path for path in map(artifact_store.path_for, artifact_ids) if path is not None]
+
+    def status(self, job: JobState) -> JobStatusResponse:
+        scenes: List[Scene] = []
+        for slide_number in sorted(job.slide_scenes):
+            for scene in job.slide_scenes[slide_number]:
+                scenes.append(scene.model_copy(update={"image_url": job.image_urls.get(scene.scene_id)}))
+        return JobStatusResponse(
+            job_id=job.job_id,
+            status=job.status,
+            stages=job.stages,
+            scenes=scenes,
+            video_id=job.video_id,
+            video_status=job.video_status,
+            video_url=job.video_url,
+            video_segments=job.video_segments,
+            error=job.error
+        )
+
+    async def iter_slides(self, job: JobState) -> AsyncIterator[SlideData]:
+        timer = StageTimer(job, "extract")
+        progress = job.stages["extract"]
+        timer.start()
+        progress.completed = 0
+        file_id = job.request.file_id
+        cached = await run_io(get_prepared_extraction, file_id)
+        if cached is not None:
+            await run_io(release_upload, file_id)
+            job.extraction_id = cached.extraction_id
+            progress.total = len(cached.slides)
+            for slide_data in cached.slides:
+                progress.completed += 1
+                yield slide_data
+        else:
+            original_file_path, processing_file_path = await prepare_extraction(file_id)
+            slides: List[SlideData] = []
+            async for slide_data in iter_extraction(processing_file_path):
+                slides.append(slide_data)
+                progress.completed += 1
+                yield slide_data
+            job.extraction_id = (await run_io(save_extraction, file_id, slides)).extraction_id
+            # Only now: a job cancelled or interrupted mid-extraction needs the upload to resume
+            await run_io(remove_uploaded_files, original_file_path)
+            progress.total = progress.completed
+        job.slide_count = progress.total
+        timer.finish()
+        await self.checkpoint(job)
+
+    async def render_image(self, job: JobState, scene: Scene, semaphore: asyncio.Semaphore):
+        progress = job.stages["images"]
+        try:
+            async with semaphore:
+                image_url = await render_scene_image(
+                    scene.image_prompt or "generic background",
+                    job.request.logo_url,
+                    logo_id=job.request.logo_id
+                )
+            job.image_urls[scene.scene_id] = image_url
+            progress.completed += 1
+        except Exception as e:
+            logger.error(f"Job {job.job_id}: image generation failed for {scene.scene_id}: {e}")
+            job.image_errors[scene.scene_id] = str(e)
+        await self.checkpoint(job)
+
+    def schedule_images(self, job: JobState, scenes: List[Scene], semaphore: asyncio.Semaphore, image_tasks: List[asyncio.Task]):
+        timer = StageTimer(job, "images")
+        progress = job.stages["images"]
+        progress.total = (progress.total or 0) + len(scenes)
+        for scene in scenes:
+            if scene.scene_id in job.image_urls:
+                continue
+            timer.start()
+            image_tasks.append(asyncio.create_task(self.render_image(job, scene, semaphore)))
+
+    async def record_scenes(self, job: JobState, slide_number: int, scenes: List[Scene],
+                            image_semaphore: asyncio.Semaphore, image_tasks: List[asyncio.Task]):
+        if any(is_placeholder(scene) for scene in scenes):
+            # Left out of the checkpoint so a resume asks Gemini again instead of narrating the error
+            logger.error(f"Job {job.job_id}: no usable scenes for slide {slide_number}")
+            job.scene_errors[slide_number] = scenes[0].speech_script
+            await self.checkpoint(job)
+            return
+        job.slide_scenes[slide_number] = scenes
+        job.stages["scenes"].completed += 1
+        await self.checkpoint(job)
+        self.schedule_images(job, scenes, image_semaphore, image_tasks)
+
+    async def generate_scenes(self, job: JobState, model, slide_data: SlideData, scene_semaphore: asyncio.Semaphore,
+                              image_semaphore: asyncio.Semaphore, image_tasks: List[asyncio.Task]):
+        scenes = await generate_slide_scenes(model, slide_data, scene_semaphore)
+        await self.record_scenes(job, slide_data.slide_number, scenes, image_semaphore, image_tasks)
+
+    async def generate_window(self, job: JobState, model, narrative: DeckNarrative, index: int, slides: List[SlideData],
+                              scene_semaphore: asyncio.Semaphore, window_slots: asyncio.Semaphore,
+                              image_semaphore: asyncio.Semaphore, image_tasks: List[asyncio.Task]):
+        async with window_slots:
+            results = await generate_window_scenes(model, narrative, index, slides, scene_semaphore)
+        for slide_data in slides:
+            result = results[slide_data.slide_number]
+            if isinstance(result, Exception):
+                raise result
+            await self.record_scenes(job, slide_data.slide_number, result, image_semaphore, image_tasks)
+
+    def expected_slide_count(self, job: JobState) -> int:
+        if job.slide_count is not None:
+            return job.slide_count
+        manifest = read_manifest(job.request.file_id)
+        return manifest["slide_count"] if manifest is not None else 0
+
+    async def produce_video(self, job: JobState):
+        timer = StageTimer(job, "video")
+        timer.start()
+        scenes = self.status(job).scenes
+        if not job.video_segments:
+            if job.video_id is not None:
+                # Checkpoint from before videos were segmented: one video for every scene
+                job.video_segments = [VideoSegment(scene_ids=[scene.scene_id for scene in scenes], video_id=job.video_id)]
+            else:
+                job.video_segments = [
+                    VideoSegment(scene_ids=[scene.scene_id for scene in segment])
+                    for segment in split_video_segments(scenes)
+                ]
+        scenes_by_id = {scene.scene_id: scene for scene in scenes}
+        await asyncio.gather(*[
+            self.submit_segment(job, index, segment, [scenes_by_id[scene_id] for scene_id in segment.scene_ids])
+            for index, segment in enumerate(job.video_segments)
+            if segment.video_id is None
+        ])
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*[self.follow_video(job, segment) for segment in job.video_segments]),
+                timeout=settings.JOB_VIDEO_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            pending = [
+                f"{segment.video_id} (part {index + 1}/{len(job.video_segments)})"
+                for index, segment in enumerate(job.video_segments)
+                if segment.status != "completed"
+            ]
+            raise Exception(f"Timed out waiting for HeyGen video(s): {', '.join(pending)}")
+        timer.finish()
+
+    async def submit_segment(self, job: JobState, index: int, segment: VideoSegment, scenes: List[Scene]):
+        segment.video_id = await submit_video_segment(scenes, job.request.avatar_id, job.request.voice_id)
+        if index == 0:
+            job.video_id = segment.video_id
+        await self.checkpoint(job)
+        logger.info(f"Job {job.job_id}: submitted video {segment.video_id} (segment {index + 1}/{len(job.video_segments)})")
+
+    async def follow_video(self, job: JobState, segment: VideoSegment):
+        # Shares the tracker's webhook updates and single poller with any browser watching the same video
+        async for status in video_tracker.subscribe(segment.video_id):
+            segment.status = status["status"]
+            segment.video_url = status["video_url"]
+            statuses = {other.status for other in job.video_segments}
+            # The job's own fields summarize all segments; video_url only makes sense for a single video
+            job.video_status = "failed" if "failed" in statuses else "completed" if statuses == {"completed"} else "processing"
+            job.video_url = job.video_segments[0].video_url if len(job.video_segments) == 1 else None
+            if segment.status == "failed":
+                raise Exception(f"HeyGen video {segment.video_id} failed: {status['error']}")
+
+    def stop_running_stages(self, job: JobState, status: str, error: Optional[str] = None):
+        for stage, progress in job.stages.items():
+            if progress.status == "running":
+                StageTimer(job, stage).finish(status, error)
+
+    async def run(self, job: JobState):
+        job.status = "running"
+        await self.checkpoint(job)
+        scene_tasks: List[asyncio.Task] = []
+        image_tasks: List[asyncio.Task] = []
+        try:
+            model = await build_scene_model()
+            scene_semaphore = asyncio.Semaphore(settings.GEMINI_MAX_CONCURRENCY)
+            image_semaphore = asyncio.Semaphore(settings.IMAGE_BATCH_CONCURRENCY)
+            scenes_timer = StageTimer(job, "scenes")
+            job.stages["images"].total = 0
+            job.stages["images"].completed = len(job.image_urls)
+            job.stages["scenes"].completed = len(job.slide_scenes)
+
+            # Large decks are narrated in windows that carry a rolling summary of the earlier ones
+            narrative = DeckNarrative(model, scene_semaphore) if is_large_deck(await run_io(self.expected_slide_count, job)) else None
+            window_slots = asyncio.Semaphore(settings.LARGE_DECK_PARALLEL_WINDOWS)
+            window: List[SlideData] = []
+
+            def close_window():
+                index = len(narrative.summaries)
+                slides = list(window)
+                window.clear()
+                narrative.add_window(index, slides)
+                pending = [slide_data for slide_data in slides if slide_data.slide_number not in job.slide_scenes]
+                if pending:
+                    scene_tasks.append(asyncio.create_task(self.generate_window(
+                        job, model, narrative, index, pending, scene_semaphore, window_slots, image_semaphore, image_tasks
+                    )))
+
+            async for slide_data in self.iter_slides(job):
+                scenes_timer.start()
+                if narrative is not None:
+                    window.append(slide_data)
+                    if len(window) == settings.LARGE_DECK_WINDOW_SLIDES:
+                        close_window()
+                if slide_data.slide_number in job.slide_scenes:
+                    self.schedule_images(job, job.slide_scenes[slide_data.slide_number], image_semaphore, image_tasks)
+                    continue
+                if narrative is None:
+                    scene_tasks.append(asyncio.create_task(
+                        self.generate_scenes(job, model, slide_data, scene_semaphore, image_semaphore, image_tasks)
+                    ))
+            if window:
+                close_window()
+            job.stages["scenes"].total = job.slide_count
+            try:
+                await asyncio.gather(*scene_tasks)
+            finally:
+                if narrative is not None:
+                    narrative.close()
+            if job.scene_errors:
+                scenes_timer.finish("failed", f"{len(job.scene_errors)} slide(s) without scenes")
+            else:
+                scenes_timer.finish()
+            # Every scene task has scheduled its images by now; the other slides' images are still worth keeping
+            await asyncio.gather(*image_tasks)
+            if job.scene_errors:
+                slide_numbers = ", ".join(str(slide_number) for slide_number in sorted(job.scene_errors))
+                raise Exception(f"Scene generation failed for slides: {slide_numbers}")
+            if job.image_errors:
+                StageTimer(job, "images").finish("failed", f"{len(job.image_errors)} scene image(s) failed")
+                raise Exception("Image generation failed for: " + ", ".join(sorted(job.image_errors)))
+            StageTimer(job, "images").finish()
+
+            if job.request.generate_video:
+                await self.produce_video(job)
+            job.status = "completed"
+            logger.info(f"Job {job.job_id} completed")
+        except asyncio.CancelledError:
+            # A server shutdown leaves the job resumable; an explicit cancel is final
+            job.status = "interrupted" if self.shutting_down else "cancelled"
+            self.stop_running_stages(job, "cancelled")
+            for task in scene_tasks + image_tasks:
+                task.cancel()
+            logger.info(f"Job {job.job_id} {job.status}")
+        except Exception as e:
+            job.status = "failed"
+            job.error = e.detail if isinstance(e, HTTPException) else str(e)
+            self.stop_running_stages(job, "failed", job.error)
+            for task in scene_tasks + image_tasks:
+                task.cancel()
+            logger.error(f"Job {job.job_id} failed: {job.error}")
+        finally:
+            try:
+                await self.checkpoint(job)
+            finally:
+                # After the final checkpoint, so whoever claims the job next sees how it ended
+                self.release(job.job_id)
+
+
+job_manager = JobManager()
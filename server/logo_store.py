@@ -0,0 +1,127 @@
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from io import BytesIO
+from typing import List, Optional, Tuple
+from PIL import Image
+from config import settings, logger
+from cache import SingleFlight
+from executor import run_io
+from http_client import get_session
+from storage import storage
+from metrics import track_upstream, count_bytes
+
+Size = Tuple[int, int]
+
+_memory: "OrderedDict[Tuple[str, Size], Image.Image]" = OrderedDict()
+_memory_lock = threading.Lock()
+_downloads = SingleFlight("logo_downloads")
+
+
+def url_digest(logo_url: str) -> str:
+    return hashlib.sha256(logo_url.encode()).hexdigest()
+
+
+def logo_keys(logo_id: Optional[str], logo_url: str) -> List[str]:
+    """Where a logo may be stored: under its /api/upload-logo id when it is one, else under a hash of its URL."""
+    keys = []
+    try:
+        # Client-supplied, so anything but a UUID never becomes a path
+        keys.append(str(uuid.UUID(logo_id)))
+    except (TypeError, ValueError, AttributeError):
+        pass
+    keys.append(url_digest(logo_url))
+    return keys
+
+
+def logo_dir(key: str) -> str:
+    return os.path.join(settings.LOGO_DIR, key)
+
+
+def variant_path(key: str, size: Size) -> str:
+    return os.path.join(logo_dir(key), f"{size[0]}x{size[1]}.png")
+
+
+def source_path(key: str) -> str:
+    return os.path.join(logo_dir(key), "source")
+
+
+def save_logo(key: str, data: bytes, logo_url: str) -> Image.Image:
+    """Decode a logo once and persist its normalized RGBA original and resized variants."""
+    digest = url_digest(logo_url)
+    logo = Image.open(BytesIO(data)).convert("RGBA")
+    os.makedirs(logo_dir(key), exist_ok=True)
+    logo.save(os.path.join(logo_dir(key), "original.png"), format="PNG")
+    for size in settings.LOGO_VARIANT_SIZES:
+        variant = logo.resize(size)
+        variant.save(variant_path(key, size), format="PNG")
+        remember(digest, size, variant)
+    # Written last: a logo only counts as stored for the URL it was built from
+    with open(source_path(key), "w", encoding="utf-8") as f:
+        f.write(digest)
+    return logo
+
+
+def load_variant(key: str, size: Size, digest: str) -> Optional[Image.Image]:
+    try:
+        with open(source_path(key), "r", encoding="utf-8") as f:
+            if f.read() != digest:
+                return None
+    except FileNotFoundError:
+        return None
+    path = variant_path(key, size)
+    if os.path.exists(path):
+        with Image.open(path) as variant:
+            return variant.convert("RGBA")
+    original_path = os.path.join(logo_dir(key), "original.png")
+    if os.path.exists(original_path):
+        with Image.open(original_path) as original:
+            variant = original.convert("RGBA").resize(size)
+        variant.save(path, format="PNG")
+        return variant
+    return None
+
+
+def remember(digest: str, size: Size, logo: Image.Image):
+    with _memory_lock:
+        _memory[(digest, size)] = logo
+        _memory.move_to_end((digest, size))
+        while len(_memory) > settings.LOGO_MEMORY_CACHE_SIZE:
+            _memory.popitem(last=False)
+
+
+async def download_logo(key: str, logo_url: str):
+    # Logos in local storage are read from disk instead of over HTTP from ourselves
+    data = await storage.read(logo_url)
+    if data is None:
+        async with track_upstream("logo_host", "download"), get_session().get(logo_url) as response:
+            if response.status != 200:
+                raise Exception(f"Failed to download logo from {logo_url}")
+            data = await response.read()
+        count_bytes("logo_host", received=len(data))
+    logger.info(f"Downloaded logo {key} from {logo_url}")
+    await run_io(save_logo, key, data, logo_url)
+
+
+async def get_logo(logo_url: str, size: Size, logo_id: Optional[str] = None) -> Image.Image:
+    """Return the logo at `logo_url` resized to `size`: memory first, then local disk, then one download."""
+    digest = url_digest(logo_url)
+    with _memory_lock:
+        logo = _memory.get((digest, size))
+        if logo is not None:
+            _memory.move_to_end((digest, size))
+            return logo
+    for key in logo_keys(logo_id, logo_url):
+        logo = await run_io(load_variant, key, size, digest)
+        if logo is not None:
+            break
+    if logo is None:
+        # Downloads only ever land under the URL hash; an upload id's directory is written by /api/upload-logo alone
+        await _downloads.run(digest, lambda: download_logo(digest, logo_url))
+        logo = await run_io(load_variant, digest, size, digest)
+        if logo is None:
+            raise Exception(f"Logo {digest} could not be stored locally")
+    remember(digest, size, logo)
+    return logo
@@ -1,3 +1,6 @@
+# Imported first so the cold-start report covers every import below
+import startup
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from routes.upload import router as upload_router
@@ -5,9 +8,52 @@ from routes.extract import router as extract_router
 from routes.generate import router as generate_router
 from routes.video import router as video_router
 from routes.logo import router as logo_router
+from routes.stats import router as stats_router
+from routes.jobs import router as jobs_router
+from routes.files import router as files_router
 from config import settings, logger
+import cache
+import executor
+import http_client
+import heygen
+from jobs import job_manager
+from converter import conversion_service
+from janitor import janitor
+from video_status import video_tracker
+from storage import storage
+from artifacts import artifact_store
+from sessions import extraction_sessions
+from metrics import MetricsMiddleware, add_stats_source
+import gemini
+import upstream
 
-app = FastAPI(title="PowerPoint to Video API")
+startup.mark("imports_done")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    startup.mark("lifespan_started")
+    http_client.get_session()
+    gemini.warm()
+    heygen.warm_catalogs()
+    conversion_service.warm()
+    await job_manager.startup()
+    cache.start_flusher()
+    if settings.JANITOR_ENABLED:
+        janitor.start(job_manager.protected_paths)
+    startup.mark("ready")
+    logger.info(f"Worker ready in {startup.milestones['ready']}s (imports {startup.milestones['imports_done']}s)")
+    yield
+    await janitor.stop()
+    await cache.stop_flusher()
+    video_tracker.shutdown()
+    await job_manager.shutdown()
+    await http_client.close_session()
+    await gemini.close()
+    conversion_service.shutdown()
+    executor.shutdown()
+    cache.flush_all()
+
+app = FastAPI(title="PowerPoint to Video API", lifespan=lifespan)
 
 # CORS Middleware
 app.add_middleware(
@@ -18,12 +64,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
+# Component snapshots from /api/stats, also exported on /metrics
+add_stats_source("startup", startup.stats)
+add_stats_source("executor", executor.stats)
+add_stats_source("caches", cache.stats)
+add_stats_source("heygen_catalogs", heygen.stats)
+add_stats_source("upstream", upstream.stats)
+add_stats_source("artifacts", artifact_store.stats)
+add_stats_source("extraction_sessions", extraction_sessions.stats)
+add_stats_source("converter", conversion_service.stats)
+add_stats_source("storage", storage.stats)
+add_stats_source("janitor", janitor.stats)
+add_stats_source("video_status", video_tracker.stats)
+
 # Include routers
 app.include_router(upload_router)
 app.include_router(extract_router)
 app.include_router(generate_router)
 app.include_router(video_router)
 app.include_router(logo_router)
+app.include_router(stats_router)
+app.include_router(jobs_router)
+app.include_router(files_router)
 
 @app.get("/")
 def read_root():
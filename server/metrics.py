@@ -0,0 +1,152 @@
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+
+# Upstream calls (Gemini, HeyGen) routinely take tens of seconds, well past the default buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time from request start until the response body is complete, per route.",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served.")
+STAGE_LATENCY = Histogram(
+    "stage_duration_seconds",
+    "Duration of CPU and I/O stages such as conversion, parsing and compositing.",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+STAGES_IN_FLIGHT = Gauge("stages_in_flight", "Stages currently running.", ["stage"])
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_duration_seconds",
+    "Duration of calls to external services.",
+    ["upstream", "operation"],
+    buckets=LATENCY_BUCKETS
+)
+UPSTREAM_IN_FLIGHT = Gauge("upstream_requests_in_flight", "Calls to external services currently open.", ["upstream"])
+UPSTREAM_ERRORS = Counter(
+    "upstream_errors_total",
+    "Failed calls to external services, by status code or exception type.",
+    ["upstream", "operation", "reason"]
+)
+UPSTREAM_BYTES = Counter(
+    "upstream_bytes_total",
+    "Bytes sent to and received from external services.",
+    ["upstream", "direction"]
+)
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    STAGES_IN_FLIGHT.labels(stage).inc()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(stage).observe(time.perf_counter() - started)
+        STAGES_IN_FLIGHT.labels(stage).dec()
+
+
+def error_reason(error: BaseException) -> str:
+    for attribute in ("status_code", "status", "code"):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return str(value)
+    return type(error).__name__
+
+
+@asynccontextmanager
+async def track_upstream(upstream: str, operation: str):
+    UPSTREAM_IN_FLIGHT.labels(upstream).inc()
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        UPSTREAM_ERRORS.labels(upstream, operation, error_reason(e)).inc()
+        raise
+    finally:
+        UPSTREAM_LATENCY.labels(upstream, operation).observe(time.perf_counter() - started)
+        UPSTREAM_IN_FLIGHT.labels(upstream).dec()
+
+
+def count_bytes(upstream: str, sent: int = 0, received: int = 0):
+    if sent:
+        UPSTREAM_BYTES.labels(upstream, "sent").inc(sent)
+    if received:
+        UPSTREAM_BYTES.labels(upstream, "received").inc(received)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware so streaming responses are timed until their last chunk."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            # The route template, not the raw path, keeps label cardinality bounded
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status["code"])
+            ).observe(time.perf_counter() - started)
+
+
+def flatten_stats(stats: Dict[str, Any], path: Tuple[str, ...] = ()) -> List[Tuple[Tuple[str, ...], float]]:
+    values = []
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            values.extend(flatten_stats(value, path + (key,)))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values.append((path + (key,), value))
+    return values
+
+
+class StatsCollector:
+    """Exposes the /api/stats snapshots (pools, caches, janitor...) as gauges at scrape time."""
+
+    def __init__(self):
+        self.sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def collect(self):
+        family = GaugeMetricFamily(
+            "app_component_stat",
+            "Point-in-time value from a component's stats(), as listed in /api/stats.",
+            labels=["source", "component", "field"]
+        )
+        for source, stats in self.sources.items():
+            try:
+                values = flatten_stats(stats())
+            except Exception:
+                continue
+            for path, value in values:
+                family.add_metric([source, ".".join(path[:-1]), path[-1]], value)
+        yield family
+
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
+
+
+def add_stats_source(name: str, stats: Callable[[], Dict[str, Any]]):
+    stats_collector.sources[name] = stats
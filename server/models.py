@@ -1,11 +1,15 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal
 
 class ExtractRequest(BaseModel):
     file_id: str
+    stream: bool = False
+    stream_format: Literal["ndjson", "sse"] = "ndjson"
 
 class ImageInfo(BaseModel):
     filename: str
+    # Content hash in the artifact store (artifacts.py)
+    artifact_id: str
     content_type: str
     width_emu: int
     height_emu: int
@@ -22,7 +26,8 @@ class SlideData(BaseModel):
 
 class ExtractionResponse(BaseModel):
     file_id: str
-    extracted_content_path: str
+    # Opaque artifact id of the extraction record; the slides' images are artifacts too
+    extraction_id: str
     slides: List[SlideData]
 
 class Scene(BaseModel):
@@ -33,7 +38,12 @@ class Scene(BaseModel):
     scene_id: Optional[str] = None
 
 class SceneGenerationRequest(BaseModel):
-    extraction_data: ExtractionResponse
+    # The file_id of an earlier /api/extract; extraction_data is the older, full-payload form
+    file_id: Optional[str] = None
+    extraction_data: Optional[ExtractionResponse] = None
+    bypass_cache: bool = False
+    # None follows the server's SCENE_PACKING setting
+    pack_slides: Optional[bool] = None
 
 class SceneGenerationResponse(BaseModel):
     file_id: str
@@ -44,18 +54,91 @@ class ImageGenerationRequest(BaseModel):
     scene_id: str
     logo_id: str
     logo_url: str
+    regenerate: bool = False
 
 class ImageGenerationResponse(BaseModel):
     scene_id: str
     image_url: str
     logo_url:str
 
+class BatchImageGenerationRequest(BaseModel):
+    file_id: Optional[str] = None
+    scenes: List[Scene]
+    logo_id: str
+    logo_url: str
+    regenerate: bool = False
+    stream_format: Literal["ndjson", "sse"] = "ndjson"
+
+class ImageGenerationError(BaseModel):
+    scene_id: str
+    error: str
+
 class VideoGenerationRequest(BaseModel):
     scenes: List[Scene]
     avatar_id: str
     voice_id: str
 
+class WebhookStandInRequest(BaseModel):
+    video_id: str
+    status: Literal["completed", "failed"] = "completed"
+    video_url: Optional[str] = None
+    error: Optional[str] = None
+
 class LogoUploadResponse(BaseModel):
     logo_id: str
     logo_url: str
 
+class JobCreateRequest(BaseModel):
+    file_id: str
+    logo_id: str
+    logo_url: str
+    avatar_id: str
+    voice_id: str
+    generate_video: bool = True
+
+class StageProgress(BaseModel):
+    status: Literal["pending", "running", "completed", "failed", "cancelled"] = "pending"
+    completed: int = 0
+    total: Optional[int] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    duration_seconds: Optional[float] = None
+    error: Optional[str] = None
+
+class VideoSegment(BaseModel):
+    scene_ids: List[str]
+    video_id: Optional[str] = None
+    status: Optional[str] = None
+    video_url: Optional[str] = None
+
+class JobState(BaseModel):
+    job_id: str
+    status: Literal["queued", "running", "completed", "failed", "cancelled", "interrupted"] = "queued"
+    created_at: float
+    updated_at: float
+    request: JobCreateRequest
+    stages: Dict[str, StageProgress]
+    extraction_id: Optional[str] = None
+    slide_count: Optional[int] = None
+    # Checkpointed results, keyed so a resumed job can skip finished work
+    slide_scenes: Dict[int, List[Scene]] = {}
+    # Slides that only got placeholder scenes; left pending for a resume
+    scene_errors: Dict[int, str] = {}
+    image_urls: Dict[str, str] = {}
+    image_errors: Dict[str, str] = {}
+    video_id: Optional[str] = None
+    video_status: Optional[str] = None
+    video_url: Optional[str] = None
+    video_segments: List[VideoSegment] = []
+    error: Optional[str] = None
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str
+    stages: Dict[str, StageProgress]
+    scenes: List[Scene]
+    video_id: Optional[str] = None
+    video_status: Optional[str] = None
+    video_url: Optional[str] = None
+    video_segments: List[VideoSegment] = []
+    error: Optional[str] = None
@@ -1,20 +1,123 @@
 from fastapi import APIRouter, HTTPException
-from models import ExtractRequest, ExtractionResponse, SlideData, ImageInfo, TableData
+from models import ExtractRequest, ExtractionResponse, SlideData
 from config import settings, logger
-from typing import List
-import uuid
+from executor import run_io, run_cpu, stream_cpu
+from cache import PersistentCache
+from converter import conversion_service
+from metrics import stage_timer
+from streaming import encode_event, stream_events
+from artifacts import artifact_store
+from sessions import extraction_sessions
+from utils import extract_slides, stream_slides, manifest_path, read_manifest
+from typing import AsyncIterator, List, Optional, Tuple
 import os
-from pptx import Presentation
-from pptx.enum.shapes import MSO_SHAPE_TYPE
-from spire.presentation import Presentation as SpirePresentation, FileFormat
 
 router = APIRouter()
 
-@router.post("/api/extract")
-async def extract_content(request: ExtractRequest):
-    file_id = request.file_id
+# Keyed by the content hash that /api/upload uses as the file_id base name,
+# so re-uploads of a known deck skip python-pptx and Spire entirely. The
+# authoritative deck -> extraction pointer is a ref in the artifact store, which
+# every worker and node sees; this cache only saves the ref lookup on this host.
+# Entries only hold the extraction id; the artifacts themselves are left to the
+# janitor because content addressing shares them between decks.
+extraction_cache = PersistentCache(
+    "extraction",
+    os.path.join(settings.CACHE_DIR, "extractions.json"),
+    max_entries=settings.EXTRACTION_CACHE_MAX_ENTRIES
+)
+
+def load_extraction(file_id: str, extraction_id: str) -> Optional[ExtractionResponse]:
+    """The extraction behind an id, or None once its record or any of its images is gone from the store."""
+    record = artifact_store.get_json(extraction_id)
+    if record is None:
+        return None
+    response = ExtractionResponse(file_id=file_id, extraction_id=extraction_id, slides=record["slides"])
+    for slide_data in response.slides:
+        for image in slide_data.images:
+            if not artifact_store.exists(image.artifact_id):
+                return None
+    return response
+
+def save_extraction(file_id: str, slides: List[SlideData]) -> ExtractionResponse:
+    extraction_id = artifact_store.put_json({"slides": [slide_data.model_dump() for slide_data in slides]})
+    key = os.path.splitext(file_id)[0]
+    artifact_store.set_ref(key, extraction_id)
+    extraction_cache.set(key, {"extraction_id": extraction_id})
+    response = ExtractionResponse(file_id=file_id, extraction_id=extraction_id, slides=slides)
+    extraction_sessions.set(response)
+    return response
+
+def get_cached_extraction(file_id: str) -> Optional[ExtractionResponse]:
+    key = os.path.splitext(file_id)[0]
+    cached = extraction_cache.get(key)
+    if cached is not None:
+        response = load_extraction(file_id, cached["extraction_id"]) if "extraction_id" in cached else None
+        if response is not None:
+            extraction_sessions.set(response)
+            return response
+        extraction_cache.delete(key)
+    extraction_id = artifact_store.get_ref(key)
+    if extraction_id is None:
+        return None
+    response = load_extraction(file_id, extraction_id)
+    if response is None:
+        artifact_store.delete_ref(key, extraction_id)
+        return None
+    extraction_cache.set(key, {"extraction_id": extraction_id})
+    extraction_sessions.set(response)
+    return response
+
+async def get_session_extraction(file_id: str) -> Optional[ExtractionResponse]:
+    """The extraction for an extracted file_id, from this worker's sessions or else the artifact store's ref for the deck."""
+    response = extraction_sessions.get(file_id)
+    if response is not None:
+        return response
+    return await run_io(get_cached_extraction, file_id)
+
+def get_prepared_extraction(file_id: str) -> Optional[ExtractionResponse]:
+    """Extraction already available from the cache or from the manifest written by /api/upload."""
+    cached_response = get_cached_extraction(file_id)
+    if cached_response is not None:
+        return cached_response
+    manifest = read_manifest(file_id)
+    if manifest is None or not manifest["slides"]:
+        return None
+    slides = [SlideData(**slide) for slide in manifest["slides"]]
+    if not all(artifact_store.exists(image.artifact_id) for slide_data in slides for image in slide_data.images):
+        return None
+    return save_extraction(file_id, slides)
+
+def release_upload(file_id: str):
+    # The extraction result now lives in the cache; drop the upload and its manifest
+    for path in (os.path.join(settings.TEMP_UPLOAD_DIR, file_id), manifest_path(file_id)):
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+                logger.info(f"Cleaned up uploaded file: {path}")
+        except OSError as e:
+            logger.warning(f"Failed to clean up {path}: {e}")
+
+def remove_uploaded_files(original_file_path: str):
+    # A converted copy stays in the conversion cache; only the upload itself is removed
+    try:
+        if os.path.exists(original_file_path):
+            os.remove(original_file_path)
+            logger.info(f"Cleaned up original file: {original_file_path}")
+    except Exception as e:
+        logger.warning(f"Failed to clean up files: {e}")
+
+async def stream_cached_extraction(response: ExtractionResponse, stream_format: str):
+    yield encode_event("start", {"file_id": response.file_id}, stream_format)
+    for slide_data in response.slides:
+        yield encode_event("slide", slide_data.model_dump(), stream_format)
+    yield encode_event("done", {
+        "file_id": response.file_id,
+        "extraction_id": response.extraction_id,
+        "slide_count": len(response.slides)
+    }, stream_format)
+
+async def prepare_extraction(file_id: str) -> Tuple[str, str]:
     original_file_path = os.path.join(settings.TEMP_UPLOAD_DIR, file_id)
-    
     if not os.path.exists(original_file_path):
         logger.warning(f"File not found: {file_id}")
         raise HTTPException(status_code=404, detail=f"File not found: {file_id}")
@@ -22,24 +125,13 @@ async def extract_content(request: ExtractRequest):
     # Determine file extension
     file_ext = os.path.splitext(file_id)[1].lower()
     processing_file_path = original_file_path
-    converted_file_path = None
 
     # Convert .ppt to .pptx if necessary
     if file_ext == '.ppt':
         try:
-            # Load the PPT file with Spire.Presentation
-            spire_pptx = SpirePresentation()
-            spire_pptx.LoadFromFile(original_file_path)
-            
-            # Save as PPTX
-            converted_filename = f"{uuid.uuid4()}.pptx"
-            converted_file_path = os.path.join(settings.TEMP_UPLOAD_DIR, converted_filename)
-            spire_pptx.SaveToFile(converted_file_path, FileFormat.Pptx2019)
-            spire_pptx.Dispose()  # Close the presentation
-            
-            # Update processing file path to the converted PPTX
-            processing_file_path = converted_file_path
-            logger.info(f"Converted {file_id} to PPTX: {converted_filename}")
+            # The converted copy belongs to the conversion cache, so it is not ours to clean up
+            processing_file_path = await conversion_service.convert(original_file_path)
+            logger.info(f"Converted {file_id} to PPTX: {processing_file_path}")
         except Exception as e:
             # Clean up original file on conversion failure
             if os.path.exists(original_file_path):
@@ -47,73 +139,79 @@ async def extract_content(request: ExtractRequest):
             logger.error(f"Error converting PPT to PPTX for {file_id}: {e}")
             raise HTTPException(status_code=500, detail=f"PPT to PPTX conversion failed: {e}")
 
-    # Proceed with extraction
-    file_base_name = os.path.splitext(file_id)[0]
-    specific_extracted_path = os.path.join(settings.EXTRACTED_CONTENT_DIR, file_base_name)
-    os.makedirs(specific_extracted_path, exist_ok=True)
+    return original_file_path, processing_file_path
+
+async def iter_extraction(processing_file_path: str) -> AsyncIterator[SlideData]:
+    """Parsed slides one by one; the caller saves them with `save_extraction` once all are in.
+
+    The upload is left in place, so an interrupted extraction can start over;
+    remove it with `remove_uploaded_files` once the extraction is saved.
+    """
+    # Parse on the process pool, which hands back each slide as soon as it is ready
+    slides = stream_cpu(stream_slides, processing_file_path)
+    try:
+        while True:
+            with stage_timer("pptx_parse_slide"):
+                slide = await anext(slides, None)
+            if slide is None:
+                break
+            slide_data = SlideData(**slide)
+            logger.info(f"Extracted slide {slide_data.slide_number} with title: {slide_data.title}")
+            yield slide_data
+    finally:
+        await slides.aclose()
+
+async def stream_extraction(file_id: str, original_file_path: str, processing_file_path: str, stream_format: str):
+    extracted_slides_data: List[SlideData] = []
+    try:
+        yield encode_event("start", {"file_id": file_id}, stream_format)
+        async for slide_data in iter_extraction(processing_file_path):
+            extracted_slides_data.append(slide_data)
+            yield encode_event("slide", slide_data.model_dump(), stream_format)
+        response = await run_io(save_extraction, file_id, extracted_slides_data)
+        await run_io(remove_uploaded_files, original_file_path)
+        yield encode_event("done", {
+            "file_id": file_id,
+            "extraction_id": response.extraction_id,
+            "slide_count": len(extracted_slides_data)
+        }, stream_format)
+    except Exception as e:
+        logger.error(f"Error extracting content from {file_id}: {e}")
+        yield encode_event("error", {"file_id": file_id, "error": f"Extraction failed: {e}"}, stream_format)
+
+@router.post("/api/extract")
+async def extract_content(request: ExtractRequest):
+    file_id = request.file_id
+
+    cached_response = await run_io(get_prepared_extraction, file_id)
+    if cached_response is not None:
+        await run_io(release_upload, file_id)
+        logger.info(f"Serving prepared extraction for {file_id}")
+        if request.stream:
+            return stream_events(stream_cached_extraction(cached_response, request.stream_format), request.stream_format)
+        return cached_response
+
+    original_file_path, processing_file_path = await prepare_extraction(file_id)
+
+    if request.stream:
+        return stream_events(
+            stream_extraction(file_id, original_file_path, processing_file_path, request.stream_format),
+            request.stream_format
+        )
     
     extracted_slides_data: List[SlideData] = []
     
     try:
-        prs = Presentation(processing_file_path)
-        for i, slide in enumerate(prs.slides):
-            slide_number = i + 1
-            current_slide_data = SlideData(slide_number=slide_number)
-            image_index, table_index = 0, 0
-            title_shape = None
-            
-            if slide.shapes.title and slide.shapes.title.has_text_frame:
-                title_shape = slide.shapes.title
-                current_slide_data.title = title_shape.text.strip()
-            
-            for shape in slide.shapes:
-                if shape.has_text_frame and shape != title_shape:
-                    text = shape.text.strip()
-                    if text:
-                        current_slide_data.text_elements.append(text)
-                
-                if shape.shape_type == MSO_SHAPE_TYPE.PICTURE:
-                    image = shape.image
-                    img_filename = f"slide_{slide_number}_img_{image_index}.{image.ext.lower()}"
-                    img_save_path = os.path.join(specific_extracted_path, img_filename)
-                    with open(img_save_path, 'wb') as f:
-                        f.write(image.blob)
-                    current_slide_data.images.append(ImageInfo(
-                        filename=img_filename,
-                        content_type=image.content_type,
-                        width_emu=image.size[0],
-                        height_emu=image.size[1]
-                    ))
-                    image_index += 1
-                
-                if shape.shape_type == MSO_SHAPE_TYPE.TABLE:
-                    table = shape.table
-                    table_data_list = [[cell.text.strip() for cell in row.cells] for row in table.rows]
-                    if table_data_list:
-                        current_slide_data.tables.append(TableData(rows=table_data_list))
-                        table_index += 1
-            
-            extracted_slides_data.append(current_slide_data)
-            logger.info(f"Extracted slide {slide_number} with title: {current_slide_data.title}")
+        with stage_timer("pptx_parse"):
+            extracted_slides_data = await run_cpu(extract_slides, processing_file_path)
+        for slide_data in extracted_slides_data:
+            logger.info(f"Extracted slide {slide_data.slide_number} with title: {slide_data.title}")
     
     except Exception as e:
         logger.error(f"Error extracting content from {file_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Extraction failed: {e}")
     
     finally:
-        # Clean up both original and converted files
-        try:
-            if os.path.exists(original_file_path):
-                os.remove(original_file_path)
-                logger.info(f"Cleaned up original file: {original_file_path}")
-            if converted_file_path and os.path.exists(converted_file_path):
-                os.remove(converted_file_path)
-                logger.info(f"Cleaned up converted file: {converted_file_path}")
-        except Exception as e:
-            logger.warning(f"Failed to clean up files: {e}")
+        await run_io(remove_uploaded_files, original_file_path)
 
-    return ExtractionResponse(
-        file_id=file_id,
-        extracted_content_path=specific_extracted_path,
-        slides=extracted_slides_data
-    )
\ No newline at end of file
+    return await run_io(save_extraction, file_id, extracted_slides_data)
@@ -0,0 +1,22 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+from config import settings
+from storage import storage, LocalStorage
+import hashlib
+import os
+
+router = APIRouter()
+
+@router.get(f"{settings.GENERATED_IMAGE_BASE_URL}/{{file_path:path}}")
+async def get_generated_image(file_path: str, request: Request):
+    path = storage.path_for(file_path) if isinstance(storage, LocalStorage) else None
+    if path is None or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="File not found")
+    stat = os.stat(path)
+    etag = f'"{hashlib.md5(f"{stat.st_mtime_ns}-{stat.st_size}".encode()).hexdigest()}"'
+    # Stored objects are never rewritten under the same key, so clients may cache them for good
+    headers = {"ETag": etag, "Cache-Control": settings.GENERATED_IMAGE_CACHE_CONTROL}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    # FileResponse answers Range requests with 206 partial content
+    return FileResponse(path, headers=headers, stat_result=stat)
@@ -1,98 +1,450 @@
 from fastapi import APIRouter, HTTPException
-from models import SceneGenerationRequest, SceneGenerationResponse, Scene, ImageGenerationRequest, ImageGenerationResponse
-from utils import format_slide_content_for_llm, merge_with_logo
+from models import SceneGenerationRequest, SceneGenerationResponse, Scene, SlideData, ImageGenerationRequest, ImageGenerationResponse, BatchImageGenerationRequest, ImageGenerationError
+from utils import format_slide_content_for_llm, format_slide_text_for_llm, merge_with_logo
 from config import settings, logger
+from executor import run_io
+from cache import PersistentCache, SingleFlight
+from streaming import encode_event, stream_events
+from routes.extract import get_session_extraction
+from metrics import stage_timer, count_bytes
 import os
 import json
-import google.generativeai as genarativeai
-from google.generativeai.types import HarmCategory, HarmBlockThreshold
-import google as genaiImg
-from google.genai import types
-from google import genai
-import cloudinary.uploader
-from io import BytesIO
-from typing import List
+import asyncio
+import hashlib
+from storage import storage
+import gemini
+import upstream
+from PIL import Image
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
 
 router = APIRouter()
-#GOOGLE_API_KEY = os.getenv("GOOGLE_GENAI_API_KEY")
-print("Settings: ", settings.GOOGLE_API_KEY)
-@router.post("/api/generate-scenes", response_model=SceneGenerationResponse)
-async def generate_scenes(request: SceneGenerationRequest):
-    if not settings.GOOGLE_API_KEY:
-        logger.error("Gemini API Key not configured on server.")
-        raise HTTPException(status_code=500, detail="Gemini API Key not configured on server.")
-    extraction_data = request.extraction_data
-    all_scenes: List[Scene] = []
-    extracted_content_path = extraction_data.extracted_content_path
-    genarativeai.configure(api_key=settings.GOOGLE_API_KEY)
-    model = genarativeai.GenerativeModel(
-        'gemini-2.0-flash',
-        generation_config=genarativeai.GenerationConfig(response_mime_type="application/json"),
-
-        safety_settings={
-            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-            HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-            HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-        }
-
-    )
-    system_prompt = """
-You are an AI assistant creating a video script storyboard from PowerPoint slide content.
+# Bump whenever SYSTEM_PROMPT or PACKED_SYSTEM_PROMPT changes so cached scenes from the old prompts are not reused
+SYSTEM_PROMPT_VERSION = "2"
+SCENE_RULES = """
 Analyze the provided text, table summaries, and images for each slide.
 Your goal is to break down the slide's information into one or more logical "scenes".
 For each scene, generate:
 1.  `speech_script`: A concise narration (1-2 sentences, conversational tone) summarizing the key point of that scene.
 2.  `image_prompt`: A descriptive text prompt (max 30 words) for an AI image generator to create a relevant, professional-looking background visual for this scene. Focus on the core concept, mood, or key elements. Avoid text in images unless essential.
 
-Structure your output as a JSON object containing a single key "scenes", which is a list of scene objects. Each scene object must have "speech_script" and "image_prompt" keys.
 Example scene object: {"speech_script": "...", "image_prompt": "..."}
 Ensure the narrative flows logically across scenes derived from the same slide.
 Base your output *only* on the provided slide content. Do not add external information.
 """
+SYSTEM_PROMPT = """
+You are an AI assistant creating a video script storyboard from PowerPoint slide content.
+""" + SCENE_RULES + """
+Structure your output as a JSON object containing a single key "scenes", which is a list of scene objects. Each scene object must have "speech_script" and "image_prompt" keys.
+"""
+
+# Several consecutive slides in one request; only the output shape differs from SYSTEM_PROMPT
+PACKED_SYSTEM_PROMPT = """
+You are an AI assistant creating a video script storyboard from several consecutive PowerPoint slides at once.
+Each slide is given between its own SLIDE <number> START/END markers; treat every slide independently.
+""" + SCENE_RULES + """
+Structure your output as a JSON object containing a single key "slides", which is a list with exactly one entry per slide given.
+Each entry must have the keys "slide_number" (the number from the slide's markers) and "scenes" (a list of scene objects with "speech_script" and "image_prompt" keys).
+Example entry: {"slide_number": 3, "scenes": [{"speech_script": "...", "image_prompt": "..."}]}
+"""
+
+# Text-only call per window of a large deck; the result is carried into later windows
+SUMMARY_PROMPT_VERSION = "1"
+SUMMARY_PROMPT = """
+You are summarizing one section of a long presentation so the narration of later sections can build on it.
+Summarize the key points, terms and conclusions of the slides below in at most {words} words.
+Structure your output as a JSON object containing a single key "summary" with the summary as a string.
+"""
+CONTEXT_START = "\n--- STORY SO FAR (earlier sections of this deck, for continuity only; do not narrate them again) ---\n"
+CONTEXT_END = "\n--- END OF STORY SO FAR ---\nContinue the narration naturally from where the story so far leaves off.\n"
+
+scene_cache = PersistentCache(
+    "scenes",
+    os.path.join(settings.CACHE_DIR, "scenes.json"),
+    max_entries=settings.SCENE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.SCENE_CACHE_TTL_SECONDS
+)
+
+summary_cache = PersistentCache(
+    "deck_summaries",
+    os.path.join(settings.CACHE_DIR, "deck_summaries.json"),
+    max_entries=settings.SCENE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.SCENE_CACHE_TTL_SECONDS
+)
+
+def scene_cache_key(prompt_parts: List[Any]) -> str:
+    digest = hashlib.sha256()
+    digest.update(f"{settings.GEMINI_TEXT_MODEL}:{SYSTEM_PROMPT_VERSION}".encode())
+    for part in prompt_parts:
+        if isinstance(part, str):
+            digest.update(b"text:" + part.encode())
+            continue
+        # Image parts are keyed by a hash of their bytes rather than the bytes themselves
+        blob = part if isinstance(part, dict) else getattr(part, "inline_data", None)
+        data = blob.get("data") if isinstance(blob, dict) else getattr(blob, "data", None)
+        if data is None:
+            digest.update(b"part:" + repr(part).encode())
+        else:
+            digest.update(b"blob:" + hashlib.sha256(data).hexdigest().encode())
+    return digest.hexdigest()
+
+def prompt_size(prompt_parts: List[Any]) -> int:
+    return sum(len(part.encode()) if isinstance(part, str) else len(part.get("data", b"")) for part in prompt_parts)
+
+def placeholder_scene(slide_number: int, speech_script: str, image_prompt: str) -> Scene:
+    # Stands in for a slide whose scenes could not be generated; never cached
+    return Scene(
+        speech_script=speech_script,
+        image_prompt=image_prompt,
+        original_slide_number=slide_number,
+        scene_id=f"slide_{slide_number}_error"
+    )
+
+def is_placeholder(scene: Scene) -> bool:
+    return scene.scene_id == f"slide_{scene.original_slide_number}_error"
+
+def error_scene(slide_number: int) -> Scene:
+    return placeholder_scene(slide_number, f"Error processing slide {slide_number}", "error background")
+
+def scenes_from_json(slide_number: int, slide_scenes: List[Dict[str, Any]]) -> List[Scene]:
+    return [
+        Scene(
+            speech_script=scene_json.get("speech_script", "No script generated"),
+            image_prompt=scene_json.get("image_prompt", "generic background"),
+            original_slide_number=slide_number,
+            scene_id=f"slide_{slide_number}_scene_{scene_idx}"
+        )
+        for scene_idx, scene_json in enumerate(slide_scenes, 1)
+    ]
+
+async def slide_prompt(slide_data: SlideData, context: Optional[str] = None) -> Tuple[List[Any], List[Any], str]:
+    """Content parts for one slide, its single-slide prompt and the scene cache key of that prompt."""
+    with stage_timer("llm_prompt_prep"):
+        slide_content_parts = await run_io(format_slide_content_for_llm, slide_data)
+    prompt_parts = [SYSTEM_PROMPT] + ([context] if context else []) + ["\n--- SLIDE CONTENT START ---\n"]
+    prompt_parts.extend(slide_content_parts)
+    prompt_parts.append("\n--- SLIDE CONTENT END ---\nGenerate scenes based *only* on the content above:")
+    return slide_content_parts, prompt_parts, scene_cache_key(prompt_parts)
+
+def cached_slide_scenes(slide_number: int, cache_key: str) -> Optional[List[Scene]]:
+    cached_scenes = scene_cache.get(cache_key)
+    if cached_scenes is None:
+        return None
+    logger.info(f"Scene cache hit for slide {slide_number}")
+    return scenes_from_json(slide_number, cached_scenes)
+
+async def cache_slide_scenes(cache_key: str, scenes: List[Scene]):
+    await run_io(scene_cache.set, cache_key, [
+        {"speech_script": scene.speech_script, "image_prompt": scene.image_prompt}
+        for scene in scenes
+    ])
+
+async def request_slide_scenes(model, slide_data: SlideData, prompt_parts: List[Any], cache_key: str, semaphore: asyncio.Semaphore) -> List[Scene]:
     try:
-        for slide_data in extraction_data.slides:
-            slide_content_parts = format_slide_content_for_llm(slide_data, extracted_content_path)
-            prompt_parts = [system_prompt, "\n--- SLIDE CONTENT START ---\n"]
-            prompt_parts.extend(slide_content_parts)
-            prompt_parts.append("\n--- SLIDE CONTENT END ---\nGenerate scenes based *only* on the content above:")
-            response = model.generate_content(prompt_parts, stream=False)
-            if not response.candidates or not response.candidates[0].content.parts:
-                logger.error(f"Error: No content generated for slide {slide_data.slide_number}.")
-                all_scenes.append(Scene(
-                    original_slide_number=slide_data.slide_number,
-                    speech_script=f"Error: Could not generate content for slide {slide_data.slide_number}. Review original slide.",
-                    image_prompt="abstract error message background"
-                ))
-                continue
-            try:
-                generated_json = json.loads(response.text)
-                slide_scenes = generated_json.get("scenes", [])
-                if not slide_scenes:
-                    all_scenes.append(Scene(
-                        speech_script=f"Notice: AI could not determine distinct scenes for slide {slide_data.slide_number}.",
-                        image_prompt="simple placeholder graphic",
-                        original_slide_number=slide_data.slide_number
-                    ))
-                    continue
-                for scene_idx, scene_json in enumerate(slide_scenes, 1):
-                    all_scenes.append(Scene(
-                        speech_script=scene_json.get("speech_script", "No script generated"),
-                        image_prompt=scene_json.get("image_prompt", "generic background"),
-                        original_slide_number=slide_data.slide_number,
-                        scene_id=f"slide_{slide_data.slide_number}_scene_{scene_idx}"
-                    ))
-            except json.JSONDecodeError as e:
-                logger.error(f"Error decoding JSON for slide {slide_data.slide_number}: {e}")
-                all_scenes.append(Scene(
-                    speech_script=f"Error processing slide {slide_data.slide_number}",
-                    image_prompt="error background",
-                    original_slide_number=slide_data.slide_number,
-                    scene_id=f"slide_{slide_data.slide_number}_error"
-                ))
+        count_bytes("gemini", sent=prompt_size(prompt_parts))
+        response = await upstream.gemini_text.call("generate_scenes", lambda: asyncio.wait_for(
+            model.generate(prompt_parts),
+            timeout=settings.GEMINI_SLIDE_TIMEOUT
+        ), gate=semaphore)
+    except asyncio.TimeoutError:
+        logger.error(f"Timed out after {settings.GEMINI_SLIDE_TIMEOUT}s generating scenes for slide {slide_data.slide_number}.")
+        return [error_scene(slide_data.slide_number)]
+    if not response.candidates or not response.candidates[0].content.parts:
+        logger.error(f"Error: No content generated for slide {slide_data.slide_number}.")
+        return [placeholder_scene(
+            slide_data.slide_number,
+            f"Error: Could not generate content for slide {slide_data.slide_number}. Review original slide.",
+            "abstract error message background"
+        )]
+    try:
+        generated_json = json.loads(response.text)
+        slide_scenes = generated_json.get("scenes", [])
+        if not slide_scenes:
+            return [placeholder_scene(
+                slide_data.slide_number,
+                f"Notice: AI could not determine distinct scenes for slide {slide_data.slide_number}.",
+                "simple placeholder graphic"
+            )]
+        scenes = scenes_from_json(slide_data.slide_number, slide_scenes)
+        await cache_slide_scenes(cache_key, scenes)
+        return scenes
+    except json.JSONDecodeError as e:
+        logger.error(f"Error decoding JSON for slide {slide_data.slide_number}: {e}")
+        return [error_scene(slide_data.slide_number)]
+
+async def generate_slide_scenes(model, slide_data: SlideData, semaphore: asyncio.Semaphore, use_cache: bool = True) -> List[Scene]:
+    _, prompt_parts, cache_key = await slide_prompt(slide_data)
+    if use_cache:
+        cached_scenes = await run_io(cached_slide_scenes, slide_data.slide_number, cache_key)
+        if cached_scenes is not None:
+            return cached_scenes
+    return await request_slide_scenes(model, slide_data, prompt_parts, cache_key, semaphore)
+
+def estimate_tokens(parts: List[Any]) -> int:
+    # Rough count (about 4 characters per token, a flat cost per image); only used to size packs
+    return sum(
+        len(part) // 4 + 1 if isinstance(part, str) else settings.LLM_IMAGE_TOKEN_ESTIMATE
+        for part in parts
+    )
+
+def pack_slides(prepared: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Group consecutive slides into packs that stay under SCENE_PACK_TOKEN_BUDGET."""
+    packs: List[List[Dict[str, Any]]] = []
+    budget = settings.SCENE_PACK_TOKEN_BUDGET - estimate_tokens([PACKED_SYSTEM_PROMPT])
+    used = 0
+    for slide in prepared:
+        tokens = estimate_tokens(slide["content_parts"])
+        if (
+            packs
+            and len(packs[-1]) < settings.SCENE_PACK_MAX_SLIDES
+            and slide["slide_data"].slide_number == packs[-1][-1]["slide_data"].slide_number + 1
+            and used + tokens <= budget
+        ):
+            packs[-1].append(slide)
+            used += tokens
+        else:
+            packs.append([slide])
+            used = tokens
+    return packs
+
+async def request_packed_scenes(model, pack: List[Dict[str, Any]], semaphore: asyncio.Semaphore, context: Optional[str] = None) -> Dict[int, List[Scene]]:
+    """One Gemini call for several slides; raises ValueError when the answer does not cover every slide."""
+    prompt_parts: List[Any] = [PACKED_SYSTEM_PROMPT] + ([context] if context else [])
+    for slide in pack:
+        slide_number = slide["slide_data"].slide_number
+        prompt_parts.append(f"\n--- SLIDE {slide_number} START ---\n")
+        prompt_parts.extend(slide["content_parts"])
+        prompt_parts.append(f"\n--- SLIDE {slide_number} END ---\n")
+    prompt_parts.append("Generate scenes for every slide above, based *only* on its own content:")
+    count_bytes("gemini", sent=prompt_size(prompt_parts))
+    response = await upstream.gemini_text.call("generate_scenes_packed", lambda: asyncio.wait_for(
+        model.generate(prompt_parts),
+        timeout=settings.SCENE_PACK_TIMEOUT
+    ), gate=semaphore)
+    if not response.text:
+        raise ValueError("empty response")
+    answer = json.loads(response.text)
+    slides_json = answer.get("slides") if isinstance(answer, dict) else None
+    if not isinstance(slides_json, list):
+        raise ValueError("response has no 'slides' list")
+    scenes_by_slide = {
+        str(entry.get("slide_number")): entry.get("scenes")
+        for entry in slides_json
+        if isinstance(entry, dict)
+    }
+    results: Dict[int, List[Scene]] = {}
+    for slide in pack:
+        slide_number = slide["slide_data"].slide_number
+        slide_scenes = scenes_by_slide.get(str(slide_number))
+        if not isinstance(slide_scenes, list) or not slide_scenes or not all(isinstance(scene, dict) for scene in slide_scenes):
+            raise ValueError(f"no usable scenes for slide {slide_number}")
+        results[slide_number] = scenes_from_json(slide_number, slide_scenes)
+    # Cached per slide, so later single-slide or differently packed requests reuse them
+    for slide in pack:
+        await cache_slide_scenes(slide["cache_key"], results[slide["slide_data"].slide_number])
+    return results
+
+async def generate_pack_scenes(model, pack: List[Dict[str, Any]], semaphore: asyncio.Semaphore, context: Optional[str] = None) -> Dict[int, Any]:
+    if len(pack) > 1:
+        slide_numbers = [slide["slide_data"].slide_number for slide in pack]
+        try:
+            results = await request_packed_scenes(model, pack, semaphore, context)
+            logger.info(f"Generated scenes for slides {slide_numbers} in one packed request")
+            return results
+        except ValueError as e:
+            # Only a malformed answer is worth asking again slide by slide (JSONDecodeError is a ValueError)
+            logger.warning(f"Packed scene generation for slides {slide_numbers} returned an unusable answer, retrying per slide: {e}")
+        except Exception as e:
+            # Rate limits and timeouts would only get worse with one call per slide; the limiter already retried
+            logger.error(f"Packed scene generation for slides {slide_numbers} failed: {e}")
+            return {slide_number: e for slide_number in slide_numbers}
+    results = await asyncio.gather(
+        *[
+            request_slide_scenes(model, slide["slide_data"], slide["prompt_parts"], slide["cache_key"], semaphore)
+            for slide in pack
+        ],
+        return_exceptions=True
+    )
+    return {slide["slide_data"].slide_number: result for slide, result in zip(pack, results)}
+
+def partition_cached(slides: List[SlideData], prompts: List[Any], use_cache: bool) -> Tuple[Dict[int, Any], List[Dict[str, Any]]]:
+    """Results for slides answered by the cache (or whose prompt failed) and the slides still to generate."""
+    results_by_slide: Dict[int, Any] = {}
+    pending: List[Dict[str, Any]] = []
+    for slide_data, prompt in zip(slides, prompts):
+        if isinstance(prompt, Exception):
+            results_by_slide[slide_data.slide_number] = prompt
+            continue
+        content_parts, prompt_parts, cache_key = prompt
+        cached_scenes = cached_slide_scenes(slide_data.slide_number, cache_key) if use_cache else None
+        if cached_scenes is not None:
+            results_by_slide[slide_data.slide_number] = cached_scenes
+            continue
+        pending.append({
+            "slide_data": slide_data,
+            "content_parts": content_parts,
+            "prompt_parts": prompt_parts,
+            "cache_key": cache_key
+        })
+    return results_by_slide, pending
+
+async def generate_slides_scenes(model, slides: List[SlideData], semaphore: asyncio.Semaphore,
+                                 use_cache: bool = True, packing: bool = True, context: Optional[str] = None) -> Dict[int, Any]:
+    """Scenes (or the exception) per slide number, packing consecutive uncached slides when `packing`."""
+    prompts = await asyncio.gather(
+        *[slide_prompt(slide_data, context) for slide_data in slides],
+        return_exceptions=True
+    )
+    results_by_slide, pending = await run_io(partition_cached, slides, prompts, use_cache)
+    packs = pack_slides(pending) if packing else [[slide] for slide in pending]
+    for pack_results in await asyncio.gather(*[generate_pack_scenes(model, pack, semaphore, context) for pack in packs]):
+        results_by_slide.update(pack_results)
+    return results_by_slide
+
+def is_large_deck(slide_count: int) -> bool:
+    return settings.LARGE_DECK_MODE and slide_count > settings.MAX_SLIDES
+
+def slide_windows(slides: List[SlideData]) -> List[List[SlideData]]:
+    size = settings.LARGE_DECK_WINDOW_SLIDES
+    return [slides[start:start + size] for start in range(0, len(slides), size)]
+
+def window_label(slides: List[SlideData]) -> str:
+    return f"Slides {slides[0].slide_number}-{slides[-1].slide_number}"
+
+def fallback_summary(slides: List[SlideData]) -> str:
+    # The titles alone still tell later windows where the story is
+    return "; ".join(slide.title for slide in slides if slide.title)
+
+async def summarize_window(model, slides: List[SlideData], semaphore: asyncio.Semaphore) -> str:
+    """Short summary of a window's text; never raises, falling back to the slide titles."""
+    prompt_parts: List[Any] = [SUMMARY_PROMPT.format(words=settings.LARGE_DECK_SUMMARY_WORDS)]
+    for slide_data in slides:
+        prompt_parts.append(f"\n--- SLIDE {slide_data.slide_number} ---\n")
+        prompt_parts.extend(format_slide_text_for_llm(slide_data))
+    cache_key = hashlib.sha256(
+        f"{settings.GEMINI_TEXT_MODEL}:{SUMMARY_PROMPT_VERSION}:".encode() + "".join(prompt_parts).encode()
+    ).hexdigest()
+    cached_summary = await run_io(summary_cache.get, cache_key)
+    if cached_summary is not None:
+        return cached_summary
+    try:
+        count_bytes("gemini", sent=prompt_size(prompt_parts))
+        response = await upstream.gemini_text.call(
+            "summarize_window",
+            lambda: asyncio.wait_for(model.generate(prompt_parts), timeout=settings.GEMINI_SLIDE_TIMEOUT),
+            gate=semaphore
+        )
+        summary = json.loads(response.text).get("summary")
+        if not isinstance(summary, str) or not summary.strip():
+            raise ValueError("response has no summary")
     except Exception as e:
-        logger.error(f"Error generating scenes: {e}")
-        raise HTTPException(status_code=500, detail=f"Error generating scenes: {str(e)}")
+        logger.warning(f"Summarizing {window_label(slides)} failed, using slide titles instead: {e}")
+        return fallback_summary(slides)
+    # Hold the model to its word budget so the rolling context cannot grow
+    summary = " ".join(summary.split()[:settings.LARGE_DECK_SUMMARY_WORDS])
+    await run_io(summary_cache.set, cache_key, summary)
+    return summary
+
+class DeckNarrative:
+    """Rolling context for decks larger than MAX_SLIDES.
+
+    Every window of LARGE_DECK_WINDOW_SLIDES slides gets a text-only summary
+    call as soon as its slides are known, all in parallel. A window's scenes
+    are generated with the summaries of the LARGE_DECK_CONTEXT_WINDOWS windows
+    before it, so the context stays the same size however long the deck is
+    and a window only waits for its predecessors' summaries, not their scenes.
+    """
+
+    def __init__(self, model, semaphore: asyncio.Semaphore):
+        self.model = model
+        self.semaphore = semaphore
+        self.labels: Dict[int, str] = {}
+        self.summaries: Dict[int, asyncio.Task] = {}
+
+    def add_window(self, index: int, slides: List[SlideData]):
+        if index not in self.summaries:
+            self.labels[index] = window_label(slides)
+            self.summaries[index] = asyncio.create_task(summarize_window(self.model, slides, self.semaphore))
+
+    async def context(self, index: int) -> Optional[str]:
+        previous = [
+            window for window in range(max(index - settings.LARGE_DECK_CONTEXT_WINDOWS, 0), index)
+            if window in self.summaries
+        ]
+        # Shielded: summaries are shared by every later window, one cancelled waiter must not cancel them
+        summaries = await asyncio.gather(*[asyncio.shield(self.summaries[window]) for window in previous])
+        lines = [f"{self.labels[window]}: {summary}" for window, summary in zip(previous, summaries) if summary]
+        return CONTEXT_START + "\n".join(lines) + CONTEXT_END if lines else None
+
+    def close(self):
+        for task in self.summaries.values():
+            task.cancel()
+
+async def generate_window_scenes(model, narrative: DeckNarrative, index: int, slides: List[SlideData], semaphore: asyncio.Semaphore,
+                                 use_cache: bool = True, packing: bool = True) -> Dict[int, Any]:
+    context = await narrative.context(index)
+    return await generate_slides_scenes(model, slides, semaphore, use_cache, packing, context)
+
+async def generate_large_deck_scenes(model, slides: List[SlideData], semaphore: asyncio.Semaphore,
+                                     use_cache: bool = True, packing: bool = True) -> Dict[int, Any]:
+    narrative = DeckNarrative(model, semaphore)
+    windows = slide_windows(slides)
+    for index, window in enumerate(windows):
+        narrative.add_window(index, window)
+    # Bounds how many windows hold their prepared prompts (with image bytes) at once
+    window_slots = asyncio.Semaphore(settings.LARGE_DECK_PARALLEL_WINDOWS)
+
+    async def run_window(index: int, window: List[SlideData]) -> Dict[int, Any]:
+        async with window_slots:
+            return await generate_window_scenes(model, narrative, index, window, semaphore, use_cache, packing)
+
+    try:
+        results_by_slide: Dict[int, Any] = {}
+        for window_results in await asyncio.gather(*[run_window(index, window) for index, window in enumerate(windows)]):
+            results_by_slide.update(window_results)
+        logger.info(f"Generated scenes for {len(slides)} slides in {len(windows)} windows")
+        return results_by_slide
+    finally:
+        narrative.close()
+
+async def build_scene_model() -> gemini.SceneModel:
+    return await gemini.get_scene_model()
+
+@router.post("/api/generate-scenes", response_model=SceneGenerationResponse)
+async def generate_scenes(request: SceneGenerationRequest):
+    if not settings.GOOGLE_API_KEY:
+        logger.error("Gemini API Key not configured on server.")
+        raise HTTPException(status_code=500, detail="Gemini API Key not configured on server.")
+    extraction_data = request.extraction_data
+    if extraction_data is None:
+        if not request.file_id:
+            raise HTTPException(status_code=400, detail="Either file_id or extraction_data is required")
+        extraction_data = await get_session_extraction(request.file_id)
+        if extraction_data is None:
+            logger.warning(f"No extraction found for {request.file_id}")
+            raise HTTPException(status_code=404, detail=f"No extraction found for {request.file_id}; call /api/extract first")
+    all_scenes: List[Scene] = []
+    model = await build_scene_model()
+    semaphore = asyncio.Semaphore(settings.GEMINI_MAX_CONCURRENCY)
+    pack_slides_enabled = settings.SCENE_PACKING if request.pack_slides is None else request.pack_slides
+    generate = generate_large_deck_scenes if is_large_deck(len(extraction_data.slides)) else generate_slides_scenes
+    results_by_slide = await generate(
+        model,
+        extraction_data.slides,
+        semaphore,
+        use_cache=not request.bypass_cache,
+        packing=pack_slides_enabled
+    )
+    results = [results_by_slide[slide_data.slide_number] for slide_data in extraction_data.slides]
+    # Only fail the whole request when no slide could be processed at all
+    if results and all(isinstance(result, Exception) for result in results):
+        logger.error(f"Error generating scenes: {results[0]}")
+        raise HTTPException(status_code=500, detail=f"Error generating scenes: {str(results[0])}")
+    for slide_data, result in zip(extraction_data.slides, results):
+        if isinstance(result, Exception):
+            logger.error(f"Error generating scenes for slide {slide_data.slide_number}: {result}")
+            result = [error_scene(slide_data.slide_number)]
+        all_scenes.extend(result)
     
     logger.info(f"Generated {len(all_scenes)} scenes for file {extraction_data.file_id}.")
     return SceneGenerationResponse(
@@ -100,52 +452,95 @@ Base your output *only* on the provided slide content. Do not add external infor
         scenes=all_scenes
     )
 
+image_cache = PersistentCache(
+    "images",
+    os.path.join(settings.CACHE_DIR, "images.json"),
+    max_entries=settings.IMAGE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.IMAGE_CACHE_TTL_SECONDS
+)
+image_flights = SingleFlight("images")
+
+def image_content_type(image_format: str) -> str:
+    # Image.MIME only fills in as PIL loads its plugins, which this worker may not have done yet
+    Image.init()
+    return Image.MIME[image_format]
+
+def image_cache_key(prompt: str, logo_url: str) -> str:
+    key_data = {
+        "prompt": prompt,
+        "logo_url": logo_url,
+        "model": settings.GEMINI_IMAGE_MODEL,
+        "output_format": settings.IMAGE_OUTPUT_FORMAT,
+        "output_quality": settings.IMAGE_OUTPUT_QUALITY,
+        "size": [settings.VIDEO_WIDTH, settings.VIDEO_HEIGHT],
+        "folder": "generated_images",
+        "storage": settings.STORAGE_BACKEND,
+    }
+    return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode()).hexdigest()
+
+async def render_and_upload_image(prompt: str, logo_url: str, cache_key: str, logo_id: Optional[str] = None) -> str:
+    # Generate image using the AI model
+    client = await gemini.get_client()
+    from google.genai import types
+    count_bytes("gemini", sent=len(prompt.encode()))
+    response = await upstream.gemini_image.call("generate_image", lambda: run_io(
+        client.models.generate_content,
+        model=settings.GEMINI_IMAGE_MODEL,
+        contents=prompt,
+        config=types.GenerateContentConfig(response_modalities=['TEXT', 'IMAGE'])
+    ))
+    
+    # Extract image data
+    image_data = None
+    for part in response.candidates[0].content.parts:
+        if part.inline_data is not None:
+            image_data = part.inline_data.data
+            count_bytes("gemini", received=len(image_data))
+            break
+    if image_data is None:
+        logger.error("No image data received from the model.")
+        raise HTTPException(status_code=500, detail="No image data received from the model.")
+    
+    # Merge the background image with the logo
+    merged_image_data = await merge_with_logo(image_data, logo_url, logo_id=logo_id)
+    if merged_image_data is None:
+        logger.error("Failed to merge image with logo.")
+        raise HTTPException(status_code=500, detail="Failed to merge image with logo.")
+    
+    # Upload the merged image to the configured storage backend
+    public_image_url = await storage.save(
+        merged_image_data,
+        f"generated_images/{uuid.uuid4()}",
+        image_content_type(settings.IMAGE_OUTPUT_FORMAT)
+    )
+    await run_io(image_cache.set, cache_key, public_image_url)
+    return public_image_url
+
+async def render_scene_image(prompt: str, logo_url: str, regenerate: bool = False, logo_id: Optional[str] = None) -> str:
+    cache_key = image_cache_key(prompt, logo_url)
+    if not regenerate:
+        cached_url = await run_io(image_cache.get, cache_key)
+        if cached_url is not None and await storage.exists(cached_url):
+            logger.info(f"Image cache hit: {cached_url}")
+            return cached_url
+    # Identical concurrent requests share one generation; regenerations only coalesce with each other
+    flight_key = f"{cache_key}:regenerate" if regenerate else cache_key
+    return await image_flights.run(flight_key, lambda: render_and_upload_image(prompt, logo_url, cache_key, logo_id=logo_id))
+
 @router.post("/api/generate-image", response_model=ImageGenerationResponse)
 async def generate_image(request: ImageGenerationRequest):
     if not request.scene_id:
         logger.error("scene_id is required for image generation.")
         raise HTTPException(status_code=400, detail="scene_id is required for image generation")
     
+    logo_id = request.logo_id
+    logo_url = request.logo_url
+    if not logo_url:
+        logger.warning(f"Logo with ID '{logo_id}' not found.")
+        raise HTTPException(status_code=404, detail=f"Logo with ID '{logo_id}' not found.")
+    
     try:
-        # Generate image using the AI model
-        client = genai.Client(api_key=settings.GOOGLE_API_KEY)
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-exp-image-generation",
-            contents=request.prompt,
-            config=genai.types.GenerateContentConfig(response_modalities=['TEXT', 'IMAGE'])
-        )
-        
-        # Extract image data
-        image_data = None
-        for part in response.candidates[0].content.parts:
-            if part.inline_data is not None:
-                image_data = part.inline_data.data
-                break
-        if image_data is None:
-            logger.error("No image data received from the model.")
-            raise HTTPException(status_code=500, detail="No image data received from the model.")
-        
-        # Retrieve logo URL based on logo_id
-        logo_id = request.logo_id
-        logo_url = request.logo_url  # Assuming logo_url is passed in the request
-         # You need to implement this
-        if not logo_url:
-            logger.warning(f"Logo with ID '{logo_id}' not found.")
-            raise HTTPException(status_code=404, detail=f"Logo with ID '{logo_id}' not found.")
-        
-        # Merge the background image with the logo
-        merged_image_data = await merge_with_logo(image_data, logo_url)
-        if merged_image_data is None:
-            logger.error("Failed to merge image with logo.")
-            raise HTTPException(status_code=500, detail="Failed to merge image with logo.")
-        
-        # Upload the merged image to Cloudinary
-        upload_result = cloudinary.uploader.upload(
-            BytesIO(merged_image_data),
-            folder="generated_images"
-        )
-        public_image_url = upload_result['secure_url']
-        
+        public_image_url = await render_scene_image(request.prompt, logo_url, regenerate=request.regenerate, logo_id=logo_id)
         logger.info(f"Image generated and uploaded successfully: {public_image_url}")
         return ImageGenerationResponse(
             scene_id=request.scene_id,
@@ -154,4 +549,44 @@ async def generate_image(request: ImageGenerationRequest):
         )
     except Exception as e:
         logger.error(f"Error generating image: {e}")
-        raise HTTPException(status_code=500, detail=f"Image generation failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Image generation failed: {str(e)}")
+
+@router.post("/api/generate-images")
+async def generate_images(request: BatchImageGenerationRequest):
+    if not request.logo_url:
+        logger.warning(f"Logo with ID '{request.logo_id}' not found.")
+        raise HTTPException(status_code=404, detail=f"Logo with ID '{request.logo_id}' not found.")
+
+    semaphore = asyncio.Semaphore(settings.IMAGE_BATCH_CONCURRENCY)
+
+    async def render(index: int, scene: Scene):
+        scene_id = scene.scene_id or f"scene_{index}"
+        if not scene.image_prompt:
+            return "error", ImageGenerationError(scene_id=scene_id, error="Scene has no image_prompt")
+        # 429s and transient errors are retried (and paced across requests) by upstream.gemini_image
+        async with semaphore:
+            try:
+                image_url = await render_scene_image(
+                    scene.image_prompt, request.logo_url, regenerate=request.regenerate, logo_id=request.logo_id
+                )
+                return "image", ImageGenerationResponse(scene_id=scene_id, image_url=image_url, logo_url=request.logo_url)
+            except Exception as e:
+                logger.error(f"Error generating image for {scene_id}: {e}")
+                return "error", ImageGenerationError(scene_id=scene_id, error=str(e))
+
+    async def events():
+        tasks = [asyncio.create_task(render(index, scene)) for index, scene in enumerate(request.scenes, 1)]
+        succeeded = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                event, result = await next_done
+                succeeded += event == "image"
+                yield encode_event(event, result.model_dump(), request.stream_format)
+            logger.info(f"Batch image generation finished: {succeeded}/{len(tasks)} scenes for file {request.file_id}")
+            yield encode_event("done", {"total": len(tasks), "succeeded": succeeded, "failed": len(tasks) - succeeded}, request.stream_format)
+        finally:
+            # Client went away: stop the remaining generations
+            for task in tasks:
+                task.cancel()
+
+    return stream_events(events(), request.stream_format)
@@ -0,0 +1,24 @@
+from fastapi import APIRouter
+from models import JobCreateRequest, JobStatusResponse
+from jobs import job_manager
+
+router = APIRouter()
+
+@router.post("/api/jobs", response_model=JobStatusResponse)
+async def create_job(request: JobCreateRequest):
+    job = await job_manager.create(request)
+    return job_manager.status(job)
+
+@router.get("/api/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    return job_manager.status(await job_manager.find(job_id))
+
+@router.post("/api/jobs/{job_id}/cancel", response_model=JobStatusResponse)
+async def cancel_job(job_id: str):
+    job = await job_manager.cancel(job_id)
+    return job_manager.status(job)
+
+@router.post("/api/jobs/{job_id}/resume", response_model=JobStatusResponse)
+async def resume_job(job_id: str):
+    job = await job_manager.resume(job_id)
+    return job_manager.status(job)
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, File, UploadFile, HTTPException
 from models import LogoUploadResponse
 from config import settings, logger
-import cloudinary.uploader
+from executor import run_io
+from logo_store import save_logo
+from storage import storage
 import uuid
 
 router = APIRouter()
@@ -14,17 +16,15 @@ async def upload_logo(logo: UploadFile = File(...)):
     
     logo_id = str(uuid.uuid4())
     try:
-        # Upload logo to Cloudinary
-        upload_result = cloudinary.uploader.upload(
-            logo.file,
-            public_id=f"logos/{logo_id}",  # Store in 'logos' folder with unique ID
-            resource_type="image"
-        )
-        logo_url = upload_result['secure_url']
-        logger.info(f"Logo uploaded successfully to Cloudinary: {logo_url}")
+        logo_data = await logo.read()
+        # Store the logo in the 'logos' folder under its unique ID
+        logo_url = await storage.save(logo_data, f"logos/{logo_id}", logo.content_type)
+        logger.info(f"Logo uploaded successfully to {storage.name} storage: {logo_url}")
+        # Keep a decoded, pre-resized copy so image generation never re-downloads it
+        await run_io(save_logo, logo_id, logo_data, logo_url)
         return LogoUploadResponse(logo_id=logo_id, logo_url=logo_url)  # Return logo_id and URL
     except Exception as e:
-        logger.error(f"Failed to upload logo to Cloudinary: {e}")
+        logger.error(f"Failed to upload logo to {storage.name} storage: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to upload logo: {str(e)}")
     finally:
         logo.file.close()
\ No newline at end of file
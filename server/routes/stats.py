@@ -0,0 +1,36 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+import cache
+import executor
+import startup
+import heygen
+import upstream
+from converter import conversion_service
+from storage import storage
+from artifacts import artifact_store
+from sessions import extraction_sessions
+from janitor import janitor
+from video_status import video_tracker
+
+router = APIRouter()
+
+@router.get("/api/stats")
+async def get_stats():
+    return {
+        "startup": startup.stats(),
+        "executor": executor.stats(),
+        "caches": cache.stats(),
+        "heygen_catalogs": heygen.stats(),
+        "upstream": upstream.stats(),
+        "converter": conversion_service.stats(),
+        "storage": storage.stats(),
+        "artifacts": artifact_store.stats(),
+        "extraction_sessions": extraction_sessions.stats(),
+        "janitor": janitor.stats(),
+        "video_status": video_tracker.stats()
+    }
+
+@router.get("/metrics")
+async def get_metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
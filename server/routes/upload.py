@@ -1,13 +1,27 @@
 from fastapi import APIRouter, File, UploadFile, HTTPException
-from utils import get_slide_count
+from utils import build_manifest, write_manifest, read_manifest
 from config import settings, logger
+from executor import run_io, run_cpu
+from routes.extract import get_cached_extraction
+from converter import conversion_service
+from metrics import stage_timer
+import hashlib
 import os
-import shutil
 import uuid
-from spire.presentation import Presentation as SpirePresentation, FileFormat
 
 router = APIRouter()
 
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+def save_upload(source, target_path: str) -> str:
+    # Hash while streaming so identical decks map to the same file_id
+    digest = hashlib.sha256()
+    with open(target_path, "wb") as buffer:
+        while chunk := source.read(UPLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+            buffer.write(chunk)
+    return digest.hexdigest()
+
 @router.post("/api/upload")
 async def upload_powerpoint(file: UploadFile = File(...)):
     file_ext = os.path.splitext(file.filename)[1].lower()
@@ -18,40 +32,56 @@ async def upload_powerpoint(file: UploadFile = File(...)):
             detail="Unsupported file type. Please upload a .ppt or .pptx file."
         )
 
-    # Generate a unique temporary filename
-    temp_filename = f"{uuid.uuid4()}{file_ext}"
-    temp_file_path = os.path.join(settings.TEMP_UPLOAD_DIR, temp_filename)
+    # Stream to a unique partial file, then name it after its content hash
+    partial_file_path = os.path.join(settings.TEMP_UPLOAD_DIR, f"{uuid.uuid4()}.part")
 
     # Save the uploaded file
     try:
         os.makedirs(settings.TEMP_UPLOAD_DIR, exist_ok=True)  # Ensure directory exists
-        with open(temp_file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        digest = await run_io(save_upload, file.file, partial_file_path)
         logger.info(f"File uploaded successfully: {file.filename}")
     except Exception as e:
+        if os.path.exists(partial_file_path):
+            os.remove(partial_file_path)
         logger.error(f"Failed to save file: {e}")
         raise HTTPException(status_code=500, detail="Failed to save file.")
     finally:
         await file.close()
 
-    # Handle .ppt conversion to .pptx for slide counting
+    temp_filename = f"{digest}{file_ext}"
+    temp_file_path = os.path.join(settings.TEMP_UPLOAD_DIR, temp_filename)
+
+    # A deck we have already extracted needs no conversion or parsing
+    cached_extraction = await run_io(get_cached_extraction, temp_filename)
+    if cached_extraction is not None:
+        await run_io(os.remove, partial_file_path)
+        logger.info(f"Duplicate upload of {file.filename} resolved to cached extraction {temp_filename}")
+        return {
+            "message": "Uploaded successfully!",
+            "filename": file.filename,
+            "file_id": temp_filename,
+            "slide_count": len(cached_extraction.slides)
+        }
+    # Same deck uploaded again before it was extracted: its manifest is still valid
+    manifest = await run_io(read_manifest, temp_filename)
+    if manifest is not None and os.path.exists(temp_file_path):
+        await run_io(os.remove, partial_file_path)
+        logger.info(f"Duplicate upload of {file.filename} resolved to existing manifest {temp_filename}")
+        return {
+            "message": "Uploaded successfully!",
+            "filename": file.filename,
+            "file_id": temp_filename,
+            "slide_count": manifest["slide_count"]
+        }
+    await run_io(os.replace, partial_file_path, temp_file_path)
+
+    # Handle .ppt conversion to .pptx; this is the only conversion the deck gets
     processing_file_path = temp_file_path
-    converted_file_path = None
     if file_ext == '.ppt':
         try:
-            # Load the PPT file with Spire.Presentation
-            spire_pptx = SpirePresentation()
-            spire_pptx.LoadFromFile(temp_file_path)
-            
-            # Save as PPTX
-            converted_filename = f"{uuid.uuid4()}.pptx"
-            converted_file_path = os.path.join(settings.TEMP_UPLOAD_DIR, converted_filename)
-            spire_pptx.SaveToFile(converted_file_path, FileFormat.Pptx2019)
-            spire_pptx.Dispose()  # Close the presentation
-            
-            # Update processing file path to the converted PPTX
-            processing_file_path = converted_file_path
-            logger.info(f"Converted {file.filename} to PPTX: {converted_filename}")
+            # The conversion pool owns the converted copy and caches it by content hash
+            processing_file_path = await conversion_service.convert(temp_file_path, digest)
+            logger.info(f"Converted {file.filename} to PPTX: {processing_file_path}")
         except Exception as e:
             # Clean up original file on conversion failure
             if os.path.exists(temp_file_path):
@@ -59,32 +89,32 @@ async def upload_powerpoint(file: UploadFile = File(...)):
             logger.error(f"Error converting PPT to PPTX for {file.filename}: {e}")
             raise HTTPException(status_code=500, detail=f"PPT to PPTX conversion failed: {e}")
 
-    # Process the file (original .pptx or converted .pptx)
+    # Parse the file once (original .pptx or converted .pptx); /api/extract builds on the manifest.
+    # Large decks are only counted here and extracted slide by slide by /api/extract or a job
     try:
-        slide_count = get_slide_count(processing_file_path)
-        if slide_count > settings.MAX_SLIDES:
+        with stage_timer("pptx_parse"):
+            manifest = await run_cpu(build_manifest, processing_file_path, settings.MAX_SLIDES)
+        slide_count = manifest["slide_count"]
+        if slide_count > settings.UPLOAD_MAX_SLIDES:
             logger.warning(f"File exceeds max slides: {file.filename}")
-            raise HTTPException(status_code=400, detail=f"Exceeds max {settings.MAX_SLIDES} slides.")
+            raise HTTPException(status_code=400, detail=f"Exceeds max {settings.UPLOAD_MAX_SLIDES} slides.")
         if slide_count == 0:
             logger.warning(f"No slides found in file: {file.filename}")
             raise HTTPException(status_code=400, detail="No slides found.")
+        await run_io(write_manifest, temp_filename, manifest)
     except HTTPException as e:
         # Clean up files on validation failure
         if os.path.exists(temp_file_path):
             os.remove(temp_file_path)
-        if converted_file_path and os.path.exists(converted_file_path):
-            os.remove(converted_file_path)
         raise e
     except Exception as e:
         # Clean up files on processing error
         if os.path.exists(temp_file_path):
             os.remove(temp_file_path)
-        if converted_file_path and os.path.exists(converted_file_path):
-            os.remove(converted_file_path)
         logger.error(f"Error processing file: {e}")
         raise HTTPException(status_code=500, detail=f"Error processing file: {e}")
 
-    # Retain files for extraction; cleanup will be handled by /api/extract
+    # Retain the upload and its manifest for extraction; cleanup will be handled by /api/extract
     logger.info(f"File processed successfully: {file.filename}")
     return {
         "message": "Uploaded successfully!",
@@ -1,30 +1,105 @@
-from fastapi import APIRouter, HTTPException
-from models import VideoGenerationRequest
+from fastapi import APIRouter, HTTPException, Request
+from models import VideoGenerationRequest, Scene, WebhookStandInRequest
 from config import settings, logger
-import requests
+from streaming import encode_event, stream_events
+from video_status import video_tracker, verify_webhook, webhook_event
+import heygen
+import aiohttp
+import asyncio
+import itertools
 import json
+from typing import Any, Dict, List
 
 router = APIRouter()
 
+def build_video_payload(scenes: List[Scene], avatar_id: str, voice_id: str) -> Dict[str, Any]:
+    video_inputs = []
+    for scene in scenes:
+        video_input = {
+            "character": {
+                "type": "avatar",
+                "avatar_id": avatar_id,
+                "scale": 0.60,
+                "avatar_style": "normal",
+                "offset": {"x": 0.36, "y": 0.21}
+            },
+            "voice": {
+                "type": "text",
+                "voice_id": voice_id,
+                "input_text": scene.speech_script,
+                "speed": 1.0
+            },
+            "background": {
+                "type": "image",
+                "url": scene.image_url,
+                "fit": "cover"
+            }
+        }
+        video_inputs.append(video_input)
+    return {
+        "video_inputs": video_inputs,
+        "dimension": {
+            "width": settings.VIDEO_WIDTH,
+            "height": settings.VIDEO_HEIGHT
+        }
+    }
+
+def split_video_segments(scenes: List[Scene]) -> List[List[Scene]]:
+    """Consecutive scenes grouped into videos within HeyGen's per-video limits.
+
+    A slide's scenes stay in one video unless that slide alone exceeds a limit.
+    """
+    segments: List[List[Scene]] = []
+    current: List[Scene] = []
+    chars = 0
+    for _, slide_scenes in itertools.groupby(scenes, key=lambda scene: scene.original_slide_number):
+        slide_scenes = list(slide_scenes)
+        slide_chars = sum(len(scene.speech_script) for scene in slide_scenes)
+        if current and (
+            len(current) + len(slide_scenes) > settings.HEYGEN_SEGMENT_MAX_SCENES
+            or chars + slide_chars > settings.HEYGEN_SEGMENT_MAX_CHARS
+        ):
+            segments.append(current)
+            current, chars = [], 0
+        for scene in slide_scenes:
+            if current and (
+                len(current) >= settings.HEYGEN_SEGMENT_MAX_SCENES
+                or chars + len(scene.speech_script) > settings.HEYGEN_SEGMENT_MAX_CHARS
+            ):
+                segments.append(current)
+                current, chars = [], 0
+            current.append(scene)
+            chars += len(scene.speech_script)
+    if current:
+        segments.append(current)
+    return segments
+
+def status_url(video_id: str) -> str:
+    return f"{settings.HEYGEN_API_BASE}/v1/video_status.get?video_id={video_id}"
+
+async def submit_video_segment(scenes: List[Scene], avatar_id: str, voice_id: str) -> str:
+    video_data = await heygen.generate_video(build_video_payload(scenes, avatar_id, voice_id))
+    video_id = video_data.get('data', {}).get('video_id')
+    if not video_id:
+        raise Exception(f"HeyGen did not return a video_id: {video_data}")
+    return video_id
+
+def segment_result(result: Any, scenes: List[Scene]) -> Dict[str, Any]:
+    scene_ids = [scene.scene_id for scene in scenes]
+    if isinstance(result, BaseException):
+        # The client can resubmit just these scenes
+        return {'video_id': None, 'error': str(result), 'scene_ids': scene_ids}
+    return {'video_id': result, 'status_url': status_url(result), 'scene_ids': scene_ids}
+
 @router.get("/api/get_avatars")
 async def get_avatars():
     try:
-        headers = {
-            "X-Api-Key": settings.HEYGEN_API_KEY,
-            "accept": "application/json"
-        }
-        response = requests.get(
-            "https://api.heygen.com/v2/avatars",
-            headers=headers,
-            timeout=40
-        )
-        response.raise_for_status()
-        response_data = response.json()
+        avatars = await heygen.avatars.get()
 
         logger.info("Avatars fetched successfully")
         return {
             "success": True,
-            "data": response_data.get("data", {}).get("avatars", [])
+            "data": avatars
         }
     except Exception as e:
         logger.error(f"Failed to fetch avatars: {e}")
@@ -33,24 +108,14 @@ async def get_avatars():
 @router.get("/api/get_voices")
 async def get_voices():
     try:
-        headers = {
-            "accept": "application/json",
-            "X-Api-Key": settings.HEYGEN_API_KEY
-        }
-        response = requests.get(
-            "https://api.heygen.com/v2/voices",
-            headers=headers,
-            timeout=10
-        )
-        response.raise_for_status()
-        response_data = response.json()
+        voices = await heygen.voices.get()
 
         logger.info("Voices fetched successfully")
         return {
             "success": True,
-            "data": response_data.get("data", {}).get("voices", [])
+            "data": voices
         }
-    except requests.exceptions.RequestException as e:
+    except (aiohttp.ClientError, heygen.HeyGenError) as e:
         logger.error(f"Failed to fetch voices: {e}")
         raise HTTPException(status_code=500, detail=f"HeyGen API request failed: {str(e)}")
     except Exception as e:
@@ -60,66 +125,43 @@ async def get_voices():
 @router.post("/api/generate-video")
 async def generate_video(request: VideoGenerationRequest):
     try:
-        video_inputs = []
-        for scene in request.scenes:
-            video_input = {
-                "character": {
-                    "type": "avatar",
-                    "avatar_id": request.avatar_id,
-                    "scale": 0.60,
-                    "avatar_style": "normal",
-                    "offset": {"x": 0.36, "y": 0.21}
-                },
-                "voice": {
-                    "type": "text",
-                    "voice_id": request.voice_id,
-                    "input_text": scene.speech_script,
-                    "speed": 1.0
-                },
-                "background": {
-                    "type": "image",
-                    "url": scene.image_url,
-                    "fit": "cover"
-                }
-            }
-            video_inputs.append(video_input)
-        payload = {
-            "video_inputs": video_inputs,
-            "dimension": {
-                "width": 1280,
-                "height": 720
-            }
-        }
-        headers = {
-            "accept": "application/json",
-            "content-type": "application/json",
-            "x-api-key": settings.HEYGEN_API_KEY
-        }
-        response = requests.post(
-            "https://api.heygen.com/v2/video/generate",
-            json=payload,
-            headers=headers
-        )
-      
-        if response.status_code == 200:
-            video_data = response.json()
-
-            logger.info(f"Video generated successfully: {video_data.get('data', {}).get('video_id')}")
-            return {
-                'success': True,
-                'video_id': video_data.get('data', {}).get('video_id'),
-                'status_url': f"https://api.heygen.com/v1/video_status.get?video_id={video_data.get('data', {}).get('video_id')}"
+        segments = split_video_segments(request.scenes)
+        try:
+            # Long decks become one HeyGen video per segment, submitted together. One failed segment must not
+            # hide the others: they are already billed videos, so every submitted id goes back to the client
+            results = await asyncio.gather(*[
+                submit_video_segment(segment, request.avatar_id, request.voice_id)
+                for segment in segments
+            ], return_exceptions=True)
+            video_ids = [result for result in results if not isinstance(result, BaseException)]
+            if not video_ids:
+                raise results[0]
+
+            logger.info(f"Video generated successfully: {', '.join(video_ids)}")
+            failed = [index + 1 for index, result in enumerate(results) if isinstance(result, BaseException)]
+            response = {
+                'success': not failed,
+                'video_id': video_ids[0],
+                'status_url': status_url(video_ids[0]),
+                'segments': [
+                    segment_result(result, segment)
+                    for result, segment in zip(results, segments)
+                ]
             }
-        else:
-            logger.error(f"HeyGen API error: {response.text}")
+            if failed:
+                logger.error(f"Video segments {failed} of {len(segments)} failed; submitted: {', '.join(video_ids)}")
+                response['error'] = f"Video segment(s) {', '.join(map(str, failed))} of {len(segments)} failed"
+            return response
+        except heygen.HeyGenError as e:
+            logger.error(f"HeyGen API error: {e.details}")
             
             return {
                 'success': False,
                 'error': 'HeyGen API error',
-                'status_code': response.status_code,
-                'details': response.text
+                'status_code': e.status_code,
+                'details': e.details
             }, 500
-    except requests.exceptions.RequestException as e:
+    except aiohttp.ClientError as e:
         logger.error(f"HeyGen API request failed: {e}")
         raise HTTPException(status_code=500, detail=f"HeyGen API request failed: {str(e)}")
     except Exception as e:
@@ -129,23 +171,14 @@ async def generate_video(request: VideoGenerationRequest):
 @router.get("/api/video-status/{video_id}")
 async def get_video_status(video_id: str):
     try:
-        headers = {
-            "accept": "application/json",
-            "x-api-key": settings.HEYGEN_API_KEY
-        }
-        response = requests.get(
-            f"https://api.heygen.com/v1/video_status.get?video_id={video_id}",
-            headers=headers
-        )
-        print("Response:",response.text)
-        response.raise_for_status()
-        status_data = response.json()
+        # Served from the tracker; concurrent pollers share one upstream call per interval
+        status = await video_tracker.get(video_id)
 
         logger.info(f"Video status fetched successfully: {video_id}")
         return {
             "success": True,
-            "status": status_data.get("data", {}).get("status"),
-            "download_url": status_data.get("data", {}).get("video_url")
+            "status": status["status"],
+            "download_url": status["video_url"]
         }
     except Exception as e:
         logger.error(f"Failed to fetch video status: {str(e)}")
@@ -153,3 +186,51 @@ async def get_video_status(video_id: str):
             "success": False,
             "error": str(e)
         }
+
+async def stream_video_status(video_id: str, stream_format: str):
+    try:
+        async for status in video_tracker.subscribe(video_id, heartbeat=settings.VIDEO_STATUS_HEARTBEAT):
+            if status is None:
+                yield encode_event("ping", {"video_id": video_id}, stream_format)
+            else:
+                yield encode_event("status", status, stream_format)
+    except Exception as e:
+        logger.error(f"Video status stream for {video_id} failed: {e}")
+        yield encode_event("error", {"video_id": video_id, "error": str(e)}, stream_format)
+
+@router.get("/api/video-status/{video_id}/events")
+async def video_status_events(video_id: str, stream_format: str = "sse"):
+    if stream_format not in ("sse", "ndjson"):
+        raise HTTPException(status_code=400, detail="stream_format must be 'sse' or 'ndjson'.")
+    return stream_events(stream_video_status(video_id, stream_format), stream_format)
+
+def apply_webhook(event: Dict[str, Any]):
+    status = video_tracker.handle_webhook(event)
+    if status is None:
+        logger.info(f"Ignored HeyGen webhook event: {event.get('event_type')}")
+        return {"success": True, "handled": False}
+    logger.info(f"HeyGen webhook: video {status['video_id']} is {status['status']}")
+    return {"success": True, "handled": True}
+
+@router.post("/api/heygen/webhook")
+async def heygen_webhook(request: Request):
+    # Unsigned callbacks are refused; without HEYGEN_WEBHOOK_SECRET the status poller is the only source
+    if not settings.HEYGEN_WEBHOOK_SECRET:
+        logger.warning("Rejected HeyGen webhook: HEYGEN_WEBHOOK_SECRET is not set")
+        raise HTTPException(status_code=401, detail="Webhooks are disabled: HEYGEN_WEBHOOK_SECRET is not set.")
+    body = await request.body()
+    if not verify_webhook(body, request.headers.get("signature")):
+        logger.warning("Rejected HeyGen webhook with an invalid signature")
+        raise HTTPException(status_code=401, detail="Invalid webhook signature.")
+    try:
+        event = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Webhook body is not valid JSON.")
+    return apply_webhook(event)
+
+@router.post("/api/heygen/webhook/stand-in")
+async def heygen_webhook_stand_in(request: WebhookStandInRequest):
+    # Local replacement for HeyGen's callback so tests and dev setups need no public URL
+    if not settings.HEYGEN_WEBHOOK_STAND_IN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return apply_webhook(webhook_event(request.video_id, request.status, request.video_url, request.error))
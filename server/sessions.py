@@ -0,0 +1,55 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from config import settings
+from models import ExtractionResponse
+
+
+class ExtractionSessions:
+    """Recent extraction results by file_id, so later stages can refer to a deck by id alone.
+
+    Holds the parsed ExtractionResponse, so a hit costs neither a JSON upload
+    from the client nor a pydantic re-validation. Bounded LRU per process;
+    a miss (another worker or node, or an evicted entry) falls back to the
+    deck's ref in the artifact store.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, ExtractionResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, file_id: str) -> Optional[ExtractionResponse]:
+        with self._lock:
+            response = self._entries.get(file_id)
+            if response is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(file_id)
+            self.hits += 1
+            return response
+
+    def set(self, response: ExtractionResponse):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[response.file_id] = response
+            self._entries.move_to_end(response.file_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+extraction_sessions = ExtractionSessions(settings.EXTRACTION_SESSION_MAX_ENTRIES)
@@ -0,0 +1,32 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+# main.py imports this module first, so this is when the app's own imports began
+_started = time.perf_counter()
+milestones: Dict[str, float] = {}
+durations: Dict[str, float] = {}
+
+
+def mark(name: str):
+    """Record the seconds from the start of main.py's imports until now."""
+    milestones[name] = round(time.perf_counter() - _started, 4)
+
+
+def record(name: str, seconds: float):
+    durations[name] = round(seconds, 4)
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def stats() -> Dict[str, Any]:
+    """Cold-start report for this worker process: app imports, lifespan startup and lazily loaded SDKs."""
+    return {"pid": os.getpid(), "milestones": dict(milestones), "durations": dict(durations)}
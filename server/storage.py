@@ -0,0 +1,144 @@
+import mimetypes
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+import aiohttp
+from config import settings
+from executor import run_io
+from http_client import get_session
+from metrics import track_upstream, count_bytes
+
+
+class StorageError(Exception):
+    pass
+
+
+class StorageBackend(ABC):
+    """Where generated images and logos live; `save` returns the public URL HeyGen and the UI fetch."""
+
+    name = "base"
+
+    @abstractmethod
+    async def save(self, data: bytes, key: str, content_type: str) -> str:
+        ...
+
+    async def read(self, url: str) -> Optional[bytes]:
+        """Bytes behind one of this backend's own URLs, or None if it has to be fetched over HTTP."""
+        return None
+
+    async def exists(self, url: str) -> bool:
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+class CloudinaryStorage(StorageBackend):
+    """Signed uploads to the Cloudinary REST API over the shared keep-alive session."""
+
+    name = "cloudinary"
+
+    def __init__(self):
+        self.uploads = 0
+        self.bytes_uploaded = 0
+
+    async def save(self, data: bytes, key: str, content_type: str) -> str:
+        # Only the SDK's config and request signing are used, so it is imported on the first upload.
+        # Its config also resolves CLOUDINARY_URL, as the previous uploader calls did
+        import cloudinary
+        import cloudinary.utils
+        config = cloudinary.config()
+        params = {"public_id": key, "timestamp": int(time.time())}
+        form = aiohttp.FormData()
+        for name, value in params.items():
+            form.add_field(name, str(value))
+        form.add_field("api_key", config.api_key or "")
+        form.add_field("signature", cloudinary.utils.api_sign_request(params, config.api_secret or ""))
+        form.add_field("file", data, filename=os.path.basename(key), content_type=content_type)
+        count_bytes("cloudinary", sent=len(data))
+        async with track_upstream("cloudinary", "upload"), get_session().post(
+            f"{settings.CLOUDINARY_API_BASE}/v1_1/{config.cloud_name}/image/upload",
+            data=form,
+            timeout=aiohttp.ClientTimeout(total=settings.STORAGE_UPLOAD_TIMEOUT)
+        ) as response:
+            if response.status >= 400:
+                raise StorageError(f"Cloudinary upload returned {response.status}: {await response.text()}")
+            result = await response.json(content_type=None)
+        self.uploads += 1
+        self.bytes_uploaded += len(data)
+        return result["secure_url"]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "uploads": self.uploads, "bytes_uploaded": self.bytes_uploaded}
+
+
+class LocalStorage(StorageBackend):
+    """Files under GENERATED_IMAGES_DIR, served by routes/files.py at GENERATED_IMAGE_BASE_URL."""
+
+    name = "local"
+
+    def __init__(self, root: str):
+        self.root = root
+        self.writes = 0
+        self.bytes_written = 0
+
+    def url_prefix(self) -> str:
+        return f"{settings.PUBLIC_BASE_URL}{settings.GENERATED_IMAGE_BASE_URL}/"
+
+    def path_for(self, relative_path: str) -> Optional[str]:
+        # Never resolve outside the storage root
+        root = os.path.realpath(self.root)
+        path = os.path.realpath(os.path.join(root, relative_path))
+        return path if path.startswith(root + os.sep) else None
+
+    def write(self, path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    async def save(self, data: bytes, key: str, content_type: str) -> str:
+        relative_path = f"{key}{mimetypes.guess_extension(content_type) or ''}"
+        path = self.path_for(relative_path)
+        if path is None:
+            raise StorageError(f"Invalid storage key: {key}")
+        await run_io(self.write, path, data)
+        self.writes += 1
+        self.bytes_written += len(data)
+        return f"{self.url_prefix()}{relative_path}"
+
+    def read_file(self, path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    async def read(self, url: str) -> Optional[bytes]:
+        if not url.startswith(self.url_prefix()):
+            return None
+        path = self.path_for(url[len(self.url_prefix()):])
+        if path is None or not os.path.exists(path):
+            return None
+        return await run_io(self.read_file, path)
+
+    async def exists(self, url: str) -> bool:
+        # Local files can be removed by the janitor after their URL was cached
+        if not url.startswith(self.url_prefix()):
+            return True
+        path = self.path_for(url[len(self.url_prefix()):])
+        return path is not None and os.path.exists(path)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "writes": self.writes, "bytes_written": self.bytes_written}
+
+
+def create_storage() -> StorageBackend:
+    if settings.STORAGE_BACKEND == "local":
+        return LocalStorage(settings.GENERATED_IMAGES_DIR)
+    if settings.STORAGE_BACKEND == "cloudinary":
+        return CloudinaryStorage()
+    raise ValueError(f"Unknown STORAGE_BACKEND: {settings.STORAGE_BACKEND}")
+
+
+storage = create_storage()
@@ -0,0 +1,23 @@
+import json
+from typing import Any, AsyncIterator, Dict
+from fastapi.responses import StreamingResponse
+
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+
+def encode_event(event: str, data: Dict[str, Any], stream_format: str) -> str:
+    if stream_format == "sse":
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps({"event": event, "data": data}) + "\n"
+
+
+def stream_events(events: AsyncIterator[str], stream_format: str) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type=STREAM_MEDIA_TYPES[stream_format],
+        # Keep proxies from buffering the stream until it completes
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
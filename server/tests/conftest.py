@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+# config and the module singletons write logs/ and temp_uploads/ relative to the
+# working directory, so the tests run from a scratch directory, set before any import
+os.chdir(tempfile.mkdtemp(prefix="video-generator-tests-"))
@@ -0,0 +1,65 @@
+import hashlib
+import os
+import pytest
+from artifacts import ArtifactStore, LocalArtifactStore, SharedVolumeArtifactStore
+
+
+def test_store_without_get_cannot_be_created():
+    class Incomplete(ArtifactStore):
+        def put(self, data: bytes) -> str:
+            return ""
+
+        def exists(self, artifact_id: str) -> bool:
+            return False
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+@pytest.mark.parametrize("store_class", [LocalArtifactStore, SharedVolumeArtifactStore])
+def test_put_is_content_addressed(tmp_path, store_class):
+    store = store_class(str(tmp_path))
+    artifact_id = store.put(b"slide")
+    assert artifact_id == hashlib.sha256(b"slide").hexdigest()
+    assert store.put(b"slide") == artifact_id
+    assert store.get(artifact_id) == b"slide"
+    assert store.get_json(store.put_json({"a": 1})) == {"a": 1}
+
+
+def test_ids_that_are_not_hashes_never_reach_a_path(tmp_path):
+    store = LocalArtifactStore(str(tmp_path))
+    assert store.path_for("../../etc/passwd") is None
+    assert store.get("../../etc/passwd") is None
+
+
+def test_shared_store_treats_a_corrupt_copy_as_missing(tmp_path):
+    store = SharedVolumeArtifactStore(str(tmp_path))
+    artifact_id = store.put(b"slide")
+    with open(store.path_for(artifact_id), "wb") as f:
+        f.write(b"torn")
+    assert store.get(artifact_id) is None
+    assert store.stats()["corrupt"] == 1
+    assert os.path.exists(store.path_for(artifact_id))
+
+
+@pytest.mark.parametrize("store_class", [LocalArtifactStore, SharedVolumeArtifactStore])
+def test_refs_are_visible_to_every_store_on_the_same_root(tmp_path, store_class):
+    writer, reader = store_class(str(tmp_path)), store_class(str(tmp_path))
+    name = hashlib.sha256(b"deck").hexdigest()
+    first, second = writer.put(b"first"), writer.put(b"second")
+    assert reader.get_ref(name) is None
+    writer.set_ref(name, first)
+    assert reader.get_ref(name) == first
+    writer.set_ref(name, second)
+    reader.delete_ref(name, first)
+    assert reader.get_ref(name) == second
+    reader.delete_ref(name, second)
+    assert writer.get_ref(name) is None
+
+
+def test_ref_names_that_are_not_hashes_are_rejected(tmp_path):
+    store = LocalArtifactStore(str(tmp_path))
+    artifact_id = store.put(b"slide")
+    with pytest.raises(ValueError):
+        store.set_ref("../escape", artifact_id)
+    assert store.get_ref("../escape") is None
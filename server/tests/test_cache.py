@@ -0,0 +1,88 @@
+import os
+from cache import PersistentCache
+
+
+def index(tmp_path) -> str:
+    return os.path.join(tmp_path, "index.json")
+
+
+def cache(tmp_path, name: str, **kwargs) -> PersistentCache:
+    # Writes every change straight away, so these tests see each worker's sets at once
+    return PersistentCache(name, index(tmp_path), flush_seconds=0, **kwargs)
+
+
+def test_workers_keep_each_others_entries(tmp_path):
+    first = cache(tmp_path, "first")
+    second = cache(tmp_path, "second")
+    first.set("a", 1)
+    second.set("b", 2)
+    first.set("c", 3)
+
+    reloaded = cache(tmp_path, "reloaded")
+    assert {key: reloaded.get(key) for key in "abc"} == {"a": 1, "b": 2, "c": 3}
+
+
+def test_miss_reads_entries_written_by_another_worker(tmp_path):
+    first = cache(tmp_path, "first")
+    second = cache(tmp_path, "second")
+    assert second.get("a") is None
+    first.set("a", 1)
+    assert second.get("a") == 1
+
+
+def test_delete_is_not_undone_by_another_worker(tmp_path):
+    first = cache(tmp_path, "first")
+    first.set("a", 1)
+    second = cache(tmp_path, "second")
+    assert second.get("a") == 1
+    first.delete("a")
+    second.set("b", 2)
+
+    reloaded = cache(tmp_path, "reloaded")
+    assert reloaded.get("a") is None
+    assert reloaded.get("b") == 2
+
+
+def test_newer_set_wins(tmp_path):
+    first = cache(tmp_path, "first")
+    second = cache(tmp_path, "second")
+    first.set("a", 1)
+    second.set("a", 2)
+    first.set("b", 3)
+    assert cache(tmp_path, "reloaded").get("a") == 2
+
+
+def test_eviction_applies_to_the_merged_index(tmp_path):
+    evicted = []
+    first = cache(tmp_path, "first", max_entries=2, on_evict=lambda key, value: evicted.append(key))
+    second = cache(tmp_path, "second", max_entries=2)
+    first.set("a", 1)
+    second.set("b", 2)
+    first.set("c", 3)
+    assert evicted == ["a"]
+    assert cache(tmp_path, "reloaded", max_entries=2).stats()["entries"] == 2
+
+
+def test_sets_are_written_in_batches(tmp_path):
+    writer = PersistentCache("writer", index(tmp_path), flush_seconds=60)
+    writer.set("a", 1)
+    writer.set("b", 2)
+    writer.delete("a")
+    assert PersistentCache("reader", index(tmp_path)).stats()["entries"] == 1
+    writer.flush()
+    reloaded = PersistentCache("reloaded", index(tmp_path))
+    assert reloaded.get("a") is None
+    assert reloaded.get("b") == 2
+
+
+def test_misses_reread_the_index_at_most_once_per_flush_interval(tmp_path, monkeypatch):
+    writer = cache(tmp_path, "writer")
+    reader = PersistentCache("reader", index(tmp_path), flush_seconds=60)
+    reads = []
+    read_index = reader._read_index
+    monkeypatch.setattr(reader, "_read_index", lambda: reads.append(1) or read_index())
+    writer.set("a", 1)
+    assert reader.get("a") == 1
+    writer.set("b", 2)
+    assert reader.get("b") is None
+    assert reads == [1]
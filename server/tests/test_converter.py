@@ -0,0 +1,91 @@
+import asyncio
+import os
+import time
+import pytest
+import converter
+from cache import PersistentCache
+from config import settings
+from converter import ConversionError, ConversionService, ConversionWorker
+
+
+def stub_worker_main(conn):
+    """Stands in for Spire: copies the source, crashes on "crash" decks and hangs on "hang" decks."""
+    conn.send(("ready", os.getpid()))
+    while True:
+        job = conn.recv()
+        if job is None:
+            return
+        source_path, target_path = job
+        with open(source_path, "rb") as f:
+            data = f.read()
+        if data == b"crash":
+            os._exit(3)
+        if data == b"hang":
+            time.sleep(60)
+        with open(f"{source_path}.conversions", "a") as f:
+            f.write(f"{os.getpid()}\n")
+        with open(target_path, "wb") as f:
+            f.write(b"pptx:" + data)
+        conn.send(("ok", target_path))
+
+
+def deck(tmp_path, data: bytes) -> str:
+    path = str(tmp_path / f"{data.decode()}.ppt")
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+@pytest.fixture
+def worker():
+    worker = ConversionWorker(0, stub_worker_main)
+    yield worker
+    worker.stop()
+
+
+@pytest.fixture
+def service(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "CONVERTED_DIR", str(tmp_path / "converted"))
+    service = ConversionService(1, stub_worker_main)
+    service.results = PersistentCache("conversions", str(tmp_path / "conversions.json"), on_evict=converter.remove_converted_file)
+    yield service
+    service.shutdown()
+
+
+def test_a_crashed_worker_fails_its_job_and_restarts_on_next_use(worker, tmp_path):
+    with pytest.raises(ConversionError, match="crashed"):
+        worker.convert(deck(tmp_path, b"crash"), str(tmp_path / "crash.pptx"), timeout=30)
+    assert not worker.is_alive()
+    target_path = worker.convert(deck(tmp_path, b"slides"), str(tmp_path / "slides.pptx"), timeout=30)
+    assert worker.is_alive()
+    with open(target_path, "rb") as f:
+        assert f.read() == b"pptx:slides"
+
+
+def test_a_hung_job_times_out_and_leaves_no_partial_file(monkeypatch, service, tmp_path):
+    monkeypatch.setattr(settings, "CONVERTER_JOB_TIMEOUT", 1)
+
+    async def run():
+        with pytest.raises(ConversionError, match="timed out"):
+            await service.convert(deck(tmp_path, b"hang"), "hang")
+        # The killed worker is replaced for the next job
+        return await service.convert(deck(tmp_path, b"slides"), "slides")
+
+    assert os.path.basename(asyncio.run(run())) == "slides.pptx"
+    assert sorted(os.listdir(settings.CONVERTED_DIR)) == ["slides.pptx"]
+    assert service.failed == 1
+
+
+def test_the_same_digest_is_converted_once(service, tmp_path):
+    source_path = deck(tmp_path, b"slides")
+
+    async def run():
+        concurrent = await asyncio.gather(*[service.convert(source_path, "digest") for _ in range(3)])
+        return concurrent + [await service.convert(source_path, "digest")]
+
+    assert len(set(asyncio.run(run()))) == 1
+    with open(f"{source_path}.conversions") as f:
+        assert len(f.readlines()) == 1
+    assert service.completed == 1
+    assert service.flights.coalesced == 2
+    assert service.results.hits == 1
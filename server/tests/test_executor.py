@@ -0,0 +1,33 @@
+import asyncio
+from typing import List
+import pytest
+import executor
+
+
+def put_then_fail(queue, count: int, fail: bool) -> int:
+    for number in range(count):
+        queue.put(number)
+    if fail:
+        raise ValueError("parse failed")
+    return count
+
+
+async def collect(items: List[int], count: int, fail: bool):
+    try:
+        async for item in executor.stream_cpu(put_then_fail, count, fail):
+            items.append(item)
+    finally:
+        executor.shutdown()
+
+
+def test_stream_cpu_yields_everything_put():
+    items = []
+    asyncio.run(collect(items, 5, False))
+    assert items == [0, 1, 2, 3, 4]
+
+
+def test_stream_cpu_raises_after_yielding_what_was_put():
+    items = []
+    with pytest.raises(ValueError):
+        asyncio.run(collect(items, 3, True))
+    assert items == [0, 1, 2]
@@ -0,0 +1,62 @@
+import asyncio
+import hashlib
+import os
+import threading
+import pytest
+from artifacts import LocalArtifactStore
+from cache import PersistentCache
+from models import ExtractRequest, SlideData
+from sessions import ExtractionSessions
+import routes.extract as extract
+
+FILE_ID = hashlib.sha256(b"deck").hexdigest() + ".pptx"
+
+
+def worker(monkeypatch, tmp_path, name: str):
+    """Point routes.extract at one worker's private caches over the shared artifact store."""
+    monkeypatch.setattr(extract, "artifact_store", LocalArtifactStore(str(tmp_path / "artifacts")))
+    monkeypatch.setattr(extract, "extraction_cache", PersistentCache("extraction", str(tmp_path / name / "extractions.json")))
+    monkeypatch.setattr(extract, "extraction_sessions", ExtractionSessions(8))
+
+
+@pytest.fixture
+def saved(monkeypatch, tmp_path):
+    worker(monkeypatch, tmp_path, "first")
+    return extract.save_extraction(FILE_ID, [SlideData(slide_number=1, title="Intro")])
+
+
+def test_another_worker_resolves_the_deck_through_the_store_ref(monkeypatch, tmp_path, saved):
+    worker(monkeypatch, tmp_path, "second")
+    response = extract.get_cached_extraction(FILE_ID)
+    assert response.extraction_id == saved.extraction_id
+    assert extract.extraction_cache.get(FILE_ID.split(".")[0]) == {"extraction_id": saved.extraction_id}
+
+
+def test_a_ref_to_a_missing_record_is_dropped(monkeypatch, tmp_path, saved):
+    worker(monkeypatch, tmp_path, "second")
+    os.remove(extract.artifact_store.path_for(saved.extraction_id))
+    assert extract.get_cached_extraction(FILE_ID) is None
+    assert extract.artifact_store.get_ref(FILE_ID.split(".")[0]) is None
+
+
+def test_a_session_miss_resolves_a_deck_extracted_by_another_worker(monkeypatch, tmp_path, saved):
+    worker(monkeypatch, tmp_path, "second")
+    response = asyncio.run(extract.get_session_extraction(FILE_ID))
+    assert response.extraction_id == saved.extraction_id
+    assert extract.extraction_sessions.get(FILE_ID) is response
+
+
+def test_extract_reads_a_prepared_extraction_off_the_event_loop(monkeypatch, tmp_path, saved):
+    threads = []
+
+    def on_thread(result):
+        def call(*args):
+            threads.append(threading.current_thread())
+            return result
+        return call
+
+    monkeypatch.setattr(extract, "get_prepared_extraction", on_thread(saved))
+    monkeypatch.setattr(extract, "release_upload", on_thread(None))
+    assert asyncio.run(extract.extract_content(ExtractRequest(file_id=FILE_ID))) is saved
+    assert len(threads) == 2
+    assert threading.main_thread() not in threads
@@ -0,0 +1,73 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from google.genai import errors, types
+import gemini
+import upstream
+from config import settings
+from models import SlideData
+from routes import generate
+
+
+class FakeModels:
+    def __init__(self, response: dict):
+        self.response = response
+        self.requests = []
+
+    async def generate_content(self, **kwargs):
+        self.requests.append(kwargs)
+        return types.GenerateContentResponse.model_validate(self.response)
+
+
+def fake_client(response: dict):
+    return SimpleNamespace(aio=SimpleNamespace(models=FakeModels(response)))
+
+
+def answer(text: str) -> dict:
+    return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+
+
+def test_request_maps_prompt_parts_and_config():
+    client = fake_client(answer("{}"))
+    image = {"data": b"\x89PNG", "mime_type": "image/png"}
+    asyncio.run(gemini.SceneModel(client).generate(["prompt", image]))
+
+    request = client.aio.models.requests[0]
+    assert request["model"] == settings.GEMINI_TEXT_MODEL
+    text, part = request["contents"]
+    assert text == "prompt"
+    assert part.inline_data.data == b"\x89PNG"
+    assert part.inline_data.mime_type == "image/png"
+    assert request["config"].response_mime_type == "application/json"
+    assert len(request["config"].safety_settings) == 4
+
+
+def request_scenes(client) -> list:
+    slide = SlideData(slide_number=4)
+    return asyncio.run(generate.request_slide_scenes(
+        gemini.SceneModel(client), slide, ["prompt"], "test-gemini-mapping", asyncio.Semaphore(1)
+    ))
+
+
+def test_response_maps_to_scenes():
+    scenes = [{"speech_script": "First", "image_prompt": "a"}, {"speech_script": "Second", "image_prompt": "b"}]
+    result = request_scenes(fake_client(answer(json.dumps({"scenes": scenes}))))
+    assert [scene.speech_script for scene in result] == ["First", "Second"]
+    assert [scene.scene_id for scene in result] == ["slide_4_scene_1", "slide_4_scene_2"]
+    assert all(scene.original_slide_number == 4 for scene in result)
+
+
+def test_blocked_response_maps_to_a_placeholder():
+    result = request_scenes(fake_client({"candidates": [], "prompt_feedback": {"block_reason": "SAFETY"}}))
+    assert len(result) == 1 and generate.is_placeholder(result[0])
+
+
+def test_api_error_carries_status_and_retry_delay():
+    error = errors.APIError(429, {"error": {
+        "code": 429,
+        "status": "RESOURCE_EXHAUSTED",
+        "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "7s"}],
+    }})
+    assert upstream.status_code(error) == 429
+    assert upstream.retry_after(error) == 7.0
+    assert upstream.is_retryable(error, upstream.RETRY_STATUSES)
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import uuid
+from types import SimpleNamespace
+from config import settings
+from models import SlideData
+from routes import generate
+from conftest import SERVER_DIR
+
+
+def test_packed_prompt_asks_only_for_slides():
+    assert 'single key "slides"' in generate.PACKED_SYSTEM_PROMPT
+    assert 'single key "scenes"' not in generate.PACKED_SYSTEM_PROMPT
+    assert 'single key "scenes"' in generate.SYSTEM_PROMPT
+
+
+class Response:
+    def __init__(self, text):
+        self.text = text
+        self.candidates = [SimpleNamespace(content=SimpleNamespace(parts=[text]))]
+
+
+class RateLimited(Exception):
+    code = 429
+
+
+class FakeModel:
+    """Answers packed prompts with `packed` (text or an exception) and single-slide prompts with one scene."""
+
+    def __init__(self, packed):
+        self.packed = packed
+        self.calls = 0
+
+    async def generate(self, prompt_parts):
+        self.calls += 1
+        if prompt_parts[0] == generate.PACKED_SYSTEM_PROMPT:
+            if isinstance(self.packed, Exception):
+                raise self.packed
+            return Response(self.packed)
+        return Response(json.dumps({"scenes": [{"speech_script": "single", "image_prompt": "single"}]}))
+
+
+def pack(count: int):
+    return [
+        {
+            "slide_data": SlideData(slide_number=number),
+            "content_parts": [f"slide {number}"],
+            "prompt_parts": [generate.SYSTEM_PROMPT, f"slide {number}"],
+            "cache_key": f"test-{number}-{uuid.uuid4()}",
+        }
+        for number in range(1, count + 1)
+    ]
+
+
+def run_pack(model, count: int):
+    return asyncio.run(generate.generate_pack_scenes(model, pack(count), asyncio.Semaphore(4)))
+
+
+def test_malformed_packed_answer_falls_back_per_slide():
+    model = FakeModel("not json")
+    results = run_pack(model, 3)
+    assert model.calls == 4
+    assert [scenes[0].speech_script for scenes in results.values()] == ["single"] * 3
+
+
+def test_upstream_error_is_not_retried_per_slide(monkeypatch):
+    monkeypatch.setattr(settings, "UPSTREAM_RETRIES", 0)
+    model = FakeModel(RateLimited("quota"))
+    results = run_pack(model, 3)
+    assert model.calls == 1
+    assert set(results) == {1, 2, 3}
+    assert all(isinstance(result, RateLimited) for result in results.values())
+
+
+def test_packed_answer_is_split_by_slide():
+    answer = {"slides": [
+        {"slide_number": number, "scenes": [{"speech_script": f"slide {number}", "image_prompt": "p"}]}
+        for number in (1, 2)
+    ]}
+    model = FakeModel(json.dumps(answer))
+    results = run_pack(model, 2)
+    assert model.calls == 1
+    assert results[2][0].speech_script == "slide 2"
+    assert results[2][0].scene_id == "slide_2_scene_1"
+
+
+def test_image_content_type_does_not_depend_on_pil_having_loaded_plugins():
+    # A fresh interpreter, like a worker that has not decoded or saved an image yet
+    script = "from routes.generate import image_content_type; print(image_content_type('JPEG'), image_content_type('WEBP'))"
+    result = subprocess.run([sys.executable, "-c", script], cwd=os.getcwd(), capture_output=True, text=True,
+                            env={**os.environ, "PYTHONPATH": SERVER_DIR})
+    assert result.stdout.split() == ["image/jpeg", "image/webp"], result.stderr
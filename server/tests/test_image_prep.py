@@ -0,0 +1,25 @@
+from io import BytesIO
+from PIL import Image
+import image_prep
+from config import settings
+
+
+def jpeg(size) -> bytes:
+    buffer = BytesIO()
+    Image.effect_noise(size, 64).convert("RGB").save(buffer, format="JPEG", quality=95)
+    return buffer.getvalue()
+
+
+def test_changing_the_jpeg_quality_prepares_the_image_again(monkeypatch):
+    data = jpeg((2048, 1536))
+    monkeypatch.setattr(settings, "LLM_IMAGE_JPEG_QUALITY", 90)
+    high = image_prep.prepare_image(data, "slide.jpg")
+    monkeypatch.setattr(settings, "LLM_IMAGE_JPEG_QUALITY", 30)
+    low = image_prep.prepare_image(data, "slide.jpg")
+    assert high["mime_type"] == low["mime_type"] == "image/jpeg"
+    assert len(low["data"]) < len(high["data"])
+
+
+def test_small_supported_images_keep_their_bytes():
+    data = jpeg((320, 240))
+    assert image_prep.prepare_image(data, "small.jpg")["data"] == data
@@ -0,0 +1,19 @@
+import janitor
+from artifacts import LocalArtifactStore, SharedVolumeArtifactStore
+from config import settings
+
+
+def area_names(monkeypatch, store, sweep_shared: bool):
+    monkeypatch.setattr(janitor, "artifact_store", store)
+    monkeypatch.setattr(settings, "JANITOR_SWEEP_SHARED_ARTIFACTS", sweep_shared)
+    return [area.name for area in janitor.default_areas()]
+
+
+def test_local_artifacts_are_always_swept(monkeypatch, tmp_path):
+    assert "artifacts" in area_names(monkeypatch, LocalArtifactStore(str(tmp_path)), False)
+
+
+def test_shared_artifacts_are_only_swept_where_enabled(monkeypatch, tmp_path):
+    store = SharedVolumeArtifactStore(str(tmp_path))
+    assert "artifacts" not in area_names(monkeypatch, store, False)
+    assert "artifacts" in area_names(monkeypatch, store, True)
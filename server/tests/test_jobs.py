@@ -0,0 +1,148 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+import pytest
+from fastapi import HTTPException
+from config import settings
+from jobs import JobManager, STAGES
+from models import JobCreateRequest, JobState, Scene, StageProgress, VideoSegment
+from routes.generate import error_scene
+
+
+def new_job(manager: JobManager) -> JobState:
+    job = JobState(
+        job_id="job",
+        created_at=time.time(),
+        updated_at=time.time(),
+        request=JobCreateRequest(file_id="deck.pptx", logo_id="logo", logo_url="logo", avatar_id="avatar", voice_id="voice"),
+        stages={stage: StageProgress() for stage in STAGES}
+    )
+    manager.jobs[job.job_id] = job
+    manager.locks[job.job_id] = asyncio.Lock()
+    return job
+
+
+def record(manager: JobManager, job: JobState, slide_number: int, scenes):
+    async def run():
+        image_tasks = []
+        await manager.record_scenes(job, slide_number, scenes, asyncio.Semaphore(1), image_tasks)
+        return image_tasks
+    return asyncio.run(run())
+
+
+def test_placeholder_scenes_are_not_checkpointed():
+    manager = JobManager()
+    job = new_job(manager)
+    image_tasks = record(manager, job, 3, [error_scene(3)])
+    assert job.slide_scenes == {}
+    assert 3 in job.scene_errors
+    assert image_tasks == []
+    assert job.stages["scenes"].completed == 0
+
+
+def test_generated_scenes_are_checkpointed(monkeypatch):
+    manager = JobManager()
+    job = new_job(manager)
+    monkeypatch.setattr(manager, "schedule_images", lambda *args: None)
+    scene = Scene(speech_script="Hello", image_prompt="hills", original_slide_number=2, scene_id="slide_2_scene_1")
+    record(manager, job, 2, [scene])
+    assert job.slide_scenes == {2: [scene]}
+    assert job.scene_errors == {}
+
+
+def test_video_timeout_names_the_pending_segments(monkeypatch):
+    manager = JobManager()
+    job = new_job(manager)
+    job.video_segments = [
+        VideoSegment(scene_ids=["a"], video_id="done", status="completed"),
+        VideoSegment(scene_ids=["b"], video_id="slow", status="processing"),
+    ]
+
+    async def follow_video(job, segment):
+        if segment.status != "completed":
+            await asyncio.sleep(10)
+
+    monkeypatch.setattr(settings, "JOB_VIDEO_TIMEOUT", 0.05)
+    monkeypatch.setattr(manager, "follow_video", follow_video)
+    with pytest.raises(Exception, match=r"slow \(part 2/2\)") as error:
+        asyncio.run(manager.produce_video(job))
+    assert "done" not in str(error.value)
+
+
+def test_another_worker_serves_the_status_from_the_checkpoint(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "JOBS_DIR", str(tmp_path))
+    runner, other = JobManager(), JobManager()
+    job = new_job(runner)
+    job.job_id = str(uuid.uuid4())
+    runner.locks[job.job_id] = asyncio.Lock()
+    job.status = "running"
+    asyncio.run(runner.checkpoint(job))
+    assert asyncio.run(other.find(job.job_id)).status == "running"
+    assert job.job_id not in other.jobs
+    for missing in (str(uuid.uuid4()), "..", "job"):
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(other.find(missing))
+        assert error.value.status_code == 404
+
+
+def running_checkpoint(monkeypatch, tmp_path) -> JobState:
+    monkeypatch.setattr(settings, "JOBS_DIR", str(tmp_path))
+    writer = JobManager()
+    job = new_job(writer)
+    job.job_id = str(uuid.uuid4())
+    job.status = "running"
+    writer.write_checkpoint(job.job_id, job.model_dump_json())
+    return job
+
+
+def test_only_one_worker_takes_over_an_interrupted_job(monkeypatch, tmp_path):
+    job = running_checkpoint(monkeypatch, tmp_path)
+    first, second = JobManager(), JobManager()
+    assert [interrupted.job_id for interrupted in first.load_checkpoints()] == [job.job_id]
+    assert second.load_checkpoints() == []
+    assert job.job_id not in second.jobs
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(second.resume(job.job_id))
+    assert error.value.status_code == 409
+    # A worker that dies drops its claim, and a respawned one takes the job over
+    first.release(job.job_id)
+    assert [interrupted.job_id for interrupted in JobManager().load_checkpoints()] == [job.job_id]
+
+
+def test_a_job_finished_before_the_claim_is_not_resumed(monkeypatch, tmp_path):
+    job = running_checkpoint(monkeypatch, tmp_path)
+    manager = JobManager()
+    read_checkpoint = manager.read_checkpoint
+
+    def finished_meanwhile(job_id):
+        finished = read_checkpoint(job_id)
+        finished.status = "completed"
+        return finished
+
+    monkeypatch.setattr(manager, "read_checkpoint", finished_meanwhile)
+    assert manager.load_checkpoints() == []
+    assert manager.jobs[job.job_id].status == "completed"
+    assert manager.claims == {}
+
+
+def test_concurrent_checkpoints_of_one_job_do_not_share_a_temp_file(monkeypatch, tmp_path):
+    job = running_checkpoint(monkeypatch, tmp_path)
+    errors = []
+
+    def write(manager):
+        try:
+            for _ in range(50):
+                manager.write_checkpoint(job.job_id, job.model_dump_json())
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(JobManager(),)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert JobManager().read_checkpoint(job.job_id).status == "running"
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
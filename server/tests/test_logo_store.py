@@ -0,0 +1,62 @@
+import asyncio
+import os
+import uuid
+from io import BytesIO
+import pytest
+from PIL import Image
+import logo_store
+from config import settings
+
+
+def png(color) -> bytes:
+    buffer = BytesIO()
+    Image.new("RGBA", (8, 8), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class FakeStorage:
+    def __init__(self, files):
+        self.files = files
+        self.reads = []
+
+    async def read(self, url):
+        self.reads.append(url)
+        return self.files.get(url)
+
+
+@pytest.fixture
+def logos(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "LOGO_DIR", str(tmp_path / "logos"))
+    monkeypatch.setattr(logo_store, "_memory", type(logo_store._memory)())
+    storage = FakeStorage({"https://a/logo.png": png("red"), "https://b/logo.png": png("blue")})
+    monkeypatch.setattr(logo_store, "storage", storage)
+    return storage
+
+
+def get_logo(logo_url, logo_id=None):
+    return asyncio.run(logo_store.get_logo(logo_url, (4, 4), logo_id=logo_id))
+
+
+@pytest.mark.parametrize("logo_id", ["../../outside", "/tmp/escaped", "", None])
+def test_ids_that_are_not_uuids_are_keyed_by_url(logos, tmp_path, logo_id):
+    assert logo_store.logo_keys(logo_id, "https://a/logo.png") == [logo_store.url_digest("https://a/logo.png")]
+    get_logo("https://a/logo.png", logo_id)
+    assert os.listdir(tmp_path) == ["logos"]
+    assert os.listdir(settings.LOGO_DIR) == [logo_store.url_digest("https://a/logo.png")]
+
+
+def test_uploaded_logo_is_served_from_its_id(logos):
+    logo_id = str(uuid.uuid4())
+    logo_store.save_logo(logo_id, png("red"), "https://a/logo.png")
+    logo_store._memory.clear()
+    assert get_logo("https://a/logo.png", logo_id).getpixel((0, 0)) == (255, 0, 0, 255)
+    assert logos.reads == []
+
+
+def test_an_id_is_not_reused_for_another_url(logos):
+    logo_id = str(uuid.uuid4())
+    logo_store.save_logo(logo_id, png("red"), "https://a/logo.png")
+    assert get_logo("https://b/logo.png", logo_id).getpixel((0, 0)) == (0, 0, 255, 255)
+    assert logos.reads == ["https://b/logo.png"]
+    # The uploaded logo itself is left alone
+    assert get_logo("https://a/logo.png", logo_id).getpixel((0, 0)) == (255, 0, 0, 255)
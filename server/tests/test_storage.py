@@ -0,0 +1,14 @@
+import pytest
+from storage import StorageBackend, LocalStorage
+
+
+def test_backend_without_save_cannot_be_created():
+    class Incomplete(StorageBackend):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_local_storage_is_complete(tmp_path):
+    assert LocalStorage(str(tmp_path)).name == "local"
@@ -0,0 +1,177 @@
+import asyncio
+import email.utils
+import time
+from types import SimpleNamespace
+import pytest
+import upstream
+from config import settings
+from upstream import LocalBucket, UpstreamLimiter
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(upstream.time, "time", clock)
+    return clock
+
+
+class Failure(Exception):
+    def __init__(self, status: int, retry_after=None):
+        super().__init__(f"status {status}")
+        self.status_code = status
+        self.retry_after = retry_after
+
+
+# LocalBucket.reserve
+
+def test_burst_is_free_then_callers_are_spaced_at_the_rate(clock):
+    bucket = LocalBucket(rate=2, burst=3)
+    assert [bucket.reserve() for _ in range(3)] == [0, 0, 0]
+    assert [bucket.reserve() for _ in range(3)] == [0.5, 1.0, 1.5]
+
+
+def test_tokens_refill_over_time_up_to_the_burst(clock):
+    bucket = LocalBucket(rate=2, burst=2)
+    bucket.reserve(), bucket.reserve()
+    clock.now += 0.5
+    assert bucket.reserve() == 0
+    clock.now += 100
+    assert [bucket.reserve() for _ in range(3)] == [0, 0, 0.5]
+
+
+def test_pause_delays_every_reservation(clock):
+    bucket = LocalBucket(rate=10, burst=10)
+    bucket.pause(4)
+    assert bucket.reserve() == 4
+    clock.now += 3
+    assert bucket.reserve() == 1
+
+
+def test_zero_rate_only_applies_pauses(clock):
+    bucket = LocalBucket(rate=0, burst=0)
+    assert [bucket.reserve() for _ in range(100)] == [0] * 100
+    bucket.pause(2)
+    assert bucket.reserve() == 2
+
+
+# retry_after parsing
+
+@pytest.mark.parametrize("value, seconds", [("7", 7.0), ("1.5", 1.5), ("20s", 20.0), (" 3 ", 3.0), ("", None), (None, None), ("soon", None)])
+def test_parse_retry_after(value, seconds):
+    assert upstream.parse_retry_after(value) == seconds
+
+
+def test_parse_retry_after_http_date():
+    header = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert 28 <= upstream.parse_retry_after(header) <= 30
+    assert upstream.parse_retry_after(email.utils.formatdate(time.time() - 30, usegmt=True)) == 0
+
+
+def test_retry_after_sources():
+    assert upstream.retry_after(Failure(429, retry_after="5")) == 5
+    response = SimpleNamespace(headers={"Retry-After": "9"})
+    assert upstream.retry_after(SimpleNamespace(response=response)) == 9
+    details = {"error": {"details": [{"@type": "type.googleapis.com/google.rpc.Help"}, {"retryDelay": "12s"}]}}
+    assert upstream.retry_after(SimpleNamespace(details=details)) == 12
+    assert upstream.retry_after(Failure(429)) is None
+
+
+def test_is_retryable():
+    assert upstream.is_retryable(Failure(503), upstream.RETRY_STATUSES)
+    assert not upstream.is_retryable(Failure(500), upstream.REJECTED_STATUSES)
+    assert not upstream.is_retryable(Failure(400), upstream.RETRY_STATUSES)
+    assert upstream.is_retryable(ConnectionResetError(), upstream.REJECTED_STATUSES)
+
+
+# AIMD limit
+
+def limiter(max_concurrency: int = 8) -> UpstreamLimiter:
+    return UpstreamLimiter("test", "test", rate=0, burst=0, max_concurrency=max_concurrency)
+
+
+def test_limit_halves_on_429_once_per_burst(monkeypatch):
+    now = Clock()
+    monkeypatch.setattr(upstream.time, "monotonic", now)
+    test_limiter = limiter(8)
+    test_limiter._rate_limited()
+    test_limiter._rate_limited()
+    assert test_limiter.limit == 4
+    now.now += 2
+    test_limiter._rate_limited()
+    assert test_limiter.limit == 2
+    now.now += 2
+    test_limiter._rate_limited()
+    now.now += 2
+    test_limiter._rate_limited()
+    assert test_limiter.limit == test_limiter.min_concurrency == 1
+
+
+def test_limit_grows_by_about_one_per_round_of_successes():
+    test_limiter = limiter(8)
+    test_limiter.limit = 4.0
+    for _ in range(4):
+        test_limiter._succeeded()
+    assert 4.9 < test_limiter.limit < 5.0
+    for _ in range(100):
+        test_limiter._succeeded()
+    assert test_limiter.limit == 8
+
+
+def test_call_retries_and_shrinks_the_limit(monkeypatch):
+    monkeypatch.setattr(settings, "UPSTREAM_BACKOFF_BASE", 0)
+    test_limiter = limiter(8)
+    failures = [Failure(429), Failure(503)]
+
+    async def attempt():
+        if failures:
+            raise failures.pop(0)
+        return "ok"
+
+    assert asyncio.run(test_limiter.call("op", attempt)) == "ok"
+    assert test_limiter.retries == 2
+    assert test_limiter.throttled == 1
+    assert test_limiter.limit < 8
+
+
+def test_call_gives_up_on_non_retryable_status():
+    test_limiter = limiter()
+
+    async def attempt():
+        raise Failure(400)
+
+    with pytest.raises(Failure):
+        asyncio.run(test_limiter.call("op", attempt))
+    assert test_limiter.retries == 0 and test_limiter.failed == 1
+
+
+def test_gate_is_free_during_backoff(monkeypatch):
+    monkeypatch.setattr(settings, "UPSTREAM_BACKOFF_MAX", 60)
+    test_limiter = limiter()
+
+    async def run():
+        gate = asyncio.Semaphore(1)
+        failures = [Failure(429, retry_after="0.2")]
+
+        async def throttled():
+            if failures:
+                raise failures.pop(0)
+            return "slow"
+
+        async def quick():
+            return "quick"
+
+        slow_call = asyncio.create_task(test_limiter.call("op", throttled, gate=gate))
+        await asyncio.sleep(0.05)
+        # The throttled call is sleeping on its Retry-After; the gate must be free for others
+        other = await asyncio.wait_for(UpstreamLimiter("other", "test", 0, 0, 4).call("op", quick, gate=gate), 0.1)
+        return other, await slow_call
+
+    assert asyncio.run(run()) == ("quick", "slow")
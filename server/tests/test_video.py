@@ -0,0 +1,50 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from config import settings
+from routes import video
+import heygen
+
+app = FastAPI()
+app.include_router(video.router)
+client = TestClient(app)
+
+
+def request(slides: int) -> dict:
+    return {
+        "avatar_id": "avatar",
+        "voice_id": "voice",
+        "scenes": [
+            {"speech_script": "Narration", "image_prompt": "p", "original_slide_number": number,
+             "scene_id": f"slide_{number}_scene_1", "image_url": "https://image"}
+            for number in range(1, slides + 1)
+        ],
+    }
+
+
+def test_failed_segment_keeps_the_submitted_ones(monkeypatch):
+    monkeypatch.setattr(settings, "HEYGEN_SEGMENT_MAX_SCENES", 2)
+    calls = []
+
+    async def generate_video(payload):
+        calls.append(payload)
+        if len(calls) == 2:
+            raise heygen.HeyGenError(500, "boom")
+        return {"data": {"video_id": f"video-{len(calls)}"}}
+
+    monkeypatch.setattr(heygen, "generate_video", generate_video)
+    body = client.post("/api/generate-video", json=request(6)).json()
+    assert body["success"] is False
+    assert body["video_id"] == "video-1"
+    assert [segment["video_id"] for segment in body["segments"]] == ["video-1", None, "video-3"]
+    assert body["segments"][1]["scene_ids"] == ["slide_3_scene_1", "slide_4_scene_1"]
+    assert "2 of 3" in body["error"]
+
+
+def test_all_segments_submitted(monkeypatch):
+    async def generate_video(payload):
+        return {"data": {"video_id": "video"}}
+
+    monkeypatch.setattr(heygen, "generate_video", generate_video)
+    body = client.post("/api/generate-video", json=request(2)).json()
+    assert body["success"] is True
+    assert body["segments"][0]["status_url"].endswith("video_id=video")
@@ -0,0 +1,31 @@
+import json
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from config import settings
+from routes.video import router
+from video_status import sign_webhook, video_tracker, webhook_event
+
+app = FastAPI()
+app.include_router(router)
+client = TestClient(app)
+
+
+def post(body: bytes, signature=None):
+    headers = {"signature": signature} if signature else {}
+    return client.post("/api/heygen/webhook", content=body, headers=headers)
+
+
+def test_webhooks_are_refused_without_a_secret(monkeypatch):
+    monkeypatch.setattr(settings, "HEYGEN_WEBHOOK_SECRET", None)
+    body = json.dumps(webhook_event("unsigned", "completed", "http://evil")).encode()
+    assert post(body).status_code == 401
+    assert "unsigned" not in video_tracker.statuses
+
+
+def test_signed_webhook_updates_the_status(monkeypatch):
+    monkeypatch.setattr(settings, "HEYGEN_WEBHOOK_SECRET", "secret")
+    body = json.dumps(webhook_event("signed", "completed", "https://video")).encode()
+    assert post(body, "bad").status_code == 401
+    response = post(body, sign_webhook(body, "secret"))
+    assert response.json() == {"success": True, "handled": True}
+    assert video_tracker.statuses["signed"]["video_url"] == "https://video"
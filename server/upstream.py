@@ -0,0 +1,297 @@
+import asyncio
+import email.utils
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Awaitable, Callable, Collection, Dict, Optional, TypeVar
+import aiohttp
+from config import settings, logger
+from executor import run_io
+from metrics import track_upstream
+
+T = TypeVar("T")
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Only statuses where the upstream did not act on the request, for calls that must not run twice
+REJECTED_STATUSES = frozenset({429, 503})
+_limiters: Dict[str, "UpstreamLimiter"] = {}
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    # HeyGenError and aiohttp use status_code/status, google-genai's APIError uses code
+    for attribute in ("status_code", "status", "code"):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or HTTP date), or a "20s" style duration."""
+    if not value:
+        return None
+    value = value.strip()
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)s?", value)
+    if match:
+        return float(match.group(1))
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """How long the upstream asked us to wait, from the Retry-After header or Gemini's RetryInfo detail."""
+    seconds = parse_retry_after(getattr(error, "retry_after", None))
+    if seconds is not None:
+        return seconds
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if headers is not None:
+        seconds = parse_retry_after(headers.get("Retry-After"))
+        if seconds is not None:
+            return seconds
+    details = getattr(error, "details", None)
+    if isinstance(details, dict):
+        for detail in details.get("error", {}).get("details", []) or []:
+            if isinstance(detail, dict) and "retryDelay" in detail:
+                return parse_retry_after(str(detail["retryDelay"]))
+    return None
+
+
+def is_retryable(error: BaseException, statuses: Collection[int]) -> bool:
+    code = status_code(error)
+    if code is not None:
+        return code in statuses
+    # Connection failures never reached the upstream, whatever the call
+    return isinstance(error, (aiohttp.ClientConnectionError, ConnectionError))
+
+
+class LocalBucket:
+    """Token bucket for this process only."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.time()
+        self.paused_until = 0.0
+
+    def reserve(self) -> float:
+        """Take a token and return how long to wait before using it.
+
+        Tokens may go negative: each caller reserves its own slot in the
+        future, so waiters are spread out at `rate` instead of waking together.
+        A rate of 0 means no quota; only pauses apply.
+        """
+        now = time.time()
+        if self.rate <= 0:
+            return max(0.0, self.paused_until - now)
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.paused_until - now)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.time() + seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"tokens": round(self.tokens, 2), "paused_seconds": round(max(0.0, self.paused_until - time.time()), 2)}
+
+
+class SharedBucket(LocalBucket):
+    """Token bucket whose state lives in a small file, so every worker process shares one quota.
+
+    Each update holds an exclusive flock on the file for a read-modify-write
+    of three numbers; it runs on the I/O pool so a contended lock never blocks
+    the event loop.
+    """
+
+    def __init__(self, rate: float, burst: float, path: str):
+        super().__init__(rate, burst)
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def _update(self, change: Callable[[], Any]) -> Any:
+        import fcntl
+        with self._lock, open(self.path, "a+", encoding="utf-8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    state = json.loads(f.read() or "{}")
+                except ValueError:
+                    state = {}
+                self.tokens = state.get("tokens", self.burst)
+                self.updated = state.get("updated", time.time())
+                self.paused_until = state.get("paused_until", 0.0)
+                result = change()
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps({"tokens": self.tokens, "updated": self.updated, "paused_until": self.paused_until}))
+                f.flush()
+                return result
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def reserve(self) -> float:
+        return self._update(super().reserve)
+
+    def pause(self, seconds: float):
+        self._update(lambda: LocalBucket.pause(self, seconds))
+
+
+class UpstreamLimiter:
+    """Rate limit, adaptive concurrency and retries for one upstream quota.
+
+    Calls first take a token from the bucket (`rate` per second, bursts of
+    `burst`), shared by all workers when UPSTREAM_STATE_DIR is set. The number
+    of calls in flight in this process is capped by a limit that grows by
+    about one per round of successes and halves on a 429 (AIMD), between
+    `min_concurrency` and `max_concurrency`. Failed calls with a retryable
+    status are retried with full-jitter exponential backoff; a Retry-After
+    from the upstream overrides the backoff and pauses the whole bucket.
+    """
+
+    def __init__(self, name: str, upstream: str, rate: float, burst: float, max_concurrency: int, min_concurrency: int = 1):
+        self.name = name
+        self.upstream = upstream
+        if settings.UPSTREAM_STATE_DIR:
+            self.bucket = SharedBucket(rate, burst, os.path.join(settings.UPSTREAM_STATE_DIR, f"{name}.json"))
+        else:
+            self.bucket = LocalBucket(rate, burst)
+        self.shared = bool(settings.UPSTREAM_STATE_DIR)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self._slots: Optional[asyncio.Condition] = None
+        self._last_decrease = 0.0
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failed = 0
+        self.waited_seconds = 0.0
+        _limiters[name] = self
+
+    def _condition(self) -> asyncio.Condition:
+        # Created on first use so it binds to the running loop
+        if self._slots is None:
+            self._slots = asyncio.Condition()
+        return self._slots
+
+    async def _acquire(self):
+        slots = self._condition()
+        async with slots:
+            await slots.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        try:
+            wait = await run_io(self.bucket.reserve) if self.shared else self.bucket.reserve()
+            if wait > 0:
+                self.waited_seconds += wait
+                await asyncio.sleep(wait)
+        except BaseException:
+            await self._release()
+            raise
+
+    async def _release(self):
+        slots = self._condition()
+        async with slots:
+            self.in_flight -= 1
+            slots.notify_all()
+
+    def _succeeded(self):
+        self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+
+    def _rate_limited(self):
+        self.throttled += 1
+        # One halving per burst of 429s: the calls that fail together were all sent at the old limit
+        now = time.monotonic()
+        if now - self._last_decrease > 1.0:
+            self.limit = max(float(self.min_concurrency), self.limit / 2)
+            self._last_decrease = now
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(settings.UPSTREAM_BACKOFF_MAX, settings.UPSTREAM_BACKOFF_BASE * 2 ** attempt))
+
+    async def _attempt(self, operation: str, fn: Callable[[], Awaitable[T]]) -> T:
+        await self._acquire()
+        try:
+            async with track_upstream(self.upstream, operation):
+                return await fn()
+        finally:
+            await self._release()
+
+    async def call(self, operation: str, fn: Callable[[], Awaitable[T]], retry_statuses: Collection[int] = RETRY_STATUSES,
+                   gate: Optional[asyncio.Semaphore] = None) -> T:
+        """Run `fn()` (a fresh awaitable per attempt) under the limits, retrying retryable failures.
+
+        `gate` is a caller's own concurrency bound (such as one request's
+        GEMINI_MAX_CONCURRENCY); it is held for each attempt only, never during
+        a backoff, so one throttled call does not starve the rest of the request.
+        """
+        self.calls += 1
+        attempt = 0
+        while True:
+            try:
+                if gate is None:
+                    result = await self._attempt(operation, fn)
+                else:
+                    async with gate:
+                        result = await self._attempt(operation, fn)
+            except Exception as e:
+                error = e
+            else:
+                self._succeeded()
+                return result
+            if status_code(error) == 429:
+                self._rate_limited()
+            if attempt >= settings.UPSTREAM_RETRIES or not is_retryable(error, retry_statuses):
+                self.failed += 1
+                raise error
+            requested = retry_after(error)
+            if requested is not None:
+                # Jitter keeps the paused callers from all retrying in the same instant
+                delay = min(requested, settings.UPSTREAM_BACKOFF_MAX) * random.uniform(1.0, 1.2)
+                if self.shared:
+                    await run_io(self.bucket.pause, delay)
+                else:
+                    self.bucket.pause(delay)
+            else:
+                delay = self.backoff(attempt)
+            attempt += 1
+            self.retries += 1
+            logger.warning(f"{self.name} {operation} failed ({error}), retry {attempt}/{settings.UPSTREAM_RETRIES} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency_limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "failed": self.failed,
+            "rate_wait_seconds": round(self.waited_seconds, 2),
+            "shared": self.shared,
+            **self.bucket.snapshot(),
+        }
+
+
+gemini_text = UpstreamLimiter(
+    "gemini_text", "gemini", settings.GEMINI_RATE_LIMIT, settings.GEMINI_BURST, settings.GEMINI_MAX_IN_FLIGHT
+)
+gemini_image = UpstreamLimiter(
+    "gemini_image", "gemini", settings.GEMINI_IMAGE_RATE_LIMIT, settings.GEMINI_IMAGE_BURST, settings.GEMINI_IMAGE_MAX_IN_FLIGHT
+)
+heygen = UpstreamLimiter(
+    "heygen", "heygen", settings.HEYGEN_RATE_LIMIT, settings.HEYGEN_BURST, settings.HEYGEN_MAX_IN_FLIGHT
+)
+
+
+def stats() -> Dict[str, Any]:
+    return {name: limiter.stats() for name, limiter in _limiters.items()}
@@ -1,20 +1,22 @@
+import asyncio
 import os
-import aiohttp
 import shutil
 import uuid
-import io
 from io import BytesIO
 import json
-from PIL import Image
-from pptx import Presentation
-from pptx.exc import PackageNotFoundError
-from pptx.enum.shapes import MSO_SHAPE_TYPE
-from config import settings
-import google.generativeai as genai
-from models import SlideData,  TableData
-from typing import Any,  List
+from PIL import Image, ImageOps
+from config import settings, logger
+from executor import run_cpu
+from metrics import stage_timer
+from logo_store import get_logo
+from image_prep import prepare_image
+from artifacts import artifact_store
+from models import SlideData, ImageInfo, TableData
+from typing import Any, Iterator, List, Tuple
 
 def get_slide_count(file_path: str) -> int:
+    from pptx import Presentation
+    from pptx.exc import PackageNotFoundError
     try:
         prs = Presentation(file_path)
         return len(prs.slides)
@@ -25,7 +27,89 @@ def get_slide_count(file_path: str) -> int:
 
 from typing import List, Optional
 
+def extract_slides(file_path: str) -> List[SlideData]:
+    return list(iter_slides(file_path))
 
+def iter_slides(file_path: str) -> Iterator[SlideData]:
+    # python-pptx is imported on first parse, in whichever pool worker does it
+    from pptx import Presentation
+    return iter_presentation_slides(Presentation(file_path))
+
+def stream_slides(queue, file_path: str) -> int:
+    """Parse on a CPU pool worker, putting each slide on `queue` (see executor.stream_cpu) once it is stored."""
+    count = 0
+    for slide_data in iter_slides(file_path):
+        queue.put(slide_data.model_dump())
+        count += 1
+    return count
+
+def iter_presentation_slides(prs) -> Iterator[SlideData]:
+    # Yields each slide once its text, tables and images are stored
+    from pptx.enum.shapes import MSO_SHAPE_TYPE
+    for i, slide in enumerate(prs.slides):
+        slide_number = i + 1
+        current_slide_data = SlideData(slide_number=slide_number)
+        image_index, table_index = 0, 0
+        title_shape = None
+
+        if slide.shapes.title and slide.shapes.title.has_text_frame:
+            title_shape = slide.shapes.title
+            current_slide_data.title = title_shape.text.strip()
+
+        for shape in slide.shapes:
+            if shape.has_text_frame and shape != title_shape:
+                text = shape.text.strip()
+                if text:
+                    current_slide_data.text_elements.append(text)
+
+            if shape.shape_type == MSO_SHAPE_TYPE.PICTURE:
+                image = shape.image
+                img_filename = f"img_{image.sha1}.{image.ext.lower()}"
+                # Content addressed, so an image repeated across slides or decks is stored once
+                current_slide_data.images.append(ImageInfo(
+                    filename=img_filename,
+                    artifact_id=artifact_store.put(image.blob),
+                    content_type=image.content_type,
+                    width_emu=image.size[0],
+                    height_emu=image.size[1]
+                ))
+                image_index += 1
+
+            if shape.shape_type == MSO_SHAPE_TYPE.TABLE:
+                table = shape.table
+                table_data_list = [[cell.text.strip() for cell in row.cells] for row in table.rows]
+                if table_data_list:
+                    current_slide_data.tables.append(TableData(rows=table_data_list))
+                    table_index += 1
+
+        yield current_slide_data
+
+def manifest_path(file_id: str) -> str:
+    return os.path.join(settings.TEMP_UPLOAD_DIR, f"{os.path.splitext(file_id)[0]}.manifest.json")
+
+def build_manifest(file_path: str, max_slides: int) -> dict:
+    """Parse a deck once: slide count, per-slide text/table inventory and extracted image references.
+
+    Decks with no slides or more than `max_slides` are only counted, not extracted.
+    """
+    from pptx import Presentation
+    prs = Presentation(file_path)
+    slide_count = len(prs.slides)
+    manifest = {"slide_count": slide_count, "slides": []}
+    if 0 < slide_count <= max_slides:
+        manifest["slides"] = [slide.model_dump() for slide in iter_presentation_slides(prs)]
+    return manifest
+
+def write_manifest(file_id: str, manifest: dict):
+    with open(manifest_path(file_id), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+def read_manifest(file_id: str) -> Optional[dict]:
+    path = manifest_path(file_id)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
 
 def summarize_table(table_data: TableData) -> str:
     if not table_data or not table_data.rows:
@@ -34,7 +118,7 @@ def summarize_table(table_data: TableData) -> str:
     num_rows = len(table_data.rows) - 1
     return f"Table with header '{header}' and {num_rows} data rows."
 
-def format_slide_content_for_llm(slide: SlideData, extracted_content_path: str) -> List[Any]:
+def format_slide_text_for_llm(slide: SlideData) -> List[str]:
     parts = []
     if slide.title:
         parts.append(f"Slide Title: {slide.title}\n")
@@ -43,63 +127,60 @@ def format_slide_content_for_llm(slide: SlideData, extracted_content_path: str)
     if slide.tables:
         table_summaries = [summarize_table(table) for table in slide.tables]
         parts.append("Slide Tables Summary:\n" + "\n".join([f"- {summary}" for summary in table_summaries]) + "\n")
+    return parts
+
+def format_slide_content_for_llm(slide: SlideData) -> List[Any]:
+    parts: List[Any] = format_slide_text_for_llm(slide)
+    seen = set()
     for img_info in slide.images:
-        img_path = os.path.join(extracted_content_path, img_info.filename)
-        if os.path.exists(img_path):
-            try:
-                img = Image.open(img_path)
-                mime_type = None
-                if img.format == "PNG":
-                    mime_type = "image/png"
-                elif img.format == "JPEG":
-                    mime_type = "image/jpeg"
-                elif img.format == "GIF":
-                    mime_type = "image/gif"
-                elif img.format == "BMP":
-                    mime_type = "image/bmp"
-                elif img_info.content_type:
-                    mime_type = img_info.content_type
-                if mime_type:
-                    img_bytes = io.BytesIO()
-                    img.save(img_bytes, format=img.format)
-                    parts.append(genai.Part.from_data(img_bytes.getvalue(), mime_type=mime_type))
-                    parts.append(f"\nImage Description (from file: {img_info.filename}): ")
-                else:
-                    print(f"Warning: Could not determine MIME type for image {img_info.filename}")
-            except Exception as e:
-                print(f"Warning: Could not load image {img_path} for LLM. Error: {e}")
+        if img_info.artifact_id in seen:
+            continue
+        seen.add(img_info.artifact_id)
+        data = artifact_store.get(img_info.artifact_id)
+        if data is not None:
+            prepared = prepare_image(data, img_info.filename)
+            if prepared:
+                parts.append(prepared)
+                parts.append(f"\nImage Description (from file: {img_info.filename}): ")
+            else:
+                logger.warning(f"Could not load image {img_info.filename} for LLM.")
         else:
-            print(f"Warning: Image file not found at {img_path}")
+            logger.warning(f"Image {img_info.filename} not found in the artifact store ({img_info.artifact_id})")
     return parts
 
-async def merge_with_logo(background_image_data: bytes, logo_url: str, output_format: str = "PNG"):
+composite_slots = asyncio.Semaphore(settings.COMPOSITE_MAX_IN_FLIGHT)
+
+def composite_with_logo(background_image_data: bytes, logo: Image.Image, size: Tuple[int, int], output_format: str, quality: int) -> bytes:
+    with Image.open(BytesIO(background_image_data)) as background:
+        # Let JPEG decode straight at a reduced scale when the source is much larger than the video
+        background.draft("RGB", size)
+        # Crop-to-fill like HeyGen's "cover" fit, so the logo corner is never cropped away later
+        frame = ImageOps.fit(background.convert("RGB"), size, Image.LANCZOS)
+    # Alpha-composite the logo into the frame itself instead of a second full-size canvas
+    frame.paste(logo, (frame.width - logo.width, 0), logo)
+    merged_buffer = BytesIO()
+    if output_format == "PNG":
+        frame.save(merged_buffer, format="PNG")
+    else:
+        frame.save(merged_buffer, format=output_format, quality=quality)
+    return merged_buffer.getvalue()
+
+async def merge_with_logo(background_image_data: bytes, logo_url: str, output_format: Optional[str] = None, logo_id: Optional[str] = None):
     try:
-        # Open the background image
-        background = Image.open(BytesIO(background_image_data)).convert("RGBA")
-        
-        # Download the logo from Cloudinary
-        async with aiohttp.ClientSession() as session:
-            async with session.get(logo_url) as response:
-                if response.status != 200:
-                    raise Exception(f"Failed to download logo from {logo_url}")
-                logo_data = await response.read()
-        
-        # Open and process the logo
-        logo = Image.open(BytesIO(logo_data)).convert("RGBA")
-        logo = logo.resize((90, 90))
-        
-        # Merge the images
-        x = background.width - logo.width
-        y = 0
-        composite = Image.new("RGBA", background.size)
-        composite.paste(background, (0, 0))
-        composite.paste(logo, (x, y), logo)
+        # Pre-resized logo from the local logo store, downloaded once on a miss
+        logo = await get_logo(logo_url, settings.LOGO_VARIANT_SIZES[0], logo_id=logo_id)
         
-        # Save the merged image to a buffer
-        merged_buffer = BytesIO()
-        composite.save(merged_buffer, format=output_format)
-        merged_buffer.seek(0)
-        return merged_buffer.getvalue()
+        # Bound how many full-size decoded backgrounds exist at once
+        async with composite_slots:
+            with stage_timer("logo_composite"):
+                return await run_cpu(
+                    composite_with_logo,
+                    background_image_data,
+                    logo,
+                    (settings.VIDEO_WIDTH, settings.VIDEO_HEIGHT),
+                    output_format or settings.IMAGE_OUTPUT_FORMAT,
+                    settings.IMAGE_OUTPUT_QUALITY
+                )
     except Exception as e:
-        print(f"Error merging with logo: {e}")
+        logger.error(f"Error merging with logo: {e}")
         return None
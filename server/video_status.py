@@ -0,0 +1,169 @@
+import asyncio
+import hashlib
+import hmac
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Optional, Set
+from config import settings, logger
+from cache import SingleFlight
+import heygen
+
+TERMINAL_STATUSES = {"completed", "failed"}
+
+# HeyGen webhook event types and the video status each one means
+WEBHOOK_EVENT_STATUSES = {
+    "avatar_video.success": "completed",
+    "avatar_video.fail": "failed",
+}
+
+
+def sign_webhook(body: bytes, secret: str) -> str:
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify_webhook(body: bytes, signature: Optional[str]) -> bool:
+    # Without a secret nothing can be verified, and an unsigned callback could mark any video finished
+    if not settings.HEYGEN_WEBHOOK_SECRET:
+        return False
+    return signature is not None and hmac.compare_digest(sign_webhook(body, settings.HEYGEN_WEBHOOK_SECRET), signature)
+
+
+def webhook_event(video_id: str, status: str, video_url: Optional[str] = None, error: Optional[str] = None) -> Dict[str, Any]:
+    """A HeyGen-shaped callback body, used by the local webhook stand-in."""
+    event_type = "avatar_video.success" if status == "completed" else "avatar_video.fail"
+    event_data = {"video_id": video_id, "url": video_url} if status == "completed" else {"video_id": video_id, "msg": error}
+    return {"event_type": event_type, "event_data": event_data}
+
+
+class VideoStatusTracker:
+    """Single source of video status for every client watching a video.
+
+    Webhook callbacks update the status directly. While anyone subscribes,
+    one poller per video_id asks HeyGen as a fallback, and all direct status
+    reads within VIDEO_STATUS_POLL_INTERVAL share one upstream call. Each
+    transition is pushed to every subscriber.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.statuses: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self.pollers: Dict[str, asyncio.Task] = {}
+        self.fetches = SingleFlight("video_status")
+        self.upstream_polls = 0
+        self.webhook_updates = 0
+        self.pushes = 0
+
+    def update(self, video_id: str, status: str, video_url: Optional[str] = None,
+               error: Optional[str] = None, source: str = "poll") -> Dict[str, Any]:
+        previous = self.statuses.get(video_id)
+        if previous is not None and previous["status"] in TERMINAL_STATUSES and status not in TERMINAL_STATUSES:
+            # A late poll response must not undo a webhook that already finished the video
+            return previous
+        entry = {
+            "video_id": video_id,
+            "status": status,
+            "video_url": video_url,
+            "error": error,
+            "source": source,
+            "checked_at": time.time(),
+        }
+        self.statuses[video_id] = entry
+        self.statuses.move_to_end(video_id)
+        while len(self.statuses) > self.max_entries:
+            self.statuses.popitem(last=False)
+        if previous is None or (previous["status"], previous["video_url"]) != (status, video_url):
+            for queue in self.subscribers.get(video_id, ()):
+                queue.put_nowait(entry)
+                self.pushes += 1
+        return entry
+
+    def handle_webhook(self, event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        status = WEBHOOK_EVENT_STATUSES.get(event.get("event_type"))
+        event_data = event.get("event_data") or {}
+        video_id = event_data.get("video_id")
+        if status is None or not video_id:
+            return None
+        self.webhook_updates += 1
+        return self.update(video_id, status, event_data.get("url"), event_data.get("msg"), source="webhook")
+
+    async def fetch(self, video_id: str) -> Dict[str, Any]:
+        data = (await heygen.get_video_status(video_id)).get("data", {})
+        self.upstream_polls += 1
+        return self.update(video_id, data.get("status") or "unknown", data.get("video_url"), data.get("error"))
+
+    async def get(self, video_id: str) -> Dict[str, Any]:
+        entry = self.statuses.get(video_id)
+        if entry is not None and (
+            entry["status"] in TERMINAL_STATUSES
+            or time.time() - entry["checked_at"] < settings.VIDEO_STATUS_POLL_INTERVAL
+        ):
+            return entry
+        return await self.fetches.run(video_id, lambda: self.fetch(video_id))
+
+    async def poll(self, video_id: str):
+        while self.subscribers.get(video_id):
+            try:
+                entry = await self.get(video_id)
+                if entry["status"] in TERMINAL_STATUSES:
+                    return
+            except Exception as e:
+                logger.warning(f"Polling HeyGen status for {video_id} failed: {e}")
+            await asyncio.sleep(settings.VIDEO_STATUS_POLL_INTERVAL)
+
+    def ensure_poller(self, video_id: str):
+        poller = self.pollers.get(video_id)
+        if poller is None or poller.done():
+            poller = asyncio.create_task(self.poll(video_id))
+            self.pollers[video_id] = poller
+            poller.add_done_callback(lambda task: self.pollers.pop(video_id, None) if self.pollers.get(video_id) is task else None)
+
+    async def subscribe(self, video_id: str, heartbeat: Optional[float] = None) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """Yield the current status, then every transition until a terminal status.
+
+        With `heartbeat`, None is yielded after that many idle seconds so
+        streaming responses can keep the connection alive.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        self.subscribers.setdefault(video_id, set()).add(queue)
+        try:
+            entry = self.statuses.get(video_id) or await self.get(video_id)
+            yield entry
+            self.ensure_poller(video_id)
+            while entry["status"] not in TERMINAL_STATUSES:
+                try:
+                    update = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if (update["status"], update["video_url"]) == (entry["status"], entry["video_url"]):
+                    continue
+                entry = update
+                yield entry
+        finally:
+            watchers = self.subscribers.get(video_id)
+            if watchers is not None:
+                watchers.discard(queue)
+                if not watchers:
+                    del self.subscribers[video_id]
+                    poller = self.pollers.pop(video_id, None)
+                    if poller is not None:
+                        poller.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tracked": len(self.statuses),
+            "subscribers": sum(len(watchers) for watchers in self.subscribers.values()),
+            "pollers": len(self.pollers),
+            "upstream_polls": self.upstream_polls,
+            "webhook_updates": self.webhook_updates,
+            "pushes": self.pushes,
+        }
+
+    def shutdown(self):
+        for poller in self.pollers.values():
+            poller.cancel()
+        self.pollers.clear()
+
+
+video_tracker = VideoStatusTracker(settings.VIDEO_STATUS_CACHE_SIZE)